@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Article API Server - 処理済み記事をHTTP/JSONで提供
+
+Article Viewer と同じストレージ（記事インデックス・記事状態・全文検索）を読み、
+一覧・詳細・検索・状態変更のエンドポイントを1プロセスのスレッドサーバーで提供する。
+
+    GET  /api/articles?feed=&type=&min_score=&unread=&favorites=&deleted=&sort=&limit=&cursor=
+    GET  /api/articles/{feed}/{article_id}
+    POST /api/articles/{feed}/{article_id}/state   {"read": true, "favorite": false, "deleted": false}
+    GET  /api/search?q=&limit=
+    GET  /api/stats
+    GET  /api/generating
+"""
+import os
+import re
+import gzip
+import json
+import time
+import base64
+import bisect
+import hashlib
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# インデックスの差分更新を確認する間隔（秒）
+REFRESH_INTERVAL = float(os.getenv('VIEWER_API_REFRESH_INTERVAL', '5'))
+
+# 一覧の1ページの件数（デフォルト・上限）
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# このサイズ以上のレスポンスをgzip圧縮
+GZIP_MIN_BYTES = 1024
+
+ARTICLE_PATH = re.compile(r'^/api/articles/([^/]+)/([^/]+)$')
+STATE_PATH = re.compile(r'^/api/articles/([^/]+)/([^/]+)/state$')
+
+# 状態変更のキーと (付ける操作, 外す操作, 状態の判定)
+STATE_ACTIONS = {
+    'read': ('mark_as_read', 'mark_as_unread', 'is_read'),
+    'deleted': ('mark_as_deleted', 'undelete', 'is_deleted'),
+    'favorite': ('toggle_favorite', 'toggle_favorite', 'is_favorite'),
+}
+
+
+class CatalogSnapshot:
+    """ある時点の記事一覧とソート順（作成後は変更しないので、読み取りはロック不要）"""
+
+    def __init__(self, generation: int, articles: List[Dict]):
+        self.generation = generation
+        self.by_key = {(a['feed_name'], a['article_id']): a for a in articles}
+        self.orders: Dict[str, List[Dict]] = {}
+        self.sort_keys: Dict[str, List[Tuple]] = {}
+        for sort_by in ('score', 'date'):
+            keyed = sorted((self.sort_key(a, sort_by), a) for a in articles)
+            self.sort_keys[sort_by] = [key for key, _ in keyed]
+            self.orders[sort_by] = [a for _, a in keyed]
+
+    @staticmethod
+    def sort_key(article: Dict, sort_by: str) -> Tuple:
+        """降順ソート用のキー（同点はフィード・記事IDで安定させ、カーソルに使う）"""
+        if sort_by == 'date':
+            value = -(article.get('published_ts') or 0.0)
+        else:
+            value = -float(article['metadata'].get('filter_score', 0) or 0)
+        return (value, article['feed_name'], article['article_id'])
+
+
+class ArticleCatalog:
+    """
+    APIサーバー用のメモリ上の記事カタログ
+
+    記事インデックスを一定間隔で差分更新し、変化があればスナップショットを
+    作り直して差し替える。記事状態は他プロセス（TTYのViewer等）の変更も読み直す。
+    """
+
+    def __init__(self, viewer, refresh_interval: float = REFRESH_INTERVAL):
+        self.viewer = viewer
+        self.refresh_interval = refresh_interval
+        self.state_lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.state_version = 0
+        self._local = threading.local()
+        self._last_refresh = 0.0
+        # 記事一覧の更新後、検索インデックスの同期がまだ成功していない
+        self._search_stale = False
+        self.snapshot = self._build(0)
+        self._sync_search_index()
+
+    def _build(self, generation: int) -> CatalogSnapshot:
+        articles = self.viewer.load_articles(show_deleted=True)
+        logger.info(f"記事カタログ構築: {len(articles)}件 (generation {generation})")
+        return CatalogSnapshot(generation, articles)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """スレッドごとの検索インデックス接続（SQLite接続はスレッド間で共有しない）"""
+        if getattr(self._local, 'search_index', None) is None:
+            self._local.search_index = SearchIndex(str(self.viewer.storage_path))
+        return self._local.search_index
+
+    def _sync_search_index(self):
+        def load_body(feed_name: str, article_id: str) -> str:
+            with open(self.viewer.processed_dir / feed_name / f"{article_id}.md", 'r', encoding='utf-8') as f:
+                return self.viewer.strip_front_matter(f.read())
+
+        documents = ((row['feed_name'], row['article_id'], row['title'] or '', row['summary_mtime'])
+                     for row in self.viewer.index.iter_rows())
+        self.search_index.sync(documents, load_body)
+
+    def maybe_refresh(self):
+        """
+        前回から refresh_interval 秒以上経っていれば差分更新（同時に1スレッドだけ実行）
+
+        失敗したら（走査中のファイル削除・検索インデックスの同期エラーなど）ログに出して
+        今のスナップショットのまま応答し、次のリクエストで再試行する。
+        """
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_refresh = time.monotonic()
+            with self.state_lock:
+                if self.viewer.state_manager.reload_if_changed():
+                    self.state_version += 1
+            if self.viewer.index.refresh():
+                self.snapshot = self._build(self.snapshot.generation + 1)
+                self._search_stale = True
+            if self._search_stale:
+                self._sync_search_index()
+                self._search_stale = False
+        except Exception as e:
+            logger.error(f"記事カタログの更新に失敗（次のリクエストで再試行）: {e}")
+            self._last_refresh = 0.0
+        finally:
+            self.refresh_lock.release()
+
+    def etag(self, *parts) -> str:
+        digest = hashlib.sha1(repr((self.snapshot.generation, self.state_version) + parts).encode('utf-8'))
+        return f'"{digest.hexdigest()[:20]}"'
+
+    def summarize(self, article: Dict) -> Dict:
+        """一覧用の記事表現（本文なし、状態は現在の値）"""
+        state_manager = self.viewer.state_manager
+        article_id = article['article_id']
+        return {
+            'feed_name': article['feed_name'],
+            'article_id': article_id,
+            **article['metadata'],
+            'published_ts': article.get('published_ts'),
+            'is_read': state_manager.is_read(article_id),
+            'is_favorite': state_manager.is_favorite(article_id),
+            'is_deleted': state_manager.is_deleted(article_id),
+        }
+
+    def detail(self, article: Dict) -> Dict:
+        """詳細用の記事表現（要約本文のMarkdownを含む）"""
+        data = self.summarize(article)
+        # 本文はキャッシュせずに読む（全記事の本文をメモリに溜めない）
+        data['content'] = self.viewer.get_content(dict(article, content=None))
+        return data
+
+    def list_articles(self, params: Dict[str, str]) -> Dict:
+        """フィルタ・ソートした一覧をカーソルの位置から limit 件返す"""
+        sort_by = params.get('sort', 'score')
+        if sort_by not in ('score', 'date'):
+            raise ValueError("sort must be 'score' or 'date'")
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        feed = params.get('feed')
+        article_type = params.get('type')
+        min_score = float(params['min_score']) if params.get('min_score') else None
+        unread_only = params.get('unread') == 'true'
+        favorites_only = params.get('favorites') == 'true'
+        show_deleted = params.get('deleted') == 'true'
+
+        snapshot = self.snapshot
+        start = 0
+        if params.get('cursor'):
+            start = bisect.bisect_right(snapshot.sort_keys[sort_by], decode_cursor(params['cursor']))
+
+        state_manager = self.viewer.state_manager
+        items, next_cursor, last_key = [], None, None
+        order = snapshot.orders[sort_by]
+        for position in range(start, len(order)):
+            article = order[position]
+            article_id = article['article_id']
+            metadata = article['metadata']
+            if feed and article['feed_name'] != feed:
+                continue
+            if article_type and metadata.get('article_type') != article_type:
+                continue
+            if min_score is not None and (metadata.get('filter_score') or 0) < min_score:
+                continue
+            if not show_deleted and state_manager.is_deleted(article_id):
+                continue
+            if unread_only and state_manager.is_read(article_id):
+                continue
+            if favorites_only and not state_manager.is_favorite(article_id):
+                continue
+            if len(items) == limit:
+                # 次のページがある場合だけ、最後に返した記事のソートキーをカーソルにする
+                next_cursor = encode_cursor(last_key)
+                break
+            items.append(self.summarize(article))
+            last_key = snapshot.sort_keys[sort_by][position]
+
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def update_state(self, feed_name: str, article_id: str, changes: Dict) -> Optional[Dict]:
+        """
+        記事状態を変更（ジャーナルへの追記はロックで直列化）
+
+        キーはすべて検証してから適用し（一部だけ書き込んで400を返さない）、比較の前に
+        他プロセス（ターミナルのViewerなど）の変更を読み直す。
+        """
+        article = self.snapshot.by_key.get((feed_name, article_id))
+        if article is None:
+            return None
+        unknown = [name for name in changes if name not in STATE_ACTIONS]
+        if unknown:
+            raise ValueError(f"unknown state: {', '.join(unknown)}")
+        state_manager = self.viewer.state_manager
+        with self.state_lock:
+            state_manager.reload_if_changed()
+            for name, value in changes.items():
+                set_action, unset_action, check = STATE_ACTIONS[name]
+                if bool(value) != getattr(state_manager, check)(article_id):
+                    getattr(state_manager, set_action if value else unset_action)(article_id)
+            self.state_version += 1
+        return self.summarize(article)
+
+
+def encode_cursor(sort_key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    try:
+        value, feed_name, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (float(value), str(feed_name), str(article_id))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+
+class ArticleAPIHandler(BaseHTTPRequestHandler):
+    """REST風のJSONエンドポイント（ETagによる条件付きGETとgzip圧縮に対応）"""
+
+    server_version = 'ArticleAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+    catalog: ArticleCatalog = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, data, etag: Optional[str] = None):
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        gzipped = len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body, compresslevel=5)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {'error': message})
+
+    def do_GET(self):
+        catalog = self.catalog
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        try:
+            catalog.maybe_refresh()
+            if url.path == '/api/articles':
+                etag = catalog.etag('list', sorted(params.items()))
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send_json(HTTPStatus.OK, None, etag)
+                return self._send_json(HTTPStatus.OK, catalog.list_articles(params), etag)
+
+            match = ARTICLE_PATH.match(url.path)
+            if match:
+                article = catalog.snapshot.by_key.get(match.groups())
+                if article is None:
+                    return self._send_error(HTTPStatus.NOT_FOUND, 'article not found')
+                etag = catalog.etag('detail', match.groups())
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send_json(HTTPStatus.OK, None, etag)
+                return self._send_json(HTTPStatus.OK, catalog.detail(article), etag)
+
+            if url.path == '/api/search':
+                query = params.get('q', '').strip()
+                if not query:
+                    return self._send_error(HTTPStatus.BAD_REQUEST, 'q is required')
+                limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+                etag = catalog.etag('search', query, limit)
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send_json(HTTPStatus.OK, None, etag)
+                items = []
+                snapshot = catalog.snapshot
+                for hit in catalog.search_index.search(query, limit=limit, keys=snapshot.by_key):
+                    article = snapshot.by_key.get((hit['feed_name'], hit['article_id']))
+                    if article is not None:
+                        items.append(dict(catalog.summarize(article), rank=hit['rank']))
+                return self._send_json(HTTPStatus.OK, {'items': items}, etag)
+
+            if url.path == '/api/stats':
+                with catalog.state_lock:
+                    stats = catalog.viewer.state_manager.get_stats()
+                stats['article_count'] = len(catalog.snapshot.by_key)
+                return self._send_json(HTTPStatus.OK, stats, catalog.etag('stats'))
+
+            if url.path == '/api/generating':
+                # 生成中の要約は数秒ごとに伸びるのでETagを付けない
+                return self._send_json(HTTPStatus.OK, {'items': catalog.viewer.generating_summaries()})
+
+            self._send_error(HTTPStatus.NOT_FOUND, 'not found')
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        except Exception as e:
+            logger.exception(f"リクエスト処理エラー: {self.path}")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"internal error: {e}")
+
+    def do_POST(self):
+        match = STATE_PATH.match(urlsplit(self.path).path)
+        if not match:
+            return self._send_error(HTTPStatus.NOT_FOUND, 'not found')
+
+        try:
+            length = int(self.headers.get('Content-Length', '0'))
+            changes = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(changes, dict):
+                raise ValueError('body must be a JSON object')
+            article = self.catalog.update_state(*match.groups(), changes)
+        except ValueError as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+
+        if article is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, 'article not found')
+        self._send_json(HTTPStatus.OK, article)
+
+
+class ArticleAPIServer(ThreadingHTTPServer):
+    """リクエストごとにスレッドを起動するHTTPサーバー（同時接続に備えて待ち行列を広げる）"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(viewer, host: str, port: int):
+    """APIサーバーを起動（Ctrl+Cで停止）"""
+    catalog = ArticleCatalog(viewer)
+    handler = type('BoundArticleAPIHandler', (ArticleAPIHandler,), {'catalog': catalog})
+    server = ArticleAPIServer((host, port), handler)
+    logger.info(f"Article API Server 起動: http://{host}:{port}/api/articles")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Article API Server 停止")
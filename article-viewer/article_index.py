@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+記事メタデータインデックス - 一覧表示に必要なメタデータを列指向で永続化
+
+起動時はインデックスファイルを1回読むだけで記事一覧を構築でき、
+変更のあったフィードだけをmtimeで差分更新する。本文は記事を開くときに読む。
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from retention import parse_published
+from storage_writer import StorageWriter
+
+# 列指向で保持するカラム
+COLUMNS = (
+    'feed_name', 'article_id', 'title', 'url', 'author', 'published', 'published_ts',
+    'filter_score', 'article_type', 'processed_at', 'body_offset', 'summary_mtime', 'metadata_mtime'
+)
+
+# 記事のメタデータとして表示に使うカラム
+METADATA_COLUMNS = ('title', 'url', 'author', 'published', 'filter_score', 'article_type', 'processed_at')
+
+# フロントマター探索で最初に読むバイト数
+HEADER_READ_SIZE = 4096
+
+
+def find_body_offset(summary_file: Path) -> int:
+    """YAMLフロントマターの直後（本文の開始位置）のバイトオフセットを取得"""
+    with open(summary_file, 'rb') as f:
+        data = f.read(HEADER_READ_SIZE)
+        if not data.startswith(b'---'):
+            return 0
+        end = data.find(b'---', 3)
+        if end < 0:
+            data += f.read()
+            end = data.find(b'---', 3)
+            if end < 0:
+                return 0
+    offset = end + 3
+    while offset < len(data) and data[offset:offset + 1] in (b' ', b'\t', b'\r', b'\n'):
+        offset += 1
+    return offset
+
+
+class ArticleIndex:
+    """processed-articles と rss-feeds のメタデータを列指向で保持する永続インデックス"""
+
+    VERSION = 1
+
+    def __init__(self, storage_path: str):
+        self.storage_path = Path(storage_path)
+        self.processed_dir = self.storage_path / 'processed-articles'
+        self.metadata_dir = self.storage_path / 'rss-feeds'
+        self.index_path = self.storage_path / 'index' / 'viewer.json'
+        self.rows: Dict[str, Dict] = {}
+        self.dir_mtimes: Dict[str, List[float]] = {}
+        self.dirty = False
+        self._load()
+
+    @staticmethod
+    def key(feed_name: str, article_id: str) -> str:
+        return f"{feed_name}/{article_id}"
+
+    def _load(self):
+        """インデックスファイルを1回の読み込みで復元（破損時は空から再構築）"""
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                return
+            columns = data['columns']
+            for values in zip(*(columns[name] for name in COLUMNS)):
+                row = dict(zip(COLUMNS, values))
+                self.rows[self.key(row['feed_name'], row['article_id'])] = row
+            self.dir_mtimes = data.get('dir_mtimes', {})
+        except (OSError, ValueError, KeyError):
+            self.rows, self.dir_mtimes = {}, {}
+
+    def save(self):
+        """インデックスをアトミックに保存（変更がなければ何もしない）"""
+        if not self.dirty:
+            return
+        rows = list(self.rows.values())
+        data = {
+            'version': self.VERSION,
+            'dir_mtimes': self.dir_mtimes,
+            'columns': {name: [row[name] for row in rows] for name in COLUMNS}
+        }
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        # CLIとAPIサーバー（--serve）が同時に保存しても一時ファイルが衝突しないよう、StorageWriter経由で書く
+        with StorageWriter(fsync=False) as writer:
+            writer.write_json(self.index_path, data)
+        self.dirty = False
+
+    def _dir_mtime(self, path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _build_row(self, feed_name: str, article_id: str, summary_file: Path,
+                   metadata_file: Path, summary_mtime: float, metadata_mtime: float) -> Optional[Dict]:
+        """メタデータJSONとフロントマター位置からインデックス行を作成"""
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            body_offset = find_body_offset(summary_file)
+        except (OSError, ValueError):
+            return None
+
+        row = {name: metadata.get(name) for name in METADATA_COLUMNS}
+        row.update({
+            'feed_name': feed_name,
+            'article_id': article_id,
+            'title': metadata.get('title', 'No Title'),
+            'filter_score': metadata.get('filter_score', 0),
+            'published_ts': parse_published(metadata.get('published', '')),
+            'body_offset': body_offset,
+            'summary_mtime': summary_mtime,
+            'metadata_mtime': metadata_mtime
+        })
+        return row
+
+    def _refresh_feed(self, feed_name: str):
+        """フィード内の要約ファイルをstatし、追加・更新・削除された記事だけ反映"""
+        feed_dir = self.processed_dir / feed_name
+        seen = set()
+        for summary_file in feed_dir.glob('*.md'):
+            article_id = summary_file.stem
+            key = self.key(feed_name, article_id)
+            metadata_file = self.metadata_dir / feed_name / f"{article_id}.json"
+            try:
+                summary_mtime = summary_file.stat().st_mtime
+                metadata_mtime = metadata_file.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            seen.add(key)
+
+            row = self.rows.get(key)
+            if row and row['summary_mtime'] == summary_mtime and row['metadata_mtime'] == metadata_mtime:
+                continue
+
+            row = self._build_row(feed_name, article_id, summary_file, metadata_file, summary_mtime, metadata_mtime)
+            if row:
+                self.rows[key] = row
+                self.dirty = True
+
+        prefix = f"{feed_name}/"
+        for key in [key for key in self.rows if key.startswith(prefix) and key not in seen]:
+            del self.rows[key]
+            self.dirty = True
+
+    def refresh(self, full: bool = False) -> bool:
+        """
+        インデックスを差分更新
+
+        要約・メタデータのフィードディレクトリのmtimeが前回から変わったフィードだけを
+        再スキャンする（full=Trueなら全フィードのファイルをstatする）。
+
+        Returns:
+            インデックスに変更があったか
+        """
+        feeds = [d.name for d in self.processed_dir.iterdir() if d.is_dir()] if self.processed_dir.exists() else []
+
+        for feed_name in feeds:
+            mtimes = [self._dir_mtime(self.processed_dir / feed_name), self._dir_mtime(self.metadata_dir / feed_name)]
+            if not full and self.dir_mtimes.get(feed_name) == mtimes:
+                continue
+            self._refresh_feed(feed_name)
+            self.dir_mtimes[feed_name] = mtimes
+            self.dirty = True
+
+        # 要約ディレクトリごと消えたフィードを除去
+        for feed_name in [name for name in self.dir_mtimes if name not in feeds]:
+            del self.dir_mtimes[feed_name]
+            prefix = f"{feed_name}/"
+            for key in [key for key in self.rows if key.startswith(prefix)]:
+                del self.rows[key]
+            self.dirty = True
+
+        changed = self.dirty
+        self.save()
+        return changed
+
+    def iter_rows(self, feed: Optional[str] = None):
+        """インデックス行を列挙"""
+        for row in self.rows.values():
+            if feed and row['feed_name'] != feed:
+                continue
+            yield row
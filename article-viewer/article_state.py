@@ -1,73 +1,86 @@
 #!/usr/bin/env python3
 """
 記事状態管理システム - 既読・未読・削除・お気に入りを管理
+
+状態変更はジャーナルへの1行追記で永続化し、一定件数ごとにスナップショットへ畳み込む。
 """
-import json
-from pathlib import Path
 from datetime import datetime
-from typing import Dict, Set, Optional
+from typing import Dict, Set
+
+from state_journal import StateJournal
 
 
 class ArticleStateManager:
     """記事の状態（既読・未読・削除・お気に入り）を管理"""
     
     def __init__(self, storage_path: str):
-        self.storage_path = Path(storage_path)
-        self.state_file = self.storage_path / 'article_states.json'
+        self.journal = StateJournal(storage_path)
+        self.state_file = self.journal.snapshot_path
         self.states = self._load_states()
     
     def _load_states(self) -> Dict:
-        """状態ファイルを読み込み"""
-        if self.state_file.exists():
-            with open(self.state_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {
-            'read': {},        # article_id: timestamp
-            'deleted': {},     # article_id: timestamp
-            'favorite': {},    # article_id: timestamp
-            'archived': {}     # article_id: timestamp
-        }
-    
-    def _save_states(self):
-        """状態ファイルに保存"""
-        self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.state_file, 'w', encoding='utf-8') as f:
-            json.dump(self.states, f, indent=2, ensure_ascii=False)
+        """スナップショットにジャーナルを再生して読み込み（大きくなっていれば畳み込む）"""
+        states = self.journal.load(repair=True)
+        if self.journal.needs_compaction():
+            states = self.journal.compact()
+        self._signature = self.journal.signature()
+        return states
+    
+    def reload_if_changed(self) -> bool:
+        """他プロセスがスナップショット・ジャーナルを更新していれば読み直す"""
+        signature = self.journal.signature()
+        if signature == self._signature:
+            return False
+        self.states = self.journal.load()
+        self._signature = signature
+        return True
+    
+    def _set(self, category: str, article_id: str):
+        """状態を付けてジャーナルに追記"""
+        timestamp = datetime.now().isoformat()
+        self.states[category][article_id] = timestamp
+        self.journal.append('set', category, article_id, timestamp)
+        self._maybe_compact()
+    
+    def _unset(self, category: str, article_id: str):
+        """状態を外してジャーナルに追記"""
+        del self.states[category][article_id]
+        self.journal.append('unset', category, article_id)
+        self._maybe_compact()
+    
+    def _maybe_compact(self):
+        """ジャーナルが閾値を超えたらスナップショットへ畳み込み"""
+        if self.journal.needs_compaction():
+            self.states = self.journal.compact()
     
     def mark_as_read(self, article_id: str):
         """既読にする"""
-        self.states['read'][article_id] = datetime.now().isoformat()
-        self._save_states()
+        self._set('read', article_id)
     
     def mark_as_unread(self, article_id: str):
         """未読にする（既読マークを削除）"""
         if article_id in self.states['read']:
-            del self.states['read'][article_id]
-            self._save_states()
+            self._unset('read', article_id)
     
     def mark_as_deleted(self, article_id: str):
         """削除マークをつける"""
-        self.states['deleted'][article_id] = datetime.now().isoformat()
-        self._save_states()
+        self._set('deleted', article_id)
     
     def undelete(self, article_id: str):
         """削除マークを解除"""
         if article_id in self.states['deleted']:
-            del self.states['deleted'][article_id]
-            self._save_states()
+            self._unset('deleted', article_id)
     
     def toggle_favorite(self, article_id: str):
         """お気に入りをトグル"""
         if article_id in self.states['favorite']:
-            del self.states['favorite'][article_id]
+            self._unset('favorite', article_id)
         else:
-            self.states['favorite'][article_id] = datetime.now().isoformat()
-        self._save_states()
+            self._set('favorite', article_id)
     
     def archive(self, article_id: str):
         """アーカイブする"""
-        self.states['archived'][article_id] = datetime.now().isoformat()
-        self._save_states()
+        self._set('archived', article_id)
     
     def is_read(self, article_id: str) -> bool:
         """既読かどうか"""
@@ -3,21 +3,27 @@
 Article Viewer - 処理済み記事を読みやすく表示
 """
 import os
-import json
+import sys
+import time
+import logging
 import argparse
-import readline  # readlineキーバインドを有効化
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
 from rich.table import Table
-from rich.prompt import Prompt, Confirm
 from rich.align import Align
 from rich.text import Text
 from rich import box
-from article_state import ArticleStateManager
+
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from archive import ArticleArchive  # noqa: E402
+from article_state import ArticleStateManager  # noqa: E402
+from article_index import ArticleIndex, METADATA_COLUMNS  # noqa: E402
+from retention import parse_published  # noqa: E402
+from profiling import MODES, profile_mode, profiled  # noqa: E402
+from leases import open_leases  # noqa: E402
 
 console = Console()
 
@@ -25,6 +31,12 @@ console = Console()
 # 例: 0.5 = 50%の幅、左右に25%ずつの余白
 CONTENT_WIDTH_RATIO = 0.5
 
+# 記事リストの1ページの件数（0 = 端末の高さに合わせる）
+LIST_PAGE_SIZE = int(os.getenv('VIEWER_PAGE_SIZE', '0'))
+
+# Article Processor がストリーミング生成中の要約（確定すると <id>.md にリネームされる）
+PARTIAL_SUMMARY_SUFFIX = '.md.partial'
+
 
 class ArticleViewer:
     def __init__(self, storage_path: str):
@@ -32,6 +44,158 @@ class ArticleViewer:
         self.processed_dir = self.storage_path / 'processed-articles'
         self.metadata_dir = self.storage_path / 'rss-feeds'
         self.state_manager = ArticleStateManager(storage_path)
+        self.index = ArticleIndex(storage_path)
+        self._archive = None
+        self._search_index = None
+        self._render_cache = None
+    
+    @property
+    def archive(self) -> ArticleArchive:
+        """アーカイブ（--include-archive 指定時のみ読み込む）"""
+        if self._archive is None:
+            self._archive = ArticleArchive(str(self.storage_path))
+        return self._archive
+    
+    @staticmethod
+    def strip_front_matter(content: str) -> str:
+        """YAMLフロントマターを除去"""
+        if content.startswith('---'):
+            parts = content.split('---', 2)
+            if len(parts) >= 3:
+                content = parts[2].strip()
+        return content
+    
+    def get_content(self, article: Dict) -> str:
+        """記事本文を取得（初回表示時にファイルまたはアーカイブから読み込み、以降はキャッシュ）"""
+        if article.get('content') is None:
+            if article.get('archived'):
+                content = self.archive.read_summary(article['feed_name'], article['article_id']) or ''
+                article['content'] = self.strip_front_matter(content)
+            else:
+                if article.get('file_path') is None:
+                    article['file_path'] = self.processed_dir / article['feed_name'] / f"{article['article_id']}.md"
+                try:
+                    with open(article['file_path'], 'rb') as f:
+                        f.seek(article.get('body_offset', 0))
+                        article['content'] = f.read().decode('utf-8').strip()
+                except OSError:
+                    article['content'] = ''
+        return article['content']
+    
+    def generating_summaries(self) -> List[Dict]:
+        """
+        生成中の要約（STREAM_SUMMARIES=true の Article Processor が追記している <id>.md.partial）
+        
+        LEASES_ENABLED=true なら、リースが切れた（生成が中断された）ファイルは含めない。
+        """
+        leases = open_leases(str(self.storage_path), 'summarize')
+        items = []
+        for partial_path in self.processed_dir.glob(f'*/*{PARTIAL_SUMMARY_SUFFIX}'):
+            feed_name = partial_path.parent.name
+            article_id = partial_path.name[:-len(PARTIAL_SUMMARY_SUFFIX)]
+            if leases is not None and not leases.is_held(feed_name, article_id):
+                continue
+            try:
+                stat = partial_path.stat()
+                # 追記途中の読み込みで文字の途中が切れることがあるので置換して読む
+                with open(partial_path, 'r', encoding='utf-8', errors='replace') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                continue  # 読む前に確定・破棄された
+            title = next((line[len('title: '):] for line in content.splitlines()[:3]
+                          if line.startswith('title: ')), '')
+            items.append({
+                'feed_name': feed_name,
+                'article_id': article_id,
+                'title': title,
+                'updated_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+                'content': self.strip_front_matter(content),
+            })
+        items.sort(key=lambda item: item['updated_at'], reverse=True)
+        return items
+    
+    @property
+    def render_cache(self):
+        """本文のレンダリングキャッシュ（記事を表示するときだけ生成）"""
+        if self._render_cache is None:
+            from render_cache import RenderCache
+            self._render_cache = RenderCache(console, CONTENT_WIDTH_RATIO)
+        return self._render_cache
+    
+    def render_body(self, article: Dict):
+        """本文のレイアウト結果を取得（レンダリングキャッシュ経由）"""
+        return self.render_cache.get(self._article_key(article), self.get_content(article))
+    
+    def prefetch_neighbors(self, articles: List[Dict], index: int):
+        """前後の記事をバックグラウンドでレンダリングしておく"""
+        if len(articles) < 2:
+            return
+        for neighbor in (articles[(index + 1) % len(articles)], articles[(index - 1) % len(articles)]):
+            self.render_cache.prefetch(self._article_key(neighbor), lambda a=neighbor: self.get_content(a))
+    
+    @staticmethod
+    def _article_key(article: Dict) -> str:
+        return f"{article['feed_name']}/{article['article_id']}"
+    
+    @property
+    def search_index(self):
+        """全文検索インデックス（初回の検索時に記事インデックスと差分同期）"""
+        if self._search_index is None:
+            from search_index import SearchIndex
+            self._search_index = SearchIndex(str(self.storage_path))
+            self.index.refresh()
+            
+            def load_body(feed_name: str, article_id: str) -> str:
+                with open(self.processed_dir / feed_name / f"{article_id}.md", 'r', encoding='utf-8') as f:
+                    return self.strip_front_matter(f.read())
+            
+            documents = ((row['feed_name'], row['article_id'], row['title'] or '', row['summary_mtime'])
+                         for row in self.index.iter_rows())
+            self._search_index.sync(documents, load_body)
+        return self._search_index
+    
+    def search_articles(self, articles: List[Dict], query: str) -> List[Dict]:
+        """記事リストを全文検索し、一致した記事を関連度順に返す"""
+        by_key = {(a['feed_name'], a['article_id']): a for a in articles}
+        results = []
+        # 一覧（フィード・スコア・状態などで絞り込み済み）の中だけで順位付けする
+        for hit in self.search_index.search(query, limit=max(len(by_key), 1), keys=by_key):
+            article = by_key.get((hit['feed_name'], hit['article_id']))
+            if article:
+                results.append(article)
+        return results
+    
+    def _passes_filters(self, article_id: str, metadata: Dict, min_score: Optional[float],
+                        article_type: Optional[str], since_date: Optional[datetime],
+                        show_deleted: bool, unread_only: bool, favorites_only: bool) -> bool:
+        """スコア・タイプ・日付・状態のフィルタを判定"""
+        score = metadata.get('filter_score', 0)
+        if min_score and score < min_score:
+            return False
+        
+        if article_type and metadata.get('article_type') != article_type:
+            return False
+        
+        # 日付フィルタ
+        if since_date:
+            processed_at = metadata.get('processed_at')
+            if processed_at:
+                article_date = datetime.fromisoformat(processed_at.replace('Z', '+00:00'))
+                if article_date < since_date:
+                    return False
+        
+        # 状態フィルタ
+        if not show_deleted and self.state_manager.is_deleted(article_id):
+            return False
+        
+        if unread_only and self.state_manager.is_read(article_id):
+            return False
+        
+        if favorites_only and not self.state_manager.is_favorite(article_id):
+            return False
+        
+        return True
+    
     def load_articles(self, 
                      feed: Optional[str] = None,
                      min_score: Optional[float] = None,
@@ -39,99 +203,112 @@ class ArticleViewer:
                      since_date: Optional[datetime] = None,
                      show_deleted: bool = False,
                      unread_only: bool = False,
-                     favorites_only: bool = False) -> List[Dict]:
-        """記事を読み込み、フィルタリング"""
+                     favorites_only: bool = False,
+                     include_archive: bool = False) -> List[Dict]:
+        """記事を読み込み、フィルタリング（include_archiveでアーカイブ済み記事も含める）"""
         articles = []
+        filters = dict(min_score=min_score, article_type=article_type, since_date=since_date,
+                       show_deleted=show_deleted, unread_only=unread_only, favorites_only=favorites_only)
         
-        if not self.processed_dir.exists():
-            return articles
-        
-        # フィード名のリストを取得
-        feeds = [feed] if feed else [d.name for d in self.processed_dir.iterdir() if d.is_dir()]
+        # 永続インデックスを差分更新し、本文は読まずに一覧を構築
+        self.index.refresh()
         
-        for feed_name in feeds:
-            feed_dir = self.processed_dir / feed_name
-            if not feed_dir.exists():
+        for row in self.index.iter_rows(feed):
+            article_id = row['article_id']
+            metadata = {name: row[name] for name in METADATA_COLUMNS if row.get(name) is not None}
+            
+            if not self._passes_filters(article_id, metadata, **filters):
                 continue
             
-            for md_file in feed_dir.glob('*.md'):
-                article_id = md_file.stem
-                
-                # メタデータを読み込み
-                metadata_file = self.metadata_dir / feed_name / f"{article_id}.json"
-                if not metadata_file.exists():
-                    continue
-                
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                # フィルタリング
-                score = metadata.get('filter_score', 0)
-                if min_score and score < min_score:
-                    continue
-                
-                if article_type and metadata.get('article_type') != article_type:
-                    continue
-                
-                # 日付フィルタ
-                if since_date:
-                    processed_at = metadata.get('processed_at')
-                    if processed_at:
-                        article_date = datetime.fromisoformat(processed_at.replace('Z', '+00:00'))
-                        if article_date < since_date:
-                            continue
-                
-                # 状態フィルタ
-                if not show_deleted and self.state_manager.is_deleted(article_id):
-                    continue
-                
-                if unread_only and self.state_manager.is_read(article_id):
-                    continue
-                
-                if favorites_only and not self.state_manager.is_favorite(article_id):
-                    continue
-                
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # YAMLフロントマターを除去
-                if content.startswith('---'):
-                    parts = content.split('---', 2)
-                    if len(parts) >= 3:
-                        content = parts[2].strip()
-                
-                articles.append({
-                    'feed_name': feed_name,
-                    'article_id': article_id,
-                    'metadata': metadata,
-                    'content': content,
-                    'file_path': md_file,
-                    'is_read': self.state_manager.is_read(article_id),
-                    'is_deleted': self.state_manager.is_deleted(article_id),
-                    'is_favorite': self.state_manager.is_favorite(article_id)
-                })
+            articles.append({
+                'feed_name': row['feed_name'],
+                'article_id': article_id,
+                'metadata': metadata,
+                'published_ts': row['published_ts'],
+                'content': None,
+                'file_path': None,  # 本文を開くときに解決
+                'body_offset': row['body_offset'],
+                'is_read': self.state_manager.is_read(article_id),
+                'is_deleted': self.state_manager.is_deleted(article_id),
+                'is_favorite': self.state_manager.is_favorite(article_id)
+            })
+        
+        if include_archive:
+            articles.extend(self._load_archived_articles(feed, {a['article_id'] for a in articles}, filters))
         
         return articles
     
-    def display_article_list(self, articles: List[Dict], sort_by: str = 'score'):
-        """記事一覧を表示"""
+    def _load_archived_articles(self, feed: Optional[str], live_ids: set, filters: Dict) -> List[Dict]:
+        """アーカイブ済み記事を読み込み（要約は表示時にセグメントからmmapで読み出す）"""
+        articles = []
+        for entry in self.archive.iter_entries():
+            article_id = entry['article_id']
+            if not entry.get('has_summary') or article_id in live_ids:
+                continue
+            if feed and entry['feed_name'] != feed:
+                continue
+            
+            metadata = entry.get('metadata', {})
+            if not self._passes_filters(article_id, metadata, **filters):
+                continue
+            
+            articles.append({
+                'feed_name': entry['feed_name'],
+                'article_id': article_id,
+                'metadata': metadata,
+                'published_ts': parse_published(metadata.get('published', '')),
+                'content': None,
+                'file_path': None,
+                'archived': True,
+                'is_read': self.state_manager.is_read(article_id),
+                'is_deleted': self.state_manager.is_deleted(article_id),
+                'is_favorite': self.state_manager.is_favorite(article_id)
+            })
+        return articles
+    
+    @staticmethod
+    def sort_articles(articles: List[Dict], sort_by: str = 'score'):
+        """記事をソート（dateは公開日のタイムスタンプ順、パースできない記事は末尾）"""
+        if sort_by == 'date':
+            articles.sort(key=lambda x: x.get('published_ts') or 0.0, reverse=True)
+        else:
+            articles.sort(key=lambda x: x['metadata'].get('filter_score', 0), reverse=True)
+    
+    @staticmethod
+    def page_size() -> int:
+        """1ページの件数（端末の高さからヘッダー・フッター分を除く）"""
+        if LIST_PAGE_SIZE > 0:
+            return LIST_PAGE_SIZE
+        return max(console.height - 10, 5)
+    
+    def page_count(self, articles: List[Dict]) -> int:
+        return max((len(articles) + self.page_size() - 1) // self.page_size(), 1)
+    
+    def display_article_list(self, articles: List[Dict], sort_by: str = 'score', page: int = 1):
+        """記事一覧の1ページ分を表示（表示するページの行だけを組み立てる）"""
+        page_size = self.page_size()
+        total_pages = self.page_count(articles)
+        page = min(max(page, 1), total_pages)
+        start = (page - 1) * page_size
+        
         # 統計情報を表示
         stats = self.state_manager.get_stats()
-        unread_count = len([a for a in articles if not a['is_read']])
+        unread_count = sum(1 for a in articles if not a['is_read'])
         
         table = Table(
             title=f"📚 記事一覧 ({len(articles)}件) | 未読: {unread_count} | ⭐: {stats['favorite_count']}",
+            caption=f"ページ {page}/{total_pages}",
             box=box.ROUNDED,
             show_lines=False
         )
-        table.add_column("#", style="cyan", width=4, no_wrap=True)
+        table.add_column("#", style="cyan", width=len(str(len(articles))) + 1, no_wrap=True)
         table.add_column("状態", style="yellow", width=4, no_wrap=True)
         table.add_column("Feed", style="magenta", width=10, no_wrap=True)
         table.add_column("タイトル", style="white", width=50, no_wrap=True)
         table.add_column("Score", style="green", width=5, no_wrap=True)
         table.add_column("Type", style="blue", width=8, no_wrap=True)
         
-        for idx, article in enumerate(articles, 1):
+        for idx, article in enumerate(articles[start:start + page_size], start + 1):
             metadata = article['metadata']
             title = metadata.get('title', 'No Title')
             # タイトルを50文字に制限
@@ -174,6 +351,41 @@ class ArticleViewer:
         
         console.print(table)
     
+    def browse_article_list(self, articles: List[Dict], sort_by: str = 'score', page: int = 1) -> Optional[int]:
+        """
+        記事リストをページ単位で閲覧
+        
+        Returns:
+            番号で選択された記事のインデックス（選択せずに戻った場合はNone）
+        """
+        total_pages = self.page_count(articles)
+        page = min(max(page, 1), total_pages)
+        
+        while True:
+            console.clear()
+            self.display_article_list(articles, sort_by=sort_by, page=page)
+            console.print("[cyan]  [N]ext page | [P]rev page | [G]数字でページ移動 | [数字]で記事を開く | [Q]戻る[/cyan]")
+            
+            try:
+                choice = input("選択 (n): ").strip().lower() or 'n'
+            except (EOFError, KeyboardInterrupt):
+                return None
+            
+            if choice == 'n':
+                page = page % total_pages + 1
+            elif choice == 'p':
+                page = (page - 2) % total_pages + 1
+            elif choice.startswith('g') and choice[1:].strip().isdigit():
+                page = min(max(int(choice[1:].strip()), 1), total_pages)
+            elif choice.isdigit():
+                idx = int(choice) - 1
+                if 0 <= idx < len(articles):
+                    return idx
+                console.print(f"[red]無効な番号です(1-{len(articles)})[/red]")
+                input("Enterで続行: ")
+            elif choice == 'q':
+                return None
+    
     def display_article(self, article: Dict, index: int, total: int):
         """個別記事を表示"""
         metadata = article['metadata']
@@ -215,8 +427,7 @@ class ArticleViewer:
         console.print()
         
         # 本文を中央寄せで表示（通常表示時も同様）
-        md = Markdown(article['content'])
-        centered_content = Align.center(md, width=int(console.width * CONTENT_WIDTH_RATIO))
+        centered_content = Align.center(self.render_body(article), width=int(console.width * CONTENT_WIDTH_RATIO))
         console.print(centered_content)
     
     def display_article_with_pager(self, article: Dict, index: int, total: int):
@@ -240,6 +451,8 @@ class ArticleViewer:
             status_icons.append('✓ 既読')
         else:
             status_icons.append('● 未読')
+        if article.get('archived'):
+            status_icons.append('📦 アーカイブ')
         status = ' | '.join(status_icons)
         
         # ページャーで全体を表示
@@ -266,24 +479,28 @@ class ArticleViewer:
             console.print(Align.center(separator, style="cyan"))
             console.print()
             
-            # 本文を中央寄せで表示（左右に余白）
-            md = Markdown(article['content'])
-            # 定数で定義された幅で中央寄せ
-            centered_content = Align.center(md, width=content_width)
+            # 本文を中央寄せで表示（左右に余白、レイアウト済みならキャッシュから）
+            centered_content = Align.center(self.render_body(article), width=content_width)
             console.print(centered_content)
     
     def interactive_mode(self, articles: List[Dict]):
         """インタラクティブモード"""
+        import readline  # noqa: F401  readlineキーバインドを有効化（対話時のみ）
+        
         if not articles:
             console.print("[yellow]表示する記事がありません[/yellow]")
             return
         
         current_index = 0
+        # 検索で絞り込む前の記事リスト（空の検索で元に戻す）
+        all_articles = articles
         
         while True:
             console.clear()
             current_article = articles[current_index]
             
+            # 読んでいる間に前後の記事をレンダリングしておく（ページャーは閉じるまで戻らないため、開く前に始める）
+            self.prefetch_neighbors(articles, current_index)
             self.display_article_with_pager(current_article, current_index + 1, len(articles))
             
             # 操作メニューを中央寄せで表示
@@ -295,7 +512,7 @@ class ArticleViewer:
                 menu_line1 = "  [N]最初に戻る | [P]rev | [L]ist | [Q]uit | [O]pen URL | [数字]で直接移動"
             else:
                 menu_line1 = "  [N]ext | [P]rev | [L]ist | [Q]uit | [O]pen URL | [数字]で直接移動"
-            menu_line2 = "  [R]ead/Unread | [F]avorite | [D]elete | [U]ndelete"
+            menu_line2 = "  [R]ead/Unread | [F]avorite | [D]elete | [U]ndelete | [S]earch"
             
             console.print(Align.center(separator, width=int(console.width * CONTENT_WIDTH_RATIO)))
             console.print(Align.center(menu_title, width=int(console.width * CONTENT_WIDTH_RATIO)))
@@ -335,10 +552,13 @@ class ArticleViewer:
                     current_article['is_read'] = True
                 current_index = (current_index - 1) % len(articles)
             elif choice == 'l':
-                console.clear()
-                self.display_article_list(articles)
-                console.print()
-                input(f"{left_padding}Enterで続行: ")
+                # 現在の記事を含むページからリストを開き、番号で選んだ記事へ移動
+                idx = self.browse_article_list(articles, page=current_index // self.page_size() + 1)
+                if idx is not None and idx != current_index:
+                    if not current_article['is_read']:
+                        self.state_manager.mark_as_read(current_article['article_id'])
+                        current_article['is_read'] = True
+                    current_index = idx
             elif choice == 'q':
                 break
             elif choice == 'r':
@@ -354,7 +574,6 @@ class ArticleViewer:
                     current_article['is_read'] = True
                     console.print(Align.center("[green]既読にマークしました[/green]"))
                     # 既読マーク後は自動で次の記事へ（0.5秒待機）
-                    import time
                     time.sleep(0.5)
                     current_index = (current_index + 1) % len(articles)
             elif choice == 'f':
@@ -396,7 +615,6 @@ class ArticleViewer:
                         break
                     current_index = min(current_index, len(articles) - 1)
                     # 自動で次の記事へ進む（0.5秒待機）
-                    import time
                     time.sleep(0.5)
             elif choice == 'u':
                 # 削除解除（削除済み記事を表示している場合）
@@ -405,6 +623,22 @@ class ArticleViewer:
                 current_article['is_deleted'] = False
                 console.print("[green]削除を解除しました[/green]")
                 input("Enterで続行: ")
+            elif choice == 's':
+                # 全文検索（空入力で検索を解除）
+                query = input(f"{left_padding}検索キーワード（空Enterで解除）: ").strip()
+                if not query:
+                    articles = [a for a in all_articles if not a['is_deleted']]
+                    current_index = 0
+                    continue
+                results = self.search_articles([a for a in all_articles if not a['is_deleted']], query)
+                if results:
+                    articles = results
+                    current_index = 0
+                    console.print(Align.center(f"[green]🔍 「{query}」: {len(results)}件[/green]"))
+                    time.sleep(0.5)
+                else:
+                    console.print(Align.center(f"[yellow]「{query}」に一致する記事はありません[/yellow]"))
+                    input(f"{left_padding}Enterで続行: ")
             elif choice == 'o':
                 # 元記事のURLを表示（中央寄せ）
                 url = current_article['metadata'].get('url', '')
@@ -433,6 +667,10 @@ class ArticleViewer:
                 else:
                     console.print(Align.center(f"[red]無効な番号です(1-{len(articles)})[/red]"))
                     input(f"{left_padding}Enterで続行: ")
+        
+        # 未実行の先読みを破棄
+        if self._render_cache is not None:
+            self._render_cache.shutdown()
 
 
 def main():
@@ -445,6 +683,7 @@ def main():
     parser.add_argument('--week', action='store_true', help='今週処理された記事のみ')
     parser.add_argument('--sort', choices=['score', 'date'], default='score', help='ソート順')
     parser.add_argument('--list-only', action='store_true', help='リスト表示のみ（インタラクティブモードに入らない）')
+    parser.add_argument('--page', type=int, default=1, help='--list-only で表示するページ番号')
     parser.add_argument('--interactive', '-i', action='store_true', help='インタラクティブモード（デフォルト）')
     
     # 状態フィルタ
@@ -452,9 +691,36 @@ def main():
     parser.add_argument('--favorites', action='store_true', help='お気に入り記事のみ表示')
     parser.add_argument('--show-deleted', action='store_true', help='削除済み記事も表示')
     parser.add_argument('--stats', action='store_true', help='統計情報を表示')
+    parser.add_argument('--search', metavar='QUERY', help='全文検索（一致した記事を関連度順に表示）')
+    parser.add_argument('--refresh-index', action='store_true', help='記事インデックスを全ファイルのstatで再検証')
+    parser.add_argument('--include-archive', action='store_true', help='data-cleanupでアーカイブされた記事も表示')
+    
+    # 静的サイトエクスポート
+    parser.add_argument('--export-site', metavar='DIR', help='要約記事を静的HTMLサイトとして出力（変更された記事のみ再生成）')
+    parser.add_argument('--export-full', action='store_true', help='--export-site でビルドマニフェストを無視して全記事を再生成')
+    
+    # APIサーバーモード
+    parser.add_argument('--serve', action='store_true', help='HTTP/JSON APIサーバーとして起動')
+    parser.add_argument('--host', default=os.getenv('VIEWER_API_HOST', '0.0.0.0'), help='APIサーバーの待ち受けアドレス')
+    parser.add_argument('--port', type=int, default=int(os.getenv('VIEWER_API_PORT', '8080')), help='APIサーバーのポート')
+    
+    # プロファイル
+    parser.add_argument('--profile', nargs='?', const='sample', choices=MODES,
+                        help='プロファイルを storage/profiles/ に出力（PROFILE=sample|cprofile と同じ）')
     
     args = parser.parse_args()
+    mode = args.profile or profile_mode([])
+    if mode:
+        # 出力先をログで表示
+        logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'),
+                            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
+    with profiled('article-viewer', args.storage, mode):
+        run(args)
+
+
+def run(args):
+    """引数に応じて一覧表示・インタラクティブモード・エクスポート・APIサーバーを実行"""
     # 日付フィルタの設定
     since_date = None
     if args.today:
@@ -465,6 +731,25 @@ def main():
     # Article Viewerの初期化
     viewer = ArticleViewer(args.storage)
     
+    # APIサーバーとして起動
+    if args.serve:
+        from api_server import serve
+        logging.basicConfig(
+            level=os.getenv('LOG_LEVEL', 'INFO'),
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        serve(viewer, args.host, args.port)
+        return
+    
+    # 静的サイトとして出力
+    if args.export_site:
+        from site_export import SiteExporter
+        console.print(f"[cyan]サイトをエクスポート中: {args.export_site}[/cyan]")
+        result = SiteExporter(viewer, args.export_site).export(full=args.export_full)
+        console.print(f"[green]✓ {result['articles']}記事（再生成 {result['rendered']}件、削除 {result['removed']}件、"
+                      f"一覧ページ更新 {result['index_pages']}件）[/green]")
+        return
+    
     # 統計情報のみ表示
     if args.stats:
         stats = viewer.state_manager.get_stats()
@@ -478,6 +763,9 @@ def main():
     # 記事を読み込み
     console.print("[cyan]記事を読み込み中...[/cyan]")
     
+    if args.refresh_index:
+        viewer.index.refresh(full=True)
+    
     # デフォルトで未読のみ表示（--allで既読も表示）
     unread_only = not args.all and not args.favorites  # favoritesの場合は既読も含む
     
@@ -492,20 +780,22 @@ def main():
         since_date=since_date,
         show_deleted=args.show_deleted,
         unread_only=unread_only,
-        favorites_only=args.favorites
+        favorites_only=args.favorites,
+        include_archive=args.include_archive
     )
     
     # ソート
-    if args.sort == 'score':
-        articles.sort(key=lambda x: x['metadata'].get('filter_score', 0), reverse=True)
+    if args.search:
+        # 全文検索の結果は関連度順
+        articles = viewer.search_articles(articles, args.search)
     else:
-        articles.sort(key=lambda x: x['metadata'].get('published', ''), reverse=True)
+        viewer.sort_articles(articles, args.sort)
     
     console.clear()
     
     # 表示
     if args.list_only:
-        viewer.display_article_list(articles, sort_by=args.sort)
+        viewer.display_article_list(articles, sort_by=args.sort, page=args.page)
     else:
         # デフォルトはインタラクティブモード
         viewer.interactive_mode(articles)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+本文レンダリングキャッシュ - Markdownのレイアウト結果をLRUで保持し、前後の記事を先読み
+
+キーは (記事キー, 本文のハッシュ, 端末幅, 本文幅の比率)。端末幅や本文が変われば
+別のキーになるので、古いレイアウトを誤って表示することはない。
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.markdown import Markdown
+from rich.measure import Measurement
+from rich.segment import Segment
+
+
+class RenderedLines:
+    """レイアウト済みの行（Segmentのリスト）をそのまま出力するrenderable"""
+
+    def __init__(self, lines: List[List[Segment]], width: int):
+        self.lines = lines
+        self.width = width
+
+    def __rich_measure__(self, console: Console, options: ConsoleOptions) -> Measurement:
+        return Measurement(self.width, self.width)
+
+    def __rich_console__(self, console: Console, options: ConsoleOptions) -> RenderResult:
+        new_line = Segment.line()
+        for line in self.lines:
+            yield from line
+            yield new_line
+
+
+class RenderCache:
+    """
+    Markdown本文のレイアウト結果のLRUキャッシュ
+
+    先読みは1スレッドのバックグラウンドワーカーで行い、同じキーの
+    レンダリングが進行中なら表示側はその完了を待つ（二重にレンダリングしない）。
+    """
+
+    def __init__(self, console: Console, width_ratio: float, max_entries: Optional[int] = None):
+        self.console = console
+        self.width_ratio = width_ratio
+        self.max_entries = max_entries or int(os.getenv('VIEWER_RENDER_CACHE_SIZE', '32'))
+        self._entries: 'OrderedDict[Tuple, RenderedLines]' = OrderedDict()
+        self._pending: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render-prefetch')
+        self.hits = 0
+        self.misses = 0
+
+    def content_width(self, terminal_width: int) -> int:
+        return int(terminal_width * self.width_ratio)
+
+    def _key(self, article_key: str, content: str, terminal_width: int) -> Tuple:
+        content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        return (article_key, content_hash, terminal_width, self.width_ratio)
+
+    def _render(self, content: str, width: int) -> RenderedLines:
+        """本文をレイアウト（スレッドごとに専用のConsoleで描画し、表示側と干渉しない）"""
+        render_console = Console(
+            width=width,
+            color_system=self.console.color_system,
+            force_terminal=self.console.is_terminal,
+            legacy_windows=False
+        )
+        lines = render_console.render_lines(Markdown(content), render_console.options, pad=False)
+        return RenderedLines(lines, width)
+
+    def _store(self, key: Tuple, rendered: RenderedLines):
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, key: Tuple) -> Optional[RenderedLines]:
+        rendered = self._entries.get(key)
+        if rendered is not None:
+            self._entries.move_to_end(key)
+        return rendered
+
+    def get(self, article_key: str, content: str) -> RenderedLines:
+        """レイアウト済みの本文を取得（キャッシュになければその場でレンダリング）"""
+        terminal_width = self.console.width
+        key = self._key(article_key, content, terminal_width)
+        with self._lock:
+            rendered = self._lookup(key)
+            future = self._pending.get((article_key, terminal_width)) if rendered is None else None
+
+        # 先読み中ならその完了を待つ
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
+            with self._lock:
+                rendered = self._lookup(key)
+
+        with self._lock:
+            if rendered is not None:
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        rendered = self._render(content, self.content_width(terminal_width))
+        self._store(key, rendered)
+        return rendered
+
+    def prefetch(self, article_key: str, load_content: Callable[[], str]):
+        """バックグラウンドでレンダリングしてキャッシュに載せる（本文の読み込みもワーカー側で行う）"""
+        terminal_width = self.console.width
+        slot = (article_key, terminal_width)
+
+        def task():
+            try:
+                content = load_content()
+                key = self._key(article_key, content, terminal_width)
+                with self._lock:
+                    if key in self._entries:
+                        return
+                self._store(key, self._render(content, self.content_width(terminal_width)))
+            finally:
+                with self._lock:
+                    self._pending.pop(slot, None)
+
+        with self._lock:
+            if slot in self._pending:
+                return
+            self._pending[slot] = self._executor.submit(task)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
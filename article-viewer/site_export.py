@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+静的サイトエクスポート - 要約記事をHTMLのダイジェストサイトとして出力
+
+記事ページ（articles/{feed}/{id}.html）、フィード・タイプ・スコア別の一覧ページ、
+クライアント側検索用のJSONマニフェスト（search.json）を生成する。
+ビルドマニフェスト（.build-manifest.json）に記事ごとのmtimeと内容ハッシュを記録し、
+新規・変更された記事だけを再レンダリングする。
+"""
+import os
+import json
+import html
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from markdown_it import MarkdownIt
+
+from storage_writer import StorageWriter
+
+logger = logging.getLogger(__name__)
+
+# テンプレートを変えたら上げる（全記事を再レンダリングさせる）
+TEMPLATE_VERSION = 1
+
+# スコア別一覧ページの下限（9点以上、8点以上、...）
+SCORE_THRESHOLDS = (9, 8, 7, 6)
+
+# 検索マニフェストに含める本文の文字数
+SEARCH_TEXT_LENGTH = 400
+
+STYLE = """
+body { font-family: -apple-system, BlinkMacSystemFont, "Hiragino Sans", "Noto Sans JP", sans-serif;
+       max-width: 46rem; margin: 2rem auto; padding: 0 1rem; line-height: 1.7; color: #222; }
+nav a { margin-right: 1rem; }
+table { border-collapse: collapse; width: 100%; }
+td, th { padding: .3rem .5rem; border-bottom: 1px solid #ddd; text-align: left; vertical-align: top; }
+.meta { color: #666; font-size: .9rem; }
+.score { font-weight: bold; }
+"""
+
+_markdown = None
+
+
+def _render_markdown(text: str) -> str:
+    global _markdown
+    if _markdown is None:
+        # 要約はLLMの出力なので生HTMLは無効化する
+        _markdown = MarkdownIt('commonmark', {'html': False}).enable('table')
+    return _markdown.render(text)
+
+
+def page(title: str, body: str, root: str) -> str:
+    """共通レイアウトでHTMLページを組み立て"""
+    return f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)}</title>
+<style>{STYLE}</style>
+</head>
+<body>
+<nav><a href="{root}index.html">📚 すべての記事</a></nav>
+{body}
+</body>
+</html>
+"""
+
+
+def render_article_page(job: Tuple[str, Dict, str]) -> str:
+    """
+    記事ページを生成してファイルに書き込む（プロセスプールのワーカーで実行）
+
+    Args:
+        job: (出力先パス, 記事のメタデータ, 要約本文のMarkdown)
+
+    Returns:
+        出力先パス
+    """
+    output_path, article, content = job
+    metadata = article['metadata']
+    title = metadata.get('title', 'No Title')
+    url = metadata.get('url', '')
+    body = f"""<article>
+<h1>{html.escape(title)}</h1>
+<p class="meta">
+{html.escape(article['feed_name'])} | {html.escape(str(metadata.get('article_type', 'N/A')))}
+| <span class="score">Score: {html.escape(str(metadata.get('filter_score', 'N/A')))}</span>
+| {html.escape(metadata.get('published', ''))}
+</p>
+<p><a href="{html.escape(url)}">元記事を開く</a></p>
+{_render_markdown(content)}
+</article>"""
+
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 出力は作り直せるのでfsyncしない
+    StorageWriter(fsync=False).write_text(path, page(title, body, '../../'))
+    return output_path
+
+
+class SiteExporter:
+    """要約記事を静的HTMLサイトとして増分エクスポート"""
+
+    def __init__(self, viewer, output_dir: str, workers: Optional[int] = None):
+        self.viewer = viewer
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / '.build-manifest.json'
+        self.workers = workers or int(os.getenv('EXPORT_WORKERS', str(os.cpu_count() or 1)))
+        # 出力は作り直せるのでfsyncしない
+        self.writer = StorageWriter(fsync=False)
+
+    @staticmethod
+    def article_path(article: Dict) -> str:
+        return f"articles/{article['feed_name']}/{article['article_id']}.html"
+
+    def _load_manifest(self) -> Tuple[Dict[str, Dict], bool]:
+        """
+        前回のビルドマニフェストを読み込み
+
+        Returns:
+            (記事ごとのエントリ, テンプレートのバージョンが同じか)。
+            バージョンが違っても、前回出力したページの削除には使う
+        """
+        if not self.manifest_path.exists():
+            return {}, False
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, False
+        return data.get('articles', {}), data.get('template_version') == TEMPLATE_VERSION
+
+    def _save_manifest(self, entries: Dict[str, Dict]):
+        self.writer.write_json(self.manifest_path, {'template_version': TEMPLATE_VERSION, 'articles': entries})
+
+    def _write_if_changed(self, relative_path: str, text: str) -> bool:
+        """内容が変わったときだけ書き込む（一覧ページのmtimeを不要に更新しない）"""
+        path = self.output_dir / relative_path
+        data = text.encode('utf-8')
+        try:
+            if path.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer.write_bytes(path, data)
+        return True
+
+    @staticmethod
+    def content_hash(article: Dict, content: str) -> str:
+        """ページの内容を決める入力（本文・表示するメタデータ）のハッシュ"""
+        payload = json.dumps([article['metadata'], content], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _plan(self, articles: List[Dict], manifest: Dict[str, Dict]) -> Tuple[List[Tuple], Dict[str, Dict]]:
+        """
+        再レンダリングが必要な記事を判定
+
+        mtimeが前回と同じ記事は本文を読まずにスキップし、mtimeが変わっていても
+        内容ハッシュが同じならmtimeだけ更新してスキップする。
+        """
+        jobs = []
+        entries = {}
+        for article in articles:
+            key = f"{article['feed_name']}/{article['article_id']}"
+            output_path = self.output_dir / self.article_path(article)
+            previous = manifest.get(key)
+            mtimes = [article['summary_mtime'], article['metadata_mtime']]
+            if previous and previous['mtimes'] == mtimes and output_path.exists():
+                entries[key] = previous
+                continue
+
+            content = self.viewer.get_content(dict(article, content=None))
+            digest = self.content_hash(article, content)
+            # 検索マニフェスト用の抜粋もここで作っておく（変更のない記事の本文は読まない）
+            entries[key] = {'mtimes': mtimes, 'hash': digest,
+                            'text': ' '.join(content.split())[:SEARCH_TEXT_LENGTH]}
+            if previous and previous['hash'] == digest and output_path.exists():
+                continue
+            jobs.append((str(output_path), {'feed_name': article['feed_name'], 'metadata': article['metadata']}, content))
+        return jobs, entries
+
+    def _render(self, jobs: List[Tuple]):
+        """記事ページをレンダリング（件数が多ければプロセスプールで並列化）"""
+        if self.workers <= 1 or len(jobs) < self.workers * 4:
+            for job in jobs:
+                render_article_page(job)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for _ in executor.map(render_article_page, jobs, chunksize=16):
+                pass
+
+    def _remove_stale(self, manifest: Dict[str, Dict], entries: Dict[str, Dict]) -> int:
+        """一覧から消えた記事のページを削除（記事がなくなったフィードのディレクトリも削除）"""
+        removed = 0
+        feed_dirs = set()
+        for key in manifest.keys() - entries.keys():
+            feed_name, article_id = key.split('/', 1)
+            path = self.output_dir / 'articles' / feed_name / f"{article_id}.html"
+            path.unlink(missing_ok=True)
+            feed_dirs.add(path.parent)
+            removed += 1
+        for feed_dir in feed_dirs:
+            try:
+                feed_dir.rmdir()
+            except OSError:
+                pass  # まだ記事ページがある
+        return removed
+
+    def _list_page(self, title: str, articles: List[Dict], root: str) -> str:
+        rows = []
+        for article in articles:
+            metadata = article['metadata']
+            rows.append(
+                f"<tr><td class=\"score\">{html.escape(str(metadata.get('filter_score', '')))}</td>"
+                f"<td><a href=\"{root}{self.article_path(article)}\">{html.escape(metadata.get('title', 'No Title'))}</a></td>"
+                f"<td>{html.escape(article['feed_name'])}</td>"
+                f"<td>{html.escape(str(metadata.get('article_type', '')))}</td></tr>"
+            )
+        body = (f"<h1>{html.escape(title)} ({len(articles)}件)</h1>\n"
+                f"<table>\n<tr><th>Score</th><th>タイトル</th><th>Feed</th><th>Type</th></tr>\n"
+                + "\n".join(rows) + "\n</table>")
+        return page(title, body, root)
+
+    def _write_index_pages(self, articles: List[Dict]) -> int:
+        """
+        全体・フィード別・タイプ別・スコア別の一覧ページを生成
+
+        Returns:
+            書き込んだ・削除した一覧ページの数
+        """
+        pages = {'index.html': self._list_page('すべての記事', articles, '')}
+
+        groups: Dict[str, Dict[str, List[Dict]]] = {'feeds': {}, 'types': {}}
+        for article in articles:
+            groups['feeds'].setdefault(article['feed_name'], []).append(article)
+            groups['types'].setdefault(str(article['metadata'].get('article_type', 'unknown')), []).append(article)
+        for group, members in groups.items():
+            for name, group_articles in members.items():
+                pages[f"{group}/{name}.html"] = self._list_page(f"{name} の記事", group_articles, '../')
+        for threshold in SCORE_THRESHOLDS:
+            scored = [a for a in articles if (a['metadata'].get('filter_score') or 0) >= threshold]
+            pages[f"scores/{threshold}.html"] = self._list_page(f"スコア {threshold} 以上の記事", scored, '../')
+
+        # トップページにフィード・タイプ・スコアへのリンクを追加
+        links = ' '.join(f'<a href="{path}">{html.escape(Path(path).stem)}</a>'
+                         for path in sorted(pages) if path != 'index.html')
+        pages['index.html'] = pages['index.html'].replace('</nav>', f'</nav>\n<nav>{links}</nav>', 1)
+
+        written = sum(self._write_if_changed(path, text) for path, text in pages.items())
+
+        # なくなったフィード・記事タイプの一覧ページを削除
+        for group in ('feeds', 'types', 'scores'):
+            group_dir = self.output_dir / group
+            if not group_dir.is_dir():
+                continue
+            for path in group_dir.glob('*.html'):
+                if f"{group}/{path.name}" not in pages:
+                    path.unlink(missing_ok=True)
+                    written += 1
+        return written
+
+    def _write_search_manifest(self, articles: List[Dict], entries: Dict[str, Dict]):
+        """クライアント側検索用のJSONマニフェスト（本文の抜粋はビルドマニフェストから）"""
+        documents = []
+        for article in articles:
+            metadata = article['metadata']
+            entry = entries[f"{article['feed_name']}/{article['article_id']}"]
+            documents.append({
+                'path': self.article_path(article),
+                'title': metadata.get('title', ''),
+                'feed': article['feed_name'],
+                'type': metadata.get('article_type'),
+                'score': metadata.get('filter_score'),
+                'published': (datetime.fromtimestamp(article['published_ts'], timezone.utc).isoformat()
+                              if article.get('published_ts') else None),
+                'text': entry.get('text', '')
+            })
+        self._write_if_changed('search.json', json.dumps({'documents': documents}, ensure_ascii=False,
+                                                         separators=(',', ':')))
+
+    def export(self, full: bool = False) -> Dict[str, int]:
+        """
+        サイトをエクスポート（full=Trueならビルドマニフェストを無視して全記事を再レンダリング）
+
+        削除マークのついた記事は出力しない。
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # 追記による変更はディレクトリのmtimeに現れないので、全ファイルをstatして検出する
+        self.viewer.index.refresh(full=True)
+        articles = [
+            {
+                'feed_name': row['feed_name'],
+                'article_id': row['article_id'],
+                'metadata': {name: row[name] for name in ('title', 'url', 'author', 'published',
+                                                          'filter_score', 'article_type') if row.get(name) is not None},
+                'published_ts': row['published_ts'],
+                'summary_mtime': row['summary_mtime'],
+                'metadata_mtime': row['metadata_mtime'],
+                'body_offset': row['body_offset'],
+                'content': None,
+                'file_path': None
+            }
+            for row in self.viewer.index.iter_rows()
+            if not self.viewer.state_manager.is_deleted(row['article_id'])
+        ]
+        articles.sort(key=lambda a: (-(a['metadata'].get('filter_score') or 0), -(a['published_ts'] or 0.0)))
+
+        # 前回のマニフェストは --export-full やテンプレート変更時も、消えた記事のページの削除に使う
+        manifest, template_matches = self._load_manifest()
+        jobs, entries = self._plan(articles, manifest if template_matches and not full else {})
+        self._render(jobs)
+        removed = self._remove_stale(manifest, entries)
+        index_pages = self._write_index_pages(articles)
+        self._write_search_manifest(articles, entries)
+        self._save_manifest(entries)
+
+        result = {'articles': len(articles), 'rendered': len(jobs), 'removed': removed, 'index_pages': index_pages}
+        logger.info(f"サイトエクスポート完了: {result}")
+        return result
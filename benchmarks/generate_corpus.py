@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+合成コーパス生成 - 大規模なストレージを実際のサービスと同じ形式で作成
+
+    python benchmarks/generate_corpus.py /tmp/corpus --articles 100000 [--feeds 20] [--seed 42]
+
+rss-feeds（メタデータ＋判定結果・ハッシュ）、scraped-articles（本文）、
+processed-articles（フロントマター付き要約）、article_states.json（既読・お気に入り・削除）を生成する。
+各ステージの処理済み・処理待ちの割合は引数で指定でき、ハッシュとmtimeの順序も
+実際のパイプラインと同じになるので、各サービスの探索処理をそのまま計測できる。
+"""
+import sys
+import random
+import hashlib
+import argparse
+import time
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'shared' / 'lib'))
+from storage_writer import StorageWriter  # noqa: E402
+
+ARTICLE_TYPES = ('news', 'tutorial')
+
+TOPICS = ('Bedrock', 'Lambda', 'Azure OpenAI', 'LLM', 'RAG', 'Kubernetes', 'コンテナ', 'サーバレス',
+          'ベクトル検索', 'エージェント', 'ファインチューニング', 'Document Intelligence', 'AI Search')
+WORDS = ('モデル', '推論', 'レイテンシ', 'スループット', 'コスト', 'デプロイ', 'API', 'プロンプト',
+         '評価', 'データ', 'パイプライン', 'キャッシュ', 'スケール', 'セキュリティ', '監視', '運用',
+         'the', 'model', 'service', 'release', 'performance', 'region', 'support', 'update')
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + '。'
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return ''.join(sentence(rng, rng.randint(6, 16)) for _ in range(sentences))
+
+
+def feed_hash(title: str, summary: str) -> str:
+    """RSS Feeder と同じフィード内容ハッシュ"""
+    return hashlib.sha256(f"{title}\n{summary}".encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(text: str) -> str:
+    """Web Scraper と同じ本文ハッシュ"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def scraped_text(rng: random.Random, title: str, size: int) -> str:
+    parts = [f"# {title}\n"]
+    while sum(len(p) for p in parts) < size:
+        parts.append(f"## {rng.choice(TOPICS)}\n\n{paragraph(rng, rng.randint(3, 6))}\n")
+    return '\n'.join(parts)
+
+
+def summary_text(rng: random.Random, feed_name: str, metadata: dict) -> str:
+    """Article Processor と同じフロントマター付きの要約"""
+    header = f"""---
+title: {metadata['title']}
+url: {metadata['url']}
+author: {metadata['author']}
+published: {metadata['published']}
+feed: {feed_name}
+---
+
+"""
+    body = [f"## 概要\n\n{paragraph(rng, 3)}\n"]
+    for point in range(rng.randint(2, 4)):
+        body.append(f"### ポイント{point + 1}\n\n{paragraph(rng, 2)}\n")
+    body.append(f"## 考察\n\n{paragraph(rng, 2)}\n")
+    return header + '\n'.join(body)
+
+
+def generate(output: Path, articles: int, feeds: int, days: int, seed: int,
+             judged: float, pass_rate: float, scraped: float, summarized: float,
+             read: float, favorite: float, deleted: float, body_size: int,
+             threshold: float = 6.0) -> dict:
+    """
+    合成コーパスを生成
+
+    Returns:
+        各ステージの件数
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    feed_names = [f"feed-{i:03d}" for i in range(feeds)]
+    counts = {'articles': 0, 'judged': 0, 'passed': 0, 'scraped': 0, 'summarized': 0}
+    states = {'read': {}, 'deleted': {}, 'favorite': {}, 'archived': {}}
+
+    for feed_name in feed_names:
+        for tree in ('rss-feeds', 'scraped-articles', 'processed-articles'):
+            (output / tree / feed_name).mkdir(parents=True, exist_ok=True)
+
+    # 生成したコーパスは作り直せるのでfsyncしない
+    with StorageWriter(fsync=False) as writer:
+        for i in range(articles):
+            feed_name = feed_names[i % feeds]
+            url = f"https://{feed_name}.example.com/posts/{i}"
+            article_id = hashlib.md5(url.encode()).hexdigest()[:12]
+            title = f"{rng.choice(TOPICS)}の{rng.choice(WORDS)}を改善する方法 #{i}"
+            summary = paragraph(rng, 2)
+            published = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            metadata = {
+                'id': article_id,
+                'feed_name': feed_name,
+                'title': title,
+                'url': url,
+                'published': format_datetime(published),
+                'author': f"author{rng.randint(1, 200)}",
+                'summary': summary,
+                'feed_hash': feed_hash(title, summary),
+                'fetched_at': published.isoformat()
+            }
+            counts['articles'] += 1
+            text = None
+
+            if rng.random() < judged:
+                passed = rng.random() < pass_rate
+                score = round(rng.uniform(threshold, 10) if passed else rng.uniform(0, threshold - 0.5), 1)
+                metadata.update({
+                    'filter_score': score,
+                    'filter_reason': sentence(rng, 10),
+                    'interest_match': rng.sample(TOPICS, 2),
+                    'article_type': rng.choice(ARTICLE_TYPES),
+                    'judged_feed_hash': metadata['feed_hash']
+                })
+                counts['judged'] += 1
+                if passed:
+                    counts['passed'] += 1
+                    if rng.random() < scraped:
+                        text = scraped_text(rng, title, rng.randint(body_size // 2, body_size * 3 // 2))
+                        metadata['scraped_feed_hash'] = metadata['feed_hash']
+                        metadata['scraped_hash'] = content_hash(text)
+                        counts['scraped'] += 1
+
+            summarize = text is not None and rng.random() < summarized
+            if summarize:
+                metadata['summary_source_hash'] = metadata['scraped_hash']
+                counts['summarized'] += 1
+
+            # 実際のパイプラインと同じく メタデータ → 本文 → 要約 の順に書く（mtimeの大小関係を揃える）
+            writer.write_json(output / 'rss-feeds' / feed_name / f"{article_id}.json", metadata)
+            if text is not None:
+                writer.write_text(output / 'scraped-articles' / feed_name / f"{article_id}.md", text)
+            if summarize:
+                writer.write_text(output / 'processed-articles' / feed_name / f"{article_id}.md",
+                                  summary_text(rng, feed_name, metadata))
+                timestamp = published.isoformat()
+                for category, ratio in (('read', read), ('favorite', favorite), ('deleted', deleted)):
+                    if rng.random() < ratio:
+                        states[category][article_id] = timestamp
+
+        writer.write_json(output / 'article_states.json', states)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - synthetic corpus generator')
+    parser.add_argument('output', help='生成先のストレージディレクトリ')
+    parser.add_argument('--articles', type=int, default=10000, help='記事数')
+    parser.add_argument('--feeds', type=int, default=20, help='フィード数')
+    parser.add_argument('--days', type=int, default=14, help='公開日を分布させる日数（保持期間より長くすると期限切れ記事ができる）')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード（同じシードなら同じコーパス）')
+    parser.add_argument('--judged', type=float, default=0.95, help='LLM Judge で判定済みの割合')
+    parser.add_argument('--pass-rate', type=float, default=0.4, help='判定済みのうちスコアが閾値以上の割合')
+    parser.add_argument('--scraped', type=float, default=0.9, help='閾値以上のうち本文取得済みの割合')
+    parser.add_argument('--summarized', type=float, default=0.9, help='本文取得済みのうち要約済みの割合')
+    parser.add_argument('--read', type=float, default=0.5, help='要約済みのうち既読の割合')
+    parser.add_argument('--favorite', type=float, default=0.02, help='要約済みのうちお気に入りの割合')
+    parser.add_argument('--deleted', type=float, default=0.05, help='要約済みのうち削除済みの割合')
+    parser.add_argument('--body-size', type=int, default=4000, help='本文の平均文字数')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(Path(args.output), args.articles, args.feeds, args.days, args.seed,
+                      args.judged, args.pass_rate, args.scraped, args.summarized,
+                      args.read, args.favorite, args.deleted, args.body_size)
+    elapsed = time.perf_counter() - start
+    print(f"生成完了: {args.output} ({elapsed:.1f}秒)")
+    for name, count in counts.items():
+        print(f"  {name:12} {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+LLMスループット計測 - LLM Judge・Article Processor をOpenAI互換のスタブに対して並列実行
+
+    python benchmarks/llm_throughput.py --articles 200 --concurrency 1 4 8 --rpm 300 --error-rate 0.02
+    python benchmarks/llm_throughput.py --base-url http://127.0.0.1:8089/v1   # 起動済みのスタブを使う
+
+合成した記事を RSSFilter.filter_article() と ArticleProcessor.generate_summary() に並列で渡し、
+並列数ごとのスループット・遅延・失敗数と、スタブ側で集計した429/5xx・トークン数を報告する。
+OPENAI_MAX_RETRIES（--max-retries）と並列数を変えて、レート制限下での設定を事前に調整できる。
+結果はJSONで出力する。
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from generate_corpus import TOPICS, WORDS, paragraph, scraped_text  # noqa: E402
+from openai_stub import add_behavior_arguments, behavior_from_args, start_server  # noqa: E402
+from storage_scale import load_service  # noqa: E402
+
+
+def synthetic_articles(count: int, body_size: int, seed: int) -> list:
+    rng = random.Random(seed)
+    articles = []
+    for i in range(count):
+        title = f"{rng.choice(TOPICS)}の{rng.choice(WORDS)}を改善する方法 #{i}"
+        articles.append({
+            'title': title,
+            'summary': paragraph(rng, 2),
+            'text': scraped_text(rng, title, body_size),
+            'metadata': {'title': title, 'url': f"https://example.com/posts/{i}", 'feed_name': 'bench',
+                         'filter_score': round(rng.uniform(6, 10), 1), 'article_type': rng.choice(('news', 'tutorial'))}
+        })
+    return articles
+
+
+def percentile(samples: list, p: int) -> float:
+    ordered = sorted(samples)
+    return round(ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)], 1)
+
+
+def server_request(base_url: str, path: str, method: str = 'GET') -> dict:
+    """スタブの集計エンドポイントを呼ぶ（base_url の /v1 を除いたパス）"""
+    root = base_url[:-len('/v1')] if base_url.rstrip('/').endswith('/v1') else base_url
+    request = urllib.request.Request(root.rstrip('/') + path, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def run_workload(name: str, call, articles: list, concurrency: int, base_url: str) -> dict:
+    """articles を concurrency 並列で処理し、スループット・遅延・失敗数を返す"""
+    server_request(base_url, '/stats/reset', 'POST')
+
+    def timed_call(article):
+        start = time.perf_counter()
+        ok = call(article)
+        return ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_call, articles))
+    wall = time.perf_counter() - start
+
+    latencies = [ms for _, ms in results]
+    failures = sum(1 for ok, _ in results if not ok)
+    server = server_request(base_url, '/stats')
+    entry = {
+        'concurrency': concurrency,
+        'articles': len(articles),
+        'wall_s': round(wall, 2),
+        'throughput_per_s': round(len(articles) / wall, 2),
+        'latency_ms': {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95),
+                       'p99': percentile(latencies, 99), 'mean': round(statistics.mean(latencies), 1)},
+        'failures': failures,
+        'server': {key: server.get(key) for key in ('requests', 'status', 'rate_limited', 'server_errors',
+                                                    'malformed', 'input_tokens', 'output_tokens')}
+    }
+    print(f"  {name:10} x{concurrency:<3} {entry['throughput_per_s']:>8} articles/s"
+          f"   p50 {entry['latency_ms']['p50']:>8} ms   p99 {entry['latency_ms']['p99']:>8} ms"
+          f"   failures {failures:>4}   429 {server.get('rate_limited', 0):>4}   5xx {server.get('server_errors', 0):>4}",
+          file=sys.stderr)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - LLM throughput harness')
+    parser.add_argument('--articles', type=int, default=100, help='各計測で処理する記事数')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 4, 8], help='並列数（複数指定で比較）')
+    parser.add_argument('--services', nargs='*', default=['judge', 'processor'], choices=['judge', 'processor'])
+    parser.add_argument('--max-retries', type=int, default=2, help='OpenAI SDKのリトライ回数（OPENAI_MAX_RETRIES）')
+    parser.add_argument('--timeout', type=float, default=60.0, help='リクエストのタイムアウト秒（OPENAI_TIMEOUT）')
+    parser.add_argument('--body-size', type=int, default=4000, help='要約する本文の文字数')
+    parser.add_argument('--base-url', help='起動済みのスタブのURL（省略時はこのプロセスで起動）')
+    parser.add_argument('--output', help='結果のJSONを書き出すファイル（省略時は標準出力）')
+    parser.add_argument('--verbose', action='store_true', help='サービスのログを表示')
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(behavior_from_args(args))
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    os.environ.update({
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY', 'sk-benchmark'),
+        'OPENAI_MAX_RETRIES': str(args.max_retries),
+        'OPENAI_TIMEOUT': str(args.timeout),
+        'LOG_LEVEL': 'INFO' if args.verbose else 'CRITICAL',
+        'STORAGE_FSYNC': 'false',
+    })
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    articles = synthetic_articles(args.articles, args.body_size, args.seed or 42)
+    results = {
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'base_url': base_url,
+        'max_retries': args.max_retries,
+        'stub': None if args.base_url else {key: getattr(args, key) for key in (
+            'latency', 'token_rate', 'output_tokens', 'rpm', 'tpm', 'error_rate',
+            'burst_interval', 'burst_length', 'malformed_rate')},
+        'services': {}
+    }
+
+    with tempfile.TemporaryDirectory() as storage:
+        workloads = {}
+        if 'judge' in args.services:
+            judge = load_service('llm-judge', 'bench_llm_judge').RSSFilter(storage, os.environ['OPENAI_API_KEY'])
+            # スタブは1-10のスコアを返すので、0はエラー（APIエラー・JSONパース失敗）
+            workloads['judge'] = lambda a: judge.filter_article(a['title'], a['summary']).get('score', 0) > 0
+        if 'processor' in args.services:
+            processor = load_service('llm-processor', 'bench_llm_processor').ArticleProcessor(
+                storage, os.environ['OPENAI_API_KEY'])
+            workloads['processor'] = lambda a: bool(processor.generate_summary(a['text'], dict(a['metadata'])))
+
+        for name, call in workloads.items():
+            results['services'][name] = [run_workload(name, call, articles, concurrency, base_url)
+                                         for concurrency in args.concurrency]
+
+    if server is not None:
+        server.shutdown()
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
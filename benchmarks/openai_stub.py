@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+OpenAI互換のローカルサーバー - Responses API（POST /v1/responses）の代役
+
+LLM Judge・Article Processor をトークンを消費せずに負荷試験するためのスタブ。
+応答の遅延分布、429（Retry-After付き）、5xxのバースト、不正なJSON出力を注入でき、
+トークン数を集計する。
+
+    python benchmarks/openai_stub.py --port 8089 --latency lognormal:800:0.5 --rpm 120 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 docker-compose run --rm llm-judge
+
+応答の内容:
+- JSON形式の回答を求めるプロンプト（LLM Judge）: プロンプト中の「- `field`」と「例: `value`」から
+  オブジェクトを組み立てる（score はタイトルから決まる1-10の値）
+- それ以外（Article Processor）: プロンプト中の「## 見出し」をすべて含むMarkdown
+
+    POST /v1/responses   stream=true ならServer-Sent Eventsで差分を返す
+    GET  /stats          リクエスト数・ステータス別件数・トークン数・遅延のパーセンタイル
+    POST /stats/reset    集計をリセット
+"""
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import logging
+import threading
+from collections import deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FIELD_LINE = re.compile(r'^- `(\w+)`')
+EXAMPLE_LINE = re.compile(r'^\s+- 例: `(.*)`$')
+HEADING_LINE = re.compile(r'^(#{2,3} .+)$', re.MULTILINE)
+
+FILLER = ('モデル', '推論', 'レイテンシ', 'コスト', 'デプロイ', 'API', '評価', 'データ', 'スケール', '運用')
+
+
+def count_tokens(text: str) -> int:
+    """トークン数の概算（ASCIIは4文字で1トークン、それ以外は1文字1トークン）"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+class LatencyModel:
+    """
+    応答遅延の分布（ミリ秒）
+
+    fixed:200 / uniform:100:500 / normal:800:200 / lognormal:800:0.5（中央値, σ）
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"invalid latency spec: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """遅延（秒）をサンプリング"""
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = median * math.exp(rng.gauss(0, sigma))
+        return max(ms, 0.0) / 1000
+
+
+class SlidingWindow:
+    """直近60秒の使用量（リクエスト数・トークン数の制限用）"""
+
+    WINDOW = 60.0
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.entries = deque()
+        self.total = 0
+
+    def _expire(self, now: float):
+        while self.entries and self.entries[0][0] <= now - self.WINDOW:
+            self.total -= self.entries.popleft()[1]
+
+    def try_acquire(self, amount: int, now: float) -> Optional[float]:
+        """使用できれば記録してNone、上限なら空くまでの秒数を返す"""
+        if self.limit <= 0:
+            return None
+        self._expire(now)
+        if self.total + amount > self.limit and self.entries:
+            # 古いエントリから解放して、必要な量が空く時刻を求める
+            freed = self.total
+            for ts, used in self.entries:
+                freed -= used
+                if freed + amount <= self.limit:
+                    return max(ts + self.WINDOW - now, 0.001)
+            return self.WINDOW
+        self.entries.append((now, amount))
+        self.total += amount
+        return None
+
+    def remaining(self, now: float) -> int:
+        self._expire(now)
+        return max(self.limit - self.total, 0)
+
+    def reset_after(self, now: float) -> float:
+        return max(self.entries[0][0] + self.WINDOW - now, 0.0) if self.entries else 0.0
+
+
+class StubBehavior:
+    """注入する障害・遅延の設定と、集計"""
+
+    def __init__(self, latency: str = 'fixed:0', token_rate: float = 0.0, rpm: int = 0, tpm: int = 0,
+                 error_rate: float = 0.0, burst_interval: float = 0.0, burst_length: float = 0.0,
+                 malformed_rate: float = 0.0, output_tokens: int = 400, seed: Optional[int] = None):
+        self.latency = LatencyModel(latency)
+        self.token_rate = token_rate
+        self.requests_window = SlidingWindow(rpm)
+        self.tokens_window = SlidingWindow(tpm)
+        self.error_rate = error_rate
+        self.burst_interval = burst_interval
+        self.burst_length = burst_length
+        self.malformed_rate = malformed_rate
+        self.output_tokens = output_tokens
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'status': {}, 'rate_limited': 0, 'server_errors': 0, 'malformed': 0,
+                          'streamed': 0, 'input_tokens': 0, 'output_tokens': 0, 'models': {}}
+            self.latencies: List[float] = []
+
+    def in_burst(self, now: float) -> bool:
+        """5xxバースト中か（burst_interval秒ごとに先頭のburst_length秒）"""
+        if self.burst_interval <= 0 or self.burst_length <= 0:
+            return False
+        return (now - self.started) % self.burst_interval < self.burst_length
+
+    def admit(self, input_tokens: int, max_output_tokens: int) -> Tuple[Optional[HTTPStatus], Dict[str, str]]:
+        """
+        リクエストを受け付けるか判定
+
+        Returns:
+            (エラーのステータス（受け付けるならNone）, 付けるヘッダー)
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.in_burst(now) or self.rng.random() < self.error_rate:
+                self.stats['server_errors'] += 1
+                return HTTPStatus.SERVICE_UNAVAILABLE, {}
+
+            wait = self.requests_window.try_acquire(1, now)
+            if wait is None:
+                wait = self.tokens_window.try_acquire(input_tokens + max_output_tokens, now)
+                if wait is not None and self.requests_window.limit > 0:
+                    # トークン制限で拒否したリクエストはリクエスト数にも数えない
+                    self.requests_window.entries.pop()
+                    self.requests_window.total -= 1
+            headers = self.rate_limit_headers(now)
+            if wait is not None:
+                self.stats['rate_limited'] += 1
+                headers['Retry-After'] = str(max(math.ceil(wait), 1))
+                headers['retry-after-ms'] = str(int(wait * 1000))
+                return HTTPStatus.TOO_MANY_REQUESTS, headers
+            return None, headers
+
+    def rate_limit_headers(self, now: float) -> Dict[str, str]:
+        headers = {}
+        for name, window in (('requests', self.requests_window), ('tokens', self.tokens_window)):
+            if window.limit > 0:
+                headers[f'x-ratelimit-limit-{name}'] = str(window.limit)
+                headers[f'x-ratelimit-remaining-{name}'] = str(window.remaining(now))
+                headers[f'x-ratelimit-reset-{name}'] = f"{window.reset_after(now):.3f}s"
+        return headers
+
+    def record(self, status: int, model: str = '', input_tokens: int = 0, output_tokens: int = 0,
+               latency: float = 0.0, malformed: bool = False, streamed: bool = False):
+        with self.lock:
+            status_counts = self.stats['status']
+            status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+            if status != HTTPStatus.OK:
+                return
+            self.stats['input_tokens'] += input_tokens
+            self.stats['output_tokens'] += output_tokens
+            self.stats['malformed'] += int(malformed)
+            self.stats['streamed'] += int(streamed)
+            usage = self.stats['models'].setdefault(model, {'requests': 0, 'input_tokens': 0, 'output_tokens': 0})
+            usage['requests'] += 1
+            usage['input_tokens'] += input_tokens
+            usage['output_tokens'] += output_tokens
+            self.latencies.append(latency)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            stats = json.loads(json.dumps(self.stats))
+            latencies = sorted(self.latencies)
+        if latencies:
+            stats['latency_ms'] = {
+                f'p{p}': round(latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)] * 1000, 1)
+                for p in (50, 95, 99)
+            }
+        return stats
+
+
+def prompt_text(body: Dict) -> str:
+    """input（文字列またはメッセージの配列）からプロンプト全体を取り出す"""
+    items = body.get('input', '')
+    if isinstance(items, str):
+        return items
+    parts = []
+    for item in items:
+        content = item.get('content', '')
+        if isinstance(content, list):
+            content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        parts.append(content)
+    return '\n'.join(parts)
+
+
+def user_prompt(body: Dict) -> str:
+    items = body.get('input', '')
+    if isinstance(items, str):
+        return items
+    users = [item.get('content', '') for item in items if item.get('role') == 'user']
+    return users[-1] if users and isinstance(users[-1], str) else prompt_text(body)
+
+
+def build_json_answer(prompt: str) -> str:
+    """プロンプトの回答指示（- `field` と 例: `value`）からJSONの回答を組み立てる"""
+    answer = {}
+    field = None
+    for line in prompt.splitlines():
+        match = FIELD_LINE.match(line)
+        if match:
+            field = match.group(1)
+            answer.setdefault(field, '')
+            continue
+        match = EXAMPLE_LINE.match(line)
+        if match and field:
+            try:
+                answer[field] = json.loads(match.group(1))
+            except ValueError:
+                answer[field] = match.group(1)
+
+    # スコアはタイトルから決める（同じ記事には同じスコア）
+    title = re.search(r'タイトル: (.*)', prompt)
+    digest = int(hashlib.sha256((title.group(1) if title else prompt).encode('utf-8')).hexdigest(), 16)
+    if 'score' in answer:
+        answer['score'] = digest % 10 + 1
+    if 'article_type' in answer:
+        answer['article_type'] = ('news', 'tutorial')[digest // 10 % 2]
+    return json.dumps(answer, ensure_ascii=False)
+
+
+def build_markdown_answer(prompt: str, target_tokens: int, rng: random.Random) -> str:
+    """プロンプトに含まれる見出しをすべて含むMarkdownを生成"""
+    headings = list(dict.fromkeys(HEADING_LINE.findall(prompt))) or ['## 要約']
+    per_section = max(target_tokens // len(headings), 10)
+    sections = []
+    for heading in headings:
+        words = []
+        while count_tokens(''.join(words)) < per_section:
+            words.append(rng.choice(FILLER))
+        sections.append(f"{heading}\n\n{'、'.join(words)}。\n")
+    return '\n'.join(sections)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """max_output_tokens に収まるように切り詰める"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def response_object(response_id: str, model: str, text: str, status: str,
+                    input_tokens: int, output_tokens: int) -> Dict:
+    """Responses API のレスポンスオブジェクト"""
+    return {
+        'id': response_id,
+        'object': 'response',
+        'created_at': int(time.time()),
+        'status': status,
+        'model': model,
+        'output': [{
+            'type': 'message',
+            'id': f"msg_{response_id[5:]}",
+            'status': 'completed' if status == 'completed' else 'incomplete',
+            'role': 'assistant',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}]
+        }],
+        'incomplete_details': {'reason': 'max_output_tokens'} if status == 'incomplete' else None,
+        'parallel_tool_calls': True,
+        'tool_choice': 'auto',
+        'tools': [],
+        'error': None,
+        'usage': {
+            'input_tokens': input_tokens,
+            'input_tokens_details': {'cached_tokens': 0},
+            'output_tokens': output_tokens,
+            'output_tokens_details': {'reasoning_tokens': 0},
+            'total_tokens': input_tokens + output_tokens
+        }
+    }
+
+
+class OpenAIStubHandler(BaseHTTPRequestHandler):
+    server_version = 'OpenAIStub/1.0'
+    protocol_version = 'HTTP/1.1'
+    # ヘッダーと本文を別々に書くので、Nagleアルゴリズムによる遅延を避ける
+    disable_nagle_algorithm = True
+    behavior: StubBehavior = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, data, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None):
+        self.behavior.record(status)
+        self._send_json(status, {'error': {'message': message, 'type': error_type, 'param': None, 'code': None}},
+                        headers)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            return self._send_json(HTTPStatus.OK, self.behavior.snapshot())
+        self._send_json(HTTPStatus.NOT_FOUND, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', '0'))
+        raw = self.rfile.read(length)
+
+        if self.path.rstrip('/') == '/stats/reset':
+            self.behavior.reset_stats()
+            return self._send_json(HTTPStatus.OK, {'reset': True})
+        if self.path.rstrip('/') != '/v1/responses':
+            return self._send_json(HTTPStatus.NOT_FOUND, {'error': {'message': 'not found'}})
+
+        try:
+            body = json.loads(raw or b'{}')
+        except ValueError:
+            return self._send_error(HTTPStatus.BAD_REQUEST, 'invalid JSON body', 'invalid_request_error')
+
+        behavior = self.behavior
+        started = time.monotonic()
+        model = body.get('model', 'stub')
+        prompt = prompt_text(body)
+        input_tokens = count_tokens(prompt)
+        max_output_tokens = int(body.get('max_output_tokens') or behavior.output_tokens * 4)
+
+        status, headers = behavior.admit(input_tokens, max_output_tokens)
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            return self._send_error(status, 'Rate limit reached (stub)', 'rate_limit_exceeded', headers)
+        if status is not None:
+            return self._send_error(status, 'The server is temporarily unavailable (stub)', 'server_error', headers)
+
+        with behavior.lock:
+            malformed = behavior.rng.random() < behavior.malformed_rate
+            first_token_delay = behavior.latency.sample(behavior.rng)
+            target_tokens = max(int(behavior.rng.gauss(behavior.output_tokens, behavior.output_tokens * 0.2)), 20)
+            seed = behavior.rng.random()
+
+        user = user_prompt(body)
+        if 'JSON' in user:
+            text = build_json_answer(user)
+            if malformed:
+                text = text[:len(text) // 2]
+        else:
+            text = build_markdown_answer(user, target_tokens, random.Random(seed))
+            if malformed:
+                # 見出しの欠けた出力（要約の検証で失敗する）
+                text = text.split('\n## ')[0]
+
+        truncated = truncate_tokens(text, max_output_tokens)
+        response_status = 'completed' if truncated == text else 'incomplete'
+        output_tokens = count_tokens(truncated)
+        response_id = f"resp_{hashlib.sha1(f'{started}{seed}'.encode()).hexdigest()[:24]}"
+        response = response_object(response_id, model, truncated, response_status, input_tokens, output_tokens)
+        generation_time = output_tokens / behavior.token_rate if behavior.token_rate > 0 else 0.0
+
+        if body.get('stream'):
+            self._stream(response, truncated, first_token_delay, generation_time, headers)
+        else:
+            time.sleep(first_token_delay + generation_time)
+            self._send_json(HTTPStatus.OK, response, headers)
+        behavior.record(HTTPStatus.OK, model, input_tokens, output_tokens, time.monotonic() - started,
+                        malformed, bool(body.get('stream')))
+
+    def _stream(self, response: Dict, text: str, first_token_delay: float, generation_time: float,
+                headers: Dict[str, str]):
+        """Server-Sent Events で created → output_text.delta × N → completed/incomplete を送る"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        sequence = 0
+
+        def send(event: Dict):
+            nonlocal sequence
+            event['sequence_number'] = sequence
+            sequence += 1
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        in_progress = dict(response, status='in_progress', output=[], usage=None)
+        send({'type': 'response.created', 'response': in_progress})
+        time.sleep(first_token_delay)
+
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)] or ['']
+        delay = generation_time / len(chunks)
+        item_id = response['output'][0]['id']
+        for chunk in chunks:
+            send({'type': 'response.output_text.delta', 'item_id': item_id, 'output_index': 0,
+                  'content_index': 0, 'delta': chunk, 'logprobs': []})
+            if delay:
+                time.sleep(delay)
+        final_type = 'response.completed' if response['status'] == 'completed' else 'response.incomplete'
+        send({'type': final_type, 'response': response})
+
+
+class OpenAIStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(behavior: StubBehavior, host: str, port: int) -> OpenAIStubServer:
+    handler = type('BoundOpenAIStubHandler', (OpenAIStubHandler,), {'behavior': behavior})
+    return OpenAIStubServer((host, port), handler)
+
+
+def start_server(behavior: StubBehavior, host: str = '127.0.0.1', port: int = 0) -> OpenAIStubServer:
+    """バックグラウンドスレッドでサーバーを起動（port=0なら空きポート）"""
+    server = make_server(behavior, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser):
+    """障害注入の引数（スループット計測からも使う）"""
+    parser.add_argument('--latency', default='lognormal:300:0.5',
+                        help='最初のトークンまでの遅延分布（fixed:ms / uniform:min:max / normal:mean:sd / lognormal:median:sigma）')
+    parser.add_argument('--token-rate', type=float, default=200.0, help='出力トークンの生成速度（トークン/秒、0で即時）')
+    parser.add_argument('--output-tokens', type=int, default=400, help='Markdown出力の平均トークン数')
+    parser.add_argument('--rpm', type=int, default=0, help='1分あたりのリクエスト上限（超えると429、0で無制限）')
+    parser.add_argument('--tpm', type=int, default=0, help='1分あたりのトークン上限（入力＋max_output_tokens、0で無制限）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='ランダムに503を返す割合')
+    parser.add_argument('--burst-interval', type=float, default=0.0, help='5xxバーストの周期（秒）')
+    parser.add_argument('--burst-length', type=float, default=0.0, help='各周期の先頭で503を返し続ける秒数')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='不正な出力（途中で切れたJSON・見出しの欠けた要約）の割合')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+
+
+def behavior_from_args(args) -> StubBehavior:
+    return StubBehavior(latency=args.latency, token_rate=args.token_rate, rpm=args.rpm, tpm=args.tpm,
+                        error_rate=args.error_rate, burst_interval=args.burst_interval,
+                        burst_length=args.burst_length, malformed_rate=args.malformed_rate,
+                        output_tokens=args.output_tokens, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - OpenAI-compatible stub server')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けアドレス')
+    parser.add_argument('--port', type=int, default=8089, help='待ち受けポート')
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = make_server(behavior_from_args(args), args.host, args.port)
+    logger.info(f"OpenAI stub 起動: OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+起動時間ベンチマーク - 各サービスのimport時間と処理対象なし実行の所要時間を計測
+
+    python benchmarks/startup.py [--repeat 5] [--output startup.json]
+
+- import: `python -X importtime -c "import main"` の main モジュールの累積時間（依存込み）
+- noop: 空のストレージに対してサービスを実行し、終了するまでの実時間
+        （処理対象がないので、起動・設定読み込み・探索だけのコストになる）
+- baseline: `python -c pass`（インタプリタ自体の起動時間）
+
+結果はJSONで出力し、回帰の追跡に使う。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# サービスごとの処理対象なし実行のコマンド（Noneはネットワークアクセスが必要なため計測しない）
+SERVICES = {
+    'rss-feeder': None,
+    'llm-judge': ['main.py'],
+    'web-scraper': ['main.py'],
+    'llm-processor': ['main.py'],
+    'data-cleanup': ['main.py', '--dry-run'],
+    'article-viewer': ['main.py', '--stats', '--storage', '{storage}'],
+}
+
+# import時間の内訳として報告するモジュール数
+TOP_MODULES = 5
+
+
+def parse_importtime(stderr: str):
+    """-X importtime の出力から (main の累積時間, 自己時間の大きいモジュール) を取得"""
+    modules = []
+    main_cumulative = None
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+        modules.append((int(self_us), name.strip()))
+        if name.strip() == 'main' and not name.startswith('  '):
+            main_cumulative = int(cumulative_us)
+    modules.sort(reverse=True)
+    return main_cumulative, [{'module': name, 'self_us': us} for us, name in modules[:TOP_MODULES]]
+
+
+def measure_import(service_dir: Path, repeat: int):
+    samples = []
+    top = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                                cwd=service_dir, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'}
+        cumulative, top = parse_importtime(result.stderr)
+        if cumulative is not None:
+            samples.append(cumulative / 1000)
+    return {'median_ms': round(statistics.median(samples), 2), 'min_ms': round(min(samples), 2), 'top_modules': top}
+
+
+def measure_wall(command, cwd: Path, env: dict, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}
+    return {'median_ms': round(statistics.median(samples), 2), 'min_ms': round(min(samples), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - startup benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='各計測の繰り返し回数（中央値を報告）')
+    parser.add_argument('--output', help='結果のJSONを書き出すファイル（省略時は標準出力）')
+    parser.add_argument('--services', nargs='*', default=list(SERVICES), help='計測するサービス')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage:
+        env = dict(os.environ, STORAGE_PATH=storage, OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', 'sk-benchmark'),
+                   LOG_LEVEL='WARNING')
+        results = {
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'baseline': measure_wall([sys.executable, '-c', 'pass'], REPO_ROOT, env, args.repeat),
+            'services': {}
+        }
+        for service in args.services:
+            service_dir = REPO_ROOT / service
+            entry = {'import': measure_import(service_dir, args.repeat)}
+            command = SERVICES[service]
+            if command is not None:
+                command = [sys.executable] + [part.format(storage=storage) for part in command]
+                entry['noop'] = measure_wall(command, service_dir, env, args.repeat)
+            results['services'][service] = entry
+            print(f"{service:15} import {entry['import'].get('median_ms', '-'):>8} ms"
+                  f"   noop {entry.get('noop', {}).get('median_ms', '-'):>8} ms", file=sys.stderr)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+ストレージ規模ベンチマーク - 記事数に対する各サービスの探索処理とViewerの操作時間を計測
+
+    python benchmarks/storage_scale.py --scales 10000 100000 [--backends files sqlite] [--output scale.json]
+    python benchmarks/storage_scale.py --storage /tmp/corpus   # 生成済みのコーパスを使う
+
+規模ごとに合成コーパス（generate_corpus.py）を一時ディレクトリに生成し、以下を計測する。
+ネットワーク（RSS取得）とLLM呼び出しは行わない（RSS Feeder は feedparser をスタブに差し替え、
+LLM Judge / Article Processor は処理待ちの探索だけを実行する）。
+
+- rss-feeder.fetch:       既存記事だけのフィードを全フィード分処理（既存チェック・更新検知）
+- rss-feeder.retention:   保持期間を超過した記事の検索（削除はしない）
+- llm-judge.discovery:    判定待ち記事の探索
+- web-scraper.discovery:  スクレイピング待ち記事の探索
+- llm-processor.discovery: 要約待ち記事の探索
+- data-cleanup.gc_scan:   GCのマーク・孤立ファイル検索（削除はしない）
+- article-viewer.startup / list / filter / search: 記事一覧の読み込み・1ページの描画・フィルタ・全文検索
+
+各項目は繰り返し実行し、初回（first_ms: 永続インデックスなし）と2回目以降の中央値（median_ms）を報告する。
+結果はJSONで出力し、回帰の追跡に使う。
+"""
+import io
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import importlib.util
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'shared' / 'lib'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from generate_corpus import generate  # noqa: E402
+
+# RSS Feeder のスタブフィードに含める記事数（実際のフィードと同程度）
+ENTRIES_PER_FEED = 50
+
+SEARCH_QUERIES = ('Bedrock', 'レイテンシ', 'エージェント キャッシュ')
+
+
+def load_service(service: str, module_name: str):
+    """サービスの main.py をモジュールとして読み込む（サービスのディレクトリもインポートパスに追加）"""
+    service_dir = REPO_ROOT / service
+    if str(service_dir) not in sys.path:
+        sys.path.insert(0, str(service_dir))
+    spec = importlib.util.spec_from_file_location(module_name, service_dir / 'main.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(func, repeat: int) -> dict:
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    entry = {'first_ms': round(samples[0], 2),
+             'median_ms': round(statistics.median(samples[1:] or samples), 2)}
+    if isinstance(result, int):
+        entry['items'] = result
+    return entry
+
+
+def install_feedparser_stub(storage: Path) -> list:
+    """
+    feedparser.parse をスタブに差し替え、フィードごとに既存記事のエントリを返す
+
+    Returns:
+        RSS Feeder に渡すフィード設定
+    """
+    entries = {}
+    for feed_dir in sorted((storage / 'rss-feeds').iterdir()):
+        if not feed_dir.is_dir():
+            continue
+        feed_entries = []
+        for metadata_file in sorted(feed_dir.glob('*.json'))[:ENTRIES_PER_FEED]:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            feed_entries.append({'link': metadata['url'], 'title': metadata['title'],
+                                 'summary': metadata['summary'], 'published': metadata['published'],
+                                 'author': metadata.get('author', '')})
+        entries[f"stub://{feed_dir.name}"] = feed_entries
+
+    stub = types.ModuleType('feedparser')
+    stub.parse = lambda url: types.SimpleNamespace(bozo=False, entries=entries.get(url, []))
+    sys.modules['feedparser'] = stub
+    return [{'name': url[len('stub://'):], 'url': url} for url in entries]
+
+
+def run_services(storage: Path, modules: dict, repeat: int, feeds: list) -> dict:
+    """各サービスの探索処理を計測"""
+    storage_path = str(storage)
+    results = {}
+
+    feeder = modules['rss-feeder'].RSSFeeder(storage_path)
+    feeder.max_article_age_days = 10 ** 4  # 既存チェックまで到達させる
+
+    def fetch():
+        with feeder.writer:
+            return sum(feeder.fetch_feed(feed) for feed in feeds)
+
+    results['rss-feeder.fetch'] = timed(fetch, repeat)
+
+    retention = sys.modules['retention']
+    results['rss-feeder.retention'] = timed(
+        lambda: len(retention.RetentionEngine(storage_path, feeder.retention_days).find_expired()), repeat)
+
+    judge = modules['llm-judge'].RSSFilter(storage_path, 'sk-benchmark')
+    results['llm-judge.discovery'] = timed(lambda: len(judge.get_unfiltered_articles()), repeat)
+
+    scraper = modules['web-scraper'].WebScraper(storage_path)
+    results['web-scraper.discovery'] = timed(lambda: len(scraper.get_pending_articles()), repeat)
+
+    processor = modules['llm-processor'].ArticleProcessor(storage_path, 'sk-benchmark')
+    results['llm-processor.discovery'] = timed(lambda: sum(1 for _ in processor.get_pending_articles()), repeat)
+
+    def gc_scan():
+        gc = modules['data-cleanup'].StorageGC(storage_path)
+        live = gc.mark()
+        gc.find_empty_dirs(gc.find_orphan_files(live))
+        return len(live)
+
+    results['data-cleanup.gc_scan'] = timed(gc_scan, repeat)
+    return results
+
+
+def run_viewer(storage: Path, viewer_module, repeat: int) -> dict:
+    """Viewerの起動（一覧の読み込み）・1ページの描画・フィルタ・全文検索を計測"""
+    from rich.console import Console
+
+    storage_path = str(storage)
+    viewer_module.console = Console(file=io.StringIO(), width=160, height=50)
+    results = {}
+
+    results['article-viewer.startup'] = timed(
+        lambda: len(viewer_module.ArticleViewer(storage_path).load_articles()), repeat)
+
+    viewer = viewer_module.ArticleViewer(storage_path)
+    articles = viewer.load_articles()
+
+    def render_page():
+        viewer.sort_articles(articles, 'date')
+        viewer.display_article_list(articles, 'date', page=1)
+        return len(articles)
+
+    results['article-viewer.list'] = timed(render_page, repeat)
+    results['article-viewer.filter'] = timed(
+        lambda: len(viewer.load_articles(min_score=7.0, article_type='news', unread_only=True)), repeat)
+
+    # 初回は全文検索インデックスの構築を含む
+    results['article-viewer.search'] = timed(
+        lambda: sum(len(viewer.search_articles(articles, query)) for query in SEARCH_QUERIES), repeat)
+    return results
+
+
+def run_scale(storage: Path, args, modules: dict) -> dict:
+    feeds = install_feedparser_stub(storage)
+    entry = {'backends': {}}
+
+    for backend in args.backends:
+        os.environ['CATALOG_BACKEND'] = backend
+        results = {}
+        if backend == 'sqlite':
+            from catalog import StageCatalog
+            start = time.perf_counter()
+            catalog = StageCatalog(str(storage))
+            catalog.rebuild_from_files()
+            catalog.close()
+            results['catalog.migrate'] = {'first_ms': round((time.perf_counter() - start) * 1000, 2)}
+        results.update(run_services(storage, modules, args.repeat, feeds))
+        entry['backends'][backend] = results
+        for name, value in results.items():
+            print(f"  [{backend}] {name:28} first {value['first_ms']:>10} ms"
+                  f"   median {value.get('median_ms', '-'):>10} ms", file=sys.stderr)
+    os.environ.pop('CATALOG_BACKEND', None)
+
+    if not args.skip_viewer:
+        entry['viewer'] = run_viewer(storage, modules['article-viewer'], args.repeat)
+        for name, value in entry['viewer'].items():
+            print(f"  {name:38} first {value['first_ms']:>10} ms"
+                  f"   median {value['median_ms']:>10} ms", file=sys.stderr)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - storage scale benchmark')
+    parser.add_argument('--scales', type=int, nargs='*', default=[10000], help='生成するコーパスの記事数')
+    parser.add_argument('--storage', help='生成済みのコーパスを使う（指定時は --scales を無視）')
+    parser.add_argument('--feeds', type=int, default=20, help='生成するフィード数')
+    parser.add_argument('--backends', nargs='*', default=['files'], choices=['files', 'sqlite'],
+                        help='計測するカタログバックエンド（CATALOG_BACKEND）')
+    parser.add_argument('--repeat', type=int, default=3, help='各計測の繰り返し回数')
+    parser.add_argument('--skip-viewer', action='store_true', help='Article Viewer の計測を省略（rich が不要になる）')
+    parser.add_argument('--keep', action='store_true', help='生成したコーパスを削除しない')
+    parser.add_argument('--output', help='結果のJSONを書き出すファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('STORAGE_FSYNC', 'false')
+    modules = {
+        'rss-feeder': load_service('rss-feeder', 'bench_rss_feeder'),
+        'llm-judge': load_service('llm-judge', 'bench_llm_judge'),
+        'web-scraper': load_service('web-scraper', 'bench_web_scraper'),
+        'llm-processor': load_service('llm-processor', 'bench_llm_processor'),
+        'data-cleanup': load_service('data-cleanup', 'bench_data_cleanup'),
+    }
+    if not args.skip_viewer:
+        modules['article-viewer'] = load_service('article-viewer', 'bench_article_viewer')
+
+    results = {
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'scales': []
+    }
+
+    if args.storage:
+        print(f"コーパス: {args.storage}", file=sys.stderr)
+        entry = run_scale(Path(args.storage), args, modules)
+        entry['storage'] = args.storage
+        results['scales'].append(entry)
+    else:
+        for articles in args.scales:
+            storage = Path(tempfile.mkdtemp(prefix=f'rss-corpus-{articles}-'))
+            try:
+                start = time.perf_counter()
+                counts = generate(storage, articles, args.feeds, days=14, seed=42, judged=0.95, pass_rate=0.4,
+                                  scraped=0.9, summarized=0.9, read=0.5, favorite=0.02, deleted=0.05,
+                                  body_size=4000)
+                print(f"コーパス: {articles}件 ({time.perf_counter() - start:.1f}秒) {storage}", file=sys.stderr)
+                entry = run_scale(storage, args, modules)
+                entry.update({'articles': articles, 'corpus': counts})
+                results['scales'].append(entry)
+            finally:
+                if args.keep:
+                    print(f"コーパスを保持: {storage}", file=sys.stderr)
+                else:
+                    shutil.rmtree(storage, ignore_errors=True)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,25 @@
 """
 Data Cleanup - 古いデータを一括削除
 retention_daysを超過した記事データを全削除（メタデータ・本文・要約）
+アーカイブモードでは月別の圧縮セグメントへ退避してから削除
+GCモードでは孤立したファイル・状態エントリを回収
 """
 import os
-import json
+import sys
+import time
+import argparse
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
 
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from retention import ARTICLE_TREES, RetentionEngine  # noqa: E402
+from archive import ArticleArchive  # noqa: E402
+from state_journal import StateJournal  # noqa: E402
+from profiling import MODES, profiled  # noqa: E402
+from leases import LeaseManager, sweep_expired_leases  # noqa: E402
+
 # ロギング設定
 logging.basicConfig(
     level=os.getenv('LOG_LEVEL', 'INFO'),
@@ -18,88 +30,23 @@ logger = logging.getLogger(__name__)
 
 
 class DataCleanup:
-    def __init__(self, storage_path: str, retention_days: int):
+    def __init__(self, storage_path: str, retention_days: int, archive: bool = None):
         self.storage_path = Path(storage_path)
         self.retention_days = retention_days
         self.cutoff_date = datetime.now() - timedelta(days=retention_days)
+        self.engine = RetentionEngine(storage_path, retention_days, archive=archive)
+        self.archive_mode = self.engine.archive is not None
         
-        logger.info(f"保持期間: {retention_days}日")
+        logger.info(f"保持期間: {retention_days}日 (モード: {'アーカイブ' if self.archive_mode else '削除'})")
         logger.info(f"削除基準日時: {self.cutoff_date.isoformat()}")
     
     def get_old_articles(self) -> list:
-        """retention_daysを超過した記事を取得"""
-        old_articles = []
-        rss_feeds_dir = self.storage_path / 'rss-feeds'
-        
-        if not rss_feeds_dir.exists():
-            return old_articles
-        
-        for feed_dir in rss_feeds_dir.iterdir():
-            if not feed_dir.is_dir():
-                continue
-            
-            feed_name = feed_dir.name
-            
-            for metadata_file in feed_dir.glob('*.json'):
-                try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                    
-                    # published日時をチェック
-                    published_str = metadata.get('published', '')
-                    if not published_str:
-                        logger.warning(f"published フィールドなし: {metadata_file}")
-                        continue
-                    
-                    # ISO 8601形式をパース
-                    published_date = datetime.fromisoformat(published_str.replace('Z', '+00:00'))
-                    
-                    # タイムゾーン情報を削除して比較
-                    published_date = published_date.replace(tzinfo=None)
-                    
-                    if published_date < self.cutoff_date:
-                        article_id = metadata_file.stem
-                        old_articles.append({
-                            'feed_name': feed_name,
-                            'article_id': article_id,
-                            'published': published_str
-                        })
-                
-                except Exception as e:
-                    logger.error(f"メタデータ読み込みエラー ({metadata_file}): {e}")
-        
-        return old_articles
+        """retention_daysを超過した記事を取得（公開日の時系列インデックスを範囲検索）"""
+        return self.engine.find_expired()
     
     def delete_article_data(self, feed_name: str, article_id: str) -> dict:
         """記事の全データを削除（メタデータ・本文・要約）"""
-        deleted = {
-            'metadata': False,
-            'scraped': False,
-            'summary': False
-        }
-        
-        # 1. メタデータ削除
-        metadata_path = self.storage_path / 'rss-feeds' / feed_name / f"{article_id}.json"
-        if metadata_path.exists():
-            metadata_path.unlink()
-            deleted['metadata'] = True
-            logger.debug(f"削除: {metadata_path}")
-        
-        # 2. スクレイピング済み記事削除
-        scraped_path = self.storage_path / 'scraped-articles' / feed_name / f"{article_id}.md"
-        if scraped_path.exists():
-            scraped_path.unlink()
-            deleted['scraped'] = True
-            logger.debug(f"削除: {scraped_path}")
-        
-        # 3. 要約記事削除
-        summary_path = self.storage_path / 'processed-articles' / feed_name / f"{article_id}.md"
-        if summary_path.exists():
-            summary_path.unlink()
-            deleted['summary'] = True
-            logger.debug(f"削除: {summary_path}")
-        
-        return deleted
+        return self.engine.delete_article(feed_name, article_id)
     
     def run(self, dry_run: bool = False):
         """メイン処理"""
@@ -118,32 +65,211 @@ class DataCleanup:
                 logger.info(f"[削除予定] {article['feed_name']}/{article['article_id']} (published: {article['published']})")
             return
         
-        deleted_count = 0
-        total_files = 0
-        
-        for article in old_articles:
-            feed_name = article['feed_name']
-            article_id = article['article_id']
-            
-            deleted = self.delete_article_data(feed_name, article_id)
-            
-            files_deleted = sum(deleted.values())
-            if files_deleted > 0:
-                deleted_count += 1
-                total_files += files_deleted
-                logger.info(f"削除完了: {feed_name}/{article_id} ({files_deleted}ファイル)")
-        
-        logger.info(f"=== クリーンアップ完了: {deleted_count}記事、{total_files}ファイル削除 ===")
+        # バッチ単位で並列削除（アーカイブモードでは退避してから削除）
+        deleted_count, total_files = self.engine.purge(old_articles)
+        
+        if self.archive_mode:
+            logger.info(f"=== クリーンアップ完了: {deleted_count}記事をアーカイブ、{total_files}ファイル削除 ===")
+        else:
+            logger.info(f"=== クリーンアップ完了: {deleted_count}記事、{total_files}ファイル削除 ===")
+
+
+class StorageGC:
+    """
+    マーク&スイープ方式のガベージコレクタ
+    
+    rss-feeds のメタデータを生存記事としてマークし、メタデータを失った
+    本文・要約ファイル、クラッシュしたプロセスが残した一時ファイル（.tmp）と生成途中の要約（.partial）、
+    空のフィードディレクトリ、存在しない記事を指す記事状態（article_states.json とジャーナル）の
+    エントリと、期限切れのまま残った作業リース（storage/leases/）をスイープする。
+    """
+    
+    # 状態ファイルから回収するカテゴリ（お気に入りはユーザーの意思なので残す）
+    SWEPT_STATES = ('read', 'deleted', 'archived')
+    # 書き込み途中のファイル（StorageWriterの <name>.<pid>.<thread>.tmp、ストリーミング中の要約）
+    TEMP_SUFFIXES = ('.tmp', '.partial')
+    # 一時ファイルの書き込み元になるステージ（リースを持つ記事の一時ファイルは回収しない）
+    LEASE_STAGES = ('judge', 'scrape', 'summarize')
+    
+    def __init__(self, storage_path: str, temp_grace: float = None):
+        self.storage_path = Path(storage_path)
+        self.rss_feeds_dir = self.storage_path / 'rss-feeds'
+        # この秒数以上更新されていない一時ファイルだけを回収（書き込み中のものは残す）
+        self.temp_grace = temp_grace if temp_grace is not None else float(os.getenv('GC_TEMP_GRACE_SECONDS', '3600'))
+        self.leases = [LeaseManager(storage_path, stage) for stage in self.LEASE_STAGES]
+    
+    def mark(self) -> set:
+        """生存記事の (feed_name, article_id) を収集"""
+        live = set()
+        if not self.rss_feeds_dir.exists():
+            return live
+        for feed_dir in self.rss_feeds_dir.iterdir():
+            if not feed_dir.is_dir():
+                continue
+            for metadata_file in feed_dir.glob('*.json'):
+                live.add((feed_dir.name, metadata_file.stem))
+        return live
+    
+    def find_orphan_files(self, live: set) -> list:
+        """メタデータのない本文・要約ファイル（旧形式の .txt を含む）を収集"""
+        orphans = []
+        for kind in ('scraped', 'summary'):
+            tree, suffix = ARTICLE_TREES[kind]
+            tree_dir = self.storage_path / tree
+            if not tree_dir.exists():
+                continue
+            for feed_dir in tree_dir.iterdir():
+                if not feed_dir.is_dir():
+                    continue
+                for path in feed_dir.iterdir():
+                    # 一時ファイルは find_stale_temp_files() で書き込み中でないものだけを回収する
+                    if not path.is_file() or path.name.endswith(self.TEMP_SUFFIXES):
+                        continue
+                    article_id = path.name.split('.', 1)[0]
+                    if path.suffix != suffix or (feed_dir.name, article_id) not in live:
+                        orphans.append(path)
+        return orphans
+    
+    def find_stale_temp_files(self) -> list:
+        """
+        クラッシュしたプロセスが残した一時ファイル・生成途中の要約を収集
+        
+        temp_grace 秒以上更新されておらず、記事のリースをどのレプリカも持っていないものが対象。
+        """
+        article_trees = {tree for tree, _ in ARTICLE_TREES.values()}
+        cutoff = time.time() - self.temp_grace
+        stale = []
+        for root, dirs, files in os.walk(self.storage_path):
+            root_path = Path(root)
+            # リースは sweep_expired_leases() が回収する
+            if root_path == self.storage_path:
+                dirs[:] = [name for name in dirs if name != 'leases']
+            for name in files:
+                if not name.endswith(self.TEMP_SUFFIXES):
+                    continue
+                path = root_path / name
+                try:
+                    if path.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if root_path.parent.name in article_trees and root_path.parent.parent == self.storage_path:
+                    article_id = name.split('.', 1)[0]
+                    if any(leases.is_held(root_path.name, article_id) for leases in self.leases):
+                        continue
+                stale.append(path)
+        return stale
+    
+    def find_empty_dirs(self, orphans: list) -> list:
+        """スイープ後に空になるフィードディレクトリを収集"""
+        orphan_set = set(orphans)
+        empty_dirs = []
+        for tree, _ in ARTICLE_TREES.values():
+            tree_dir = self.storage_path / tree
+            if not tree_dir.exists():
+                continue
+            for feed_dir in tree_dir.iterdir():
+                if feed_dir.is_dir() and all(path in orphan_set for path in feed_dir.iterdir()):
+                    empty_dirs.append(feed_dir)
+        return empty_dirs
+    
+    def sweep_states(self, live: set, dry_run: bool) -> int:
+        """存在しない記事（ライブにもアーカイブにもない）の状態エントリを回収"""
+        journal = StateJournal(str(self.storage_path))
+        if not journal.snapshot_path.exists() and not journal.journal_path.exists():
+            return 0
+        
+        known_ids = {article_id for _, article_id in live}
+        known_ids.update(entry['article_id'] for entry in ArticleArchive(str(self.storage_path)).iter_entries())
+        swept = []
+        
+        def sweep(states: dict):
+            for category in self.SWEPT_STATES:
+                entries = states.get(category, {})
+                stale_ids = [article_id for article_id in entries if article_id not in known_ids]
+                for article_id in stale_ids:
+                    del entries[article_id]
+                    logger.debug(f"[状態回収] {category}: {article_id}")
+                swept.extend(stale_ids)
+        
+        if dry_run:
+            sweep(journal.load())
+        else:
+            # ジャーナルの畳み込みと同時に回収（Viewerの追記とはロックで直列化）
+            journal.compact(transform=sweep)
+        
+        return len(swept)
+    
+    def run(self, dry_run: bool = False):
+        """GCを実行（dry_runでは回収予定のみ報告）"""
+        logger.info("=== ストレージGC開始 ===")
+        if dry_run:
+            logger.info("【ドライランモード】実際の削除は行いません")
+        
+        live = self.mark()
+        logger.info(f"生存記事: {len(live)}件")
+        
+        orphans = self.find_orphan_files(live)
+        temp_files = self.find_stale_temp_files()
+        empty_dirs = self.find_empty_dirs(orphans + temp_files)
+        reclaimed_bytes = 0
+        
+        for path in orphans + temp_files:
+            try:
+                reclaimed_bytes += path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if dry_run:
+                logger.info(f"[削除予定] {path.relative_to(self.storage_path)}")
+            else:
+                path.unlink(missing_ok=True)
+                logger.debug(f"削除: {path}")
+        
+        if not dry_run:
+            for feed_dir in empty_dirs:
+                try:
+                    feed_dir.rmdir()
+                except OSError as e:
+                    # スキャン後に他のサービスが書き込んだ（空でなくなった）
+                    logger.debug(f"ディレクトリを残します: {feed_dir} ({e})")
+        
+        swept_states = self.sweep_states(live, dry_run)
+        swept_leases, _ = sweep_expired_leases(str(self.storage_path), dry_run)
+        
+        verb = '回収予定' if dry_run else '回収'
+        logger.info(
+            f"=== GC完了: 孤立ファイル {len(orphans)}件・一時ファイル {len(temp_files)}件 "
+            f"({reclaimed_bytes / 1024:.1f} KB) {verb}、"
+            f"空ディレクトリ {len(empty_dirs)}件、状態エントリ {swept_states}件、"
+            f"期限切れリース {swept_leases}件 ==="
+        )
+        return {'files': len(orphans), 'temp_files': len(temp_files), 'bytes': reclaimed_bytes,
+                'dirs': len(empty_dirs), 'states': swept_states, 'leases': swept_leases}
 
 
 def main(event=None, context=None):
     """エントリポイント"""
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - Data Cleanup')
+    parser.add_argument('--dry-run', action='store_true', help='削除対象を表示するだけで削除しない')
+    parser.add_argument('--archive', action='store_true', help='削除前に圧縮アーカイブへ退避（RETENTION_MODE=archive と同じ）')
+    parser.add_argument('--gc', action='store_true', help='保持期間の削除の代わりに孤立ファイル・状態エントリを回収')
+    parser.add_argument('--profile', nargs='?', const='sample', choices=MODES,
+                        help='プロファイルを storage/profiles/ に出力（PROFILE=sample|cprofile と同じ）')
+    # Lambda実行時はコマンドライン引数を解釈しない
+    args = parser.parse_args([] if event is not None else None)
+    
     storage_path = os.getenv('STORAGE_PATH', '/tmp/rss-data')
     retention_days = int(os.getenv('RETENTION_DAYS', '7'))
-    dry_run = os.getenv('DRY_RUN', 'false').lower() == 'true'
+    dry_run = args.dry_run or os.getenv('DRY_RUN', 'false').lower() == 'true'
+    
+    if args.gc:
+        with profiled('data-cleanup', storage_path, args.profile):
+            StorageGC(storage_path).run(dry_run=dry_run)
+        return {'statusCode': 200, 'body': 'Storage GC completed'}
     
-    cleanup = DataCleanup(storage_path, retention_days)
-    cleanup.run(dry_run=dry_run)
+    with profiled('data-cleanup', storage_path, args.profile):
+        cleanup = DataCleanup(storage_path, retention_days, archive=True if args.archive else None)
+        cleanup.run(dry_run=dry_run)
     
     return {'statusCode': 200, 'body': 'Data cleanup completed'}
 
@@ -4,9 +4,20 @@ RSS Filter - LLMで記事の価値を判定し、要約対象を選別
 """
 import os
 import json
+import sys
+import time
 import logging
 from pathlib import Path
-from openai import OpenAI
+from typing import Optional
+
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from catalog import open_catalog  # noqa: E402
+from storage_writer import StorageWriter  # noqa: E402
+from telemetry import Telemetry, article_key  # noqa: E402
+from profiling import profiled  # noqa: E402
+from leases import LeaseLost, open_leases  # noqa: E402
+from rate_governor import base_priority, create_response, open_governor  # noqa: E402
 
 # ロギング設定
 logging.basicConfig(
@@ -20,7 +31,19 @@ class RSSFilter:
     def __init__(self, storage_path: str, api_key: str):
         self.storage_path = Path(storage_path)
         self.rss_feeds_dir = self.storage_path / 'rss-feeds'
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self._client = None
+        # 接続先とリトライ設定（OPENAI_BASE_URL でローカルのスタブなどOpenAI互換のエンドポイントを指定）
+        self.base_url = os.getenv('OPENAI_BASE_URL') or None
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+        self.request_timeout = float(os.getenv('OPENAI_TIMEOUT', '600'))
+        self.catalog = open_catalog(storage_path)  # CATALOG_BACKEND=sqlite のときのみ
+        self.writer = StorageWriter()
+        self.telemetry = Telemetry('llm-judge', storage_path)
+        self.leases = open_leases(storage_path, 'judge')  # LEASES_ENABLED=true のときのみ
+        # RATE_GOVERNOR_ENABLED=true のときのみ（Article Processorとレート制限を共有）
+        self.governor = open_governor(storage_path)
+        self.priority = base_priority()
         self.model = os.getenv('FILTER_MODEL', 'gpt-4o-mini')
         
         # プロンプトファイルを読み込み
@@ -38,10 +61,24 @@ class RSSFilter:
             self.user_prefs = json.load(f)
             self.score_threshold = float(self.user_prefs.get('score_threshold', 6.0))
     
+    @property
+    def client(self):
+        """OpenAIクライアント（判定対象があるときだけ生成。openaiのimportも遅延させる）"""
+        if self._client is None:
+            from openai import OpenAI
+            # ガバナー経由では再試行もガバナーが行う（429を全プロセスで共有するため）
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                  max_retries=0 if self.governor else self.max_retries,
+                                  timeout=self.request_timeout)
+        return self._client
+    
     def get_unfiltered_articles(self) -> list:
         """フィルタリング待ちの記事を取得"""
         unfiltered = []
         
+        if self.catalog is not None:
+            return self._load_articles(self.catalog.pending_judge())
+        
         if not self.rss_feeds_dir.exists():
             return unfiltered
         
@@ -55,8 +92,8 @@ class RSSFilter:
                 with open(metadata_file, 'r', encoding='utf-8') as f:
                     metadata = json.load(f)
                 
-                # 既にフィルタリング済みかチェック
-                if 'filter_score' in metadata:
+                # 既にフィルタリング済みかチェック（フィード内容が更新された記事は再判定）
+                if 'filter_score' in metadata and not self.is_feed_updated(metadata):
                     continue
                 
                 unfiltered.append({
@@ -67,6 +104,26 @@ class RSSFilter:
         
         return unfiltered
     
+    def _load_articles(self, keys: list) -> list:
+        """カタログが返した (feed_name, article_id) のメタデータを読み込み"""
+        articles = []
+        for feed_name, article_id in keys:
+            metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+            try:
+                with open(metadata_file, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"メタデータ読み込み失敗: {feed_name}/{article_id} ({e})")
+                continue
+            articles.append({'feed_name': feed_name, 'article_id': article_id, 'metadata': metadata})
+        return articles
+    
+    @staticmethod
+    def is_feed_updated(metadata: dict) -> bool:
+        """判定後にRSS Feederがフィード内容の更新を検知したか（feed_hashの差分）"""
+        feed_hash = metadata.get('feed_hash')
+        return bool(feed_hash) and metadata.get('judged_feed_hash') != feed_hash
+    
     def create_filter_prompt(self, title: str, summary: str) -> str:
         """フィルタリング用のプロンプトを生成（スキーマから指示を自動生成）"""
         # スキーマから回答指示を自動生成
@@ -199,7 +256,8 @@ class RSSFilter:
         
         try:
             # Response API: client.responses.create() with input parameter
-            response = self.client.responses.create(
+            started = time.perf_counter()
+            response = create_response(self.client, dict(
                 model=self.model,
                 input=[
                     {"role": "system", "content": self.system_prompt},
@@ -207,7 +265,8 @@ class RSSFilter:
                 ],
                 temperature=0.3,
                 stream=False
-            )
+            ), self.governor, self.priority)
+            self.telemetry.record_usage(self.model, response, time.perf_counter() - started)
             
             # output_textプロパティからテキストを取得
             result_text = response.output_text
@@ -235,6 +294,8 @@ class RSSFilter:
             }
         except Exception as e:
             logger.error(f"フィルタリングエラー: {e}")
+            if 'response' not in locals():
+                self.telemetry.record_llm(self.model, 0, 0, duration=time.perf_counter() - started, status='error')
             import traceback
             logger.error(traceback.format_exc())
             return {
@@ -251,11 +312,68 @@ class RSSFilter:
         metadata['filter_reason'] = filter_result.get('reason', '')
         metadata['interest_match'] = filter_result.get('interest_match', [])
         metadata['article_type'] = filter_result.get('article_type', 'tutorial')  # デフォルトはtutorial
+        if metadata.get('feed_hash'):
+            metadata['judged_feed_hash'] = metadata['feed_hash']
         
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        self.writer.write_json(metadata_path, metadata)
         
         logger.info(f"フィルタ結果保存: {feed_name}/{article_id}.json (type: {metadata['article_type']})")
+        if self.catalog is not None:
+            self.catalog.mark_judged(feed_name, article_id, metadata['filter_score'], metadata['article_type'])
+    
+    def _claim(self, feed_name: str, article_id: str):
+        """
+        他のレプリカと重複しないよう記事のリースを取り、まだ判定待ちか読み直す
+
+        Returns:
+            (リース, 最新のメタデータ)（他のレプリカが処理中・処理済みなら (None, None)）
+        """
+        lease = self.leases.claim(feed_name, article_id)
+        if lease is None:
+            logger.info(f"他のレプリカが処理中: {feed_name}/{article_id}")
+            return None, None
+        articles = self._load_articles([(feed_name, article_id)])
+        metadata = articles[0]['metadata'] if articles else None
+        if metadata is None or ('filter_score' in metadata and not self.is_feed_updated(metadata)):
+            lease.release()
+            return None, None
+        return lease, metadata
+    
+    def judge_article(self, article: dict) -> Optional[dict]:
+        """
+        1件の記事を判定して結果を保存（run() とパイプラインデーモンから呼ばれる）
+        
+        Returns:
+            判定結果（他のレプリカが処理した・リースを失った場合は None）
+        """
+        feed_name = article['feed_name']
+        article_id = article['article_id']
+        metadata = article['metadata']
+        
+        lease = None
+        if self.leases is not None:
+            lease, metadata = self._claim(feed_name, article_id)
+            if lease is None:
+                return None
+        
+        logger.info(f"フィルタリング中: {feed_name}/{article_id}")
+        
+        try:
+            with self.telemetry.trace(article_key(feed_name, article_id)):
+                with self.telemetry.span('judge'):
+                    filter_result = self.filter_article(metadata.get('title', ''), metadata.get('summary', ''))
+                if lease is not None:
+                    lease.check()
+                with self.telemetry.span('write'):
+                    self.save_filter_result(feed_name, article_id, filter_result, metadata)
+        except LeaseLost as e:
+            logger.warning(f"判定結果を破棄: {feed_name}/{article_id} ({e})")
+            return None
+        finally:
+            if lease is not None:
+                lease.release()
+        article['metadata'] = metadata
+        return filter_result
     
     def run(self):
         """メイン処理"""
@@ -263,32 +381,27 @@ class RSSFilter:
         
         articles = self.get_unfiltered_articles()
         logger.info(f"フィルタリング対象: {len(articles)}件")
+        self.telemetry.set_queue_depth('judge', len(articles))
         
         if not articles:
             logger.info("フィルタリング対象なし")
+            self.telemetry.flush()
             return
         
         filtered_count = 0
         high_score_count = 0
         
-        for article in articles:
-            feed_name = article['feed_name']
-            article_id = article['article_id']
-            metadata = article['metadata']
-            
-            title = metadata.get('title', '')
-            summary = metadata.get('summary', '')
-            
-            logger.info(f"フィルタリング中: {feed_name}/{article_id}")
-            
-            filter_result = self.filter_article(title, summary)
-            self.save_filter_result(feed_name, article_id, filter_result, metadata)
-            
-            filtered_count += 1
-            score = filter_result.get('score', 0)
-            if score >= self.score_threshold:
-                high_score_count += 1
-                logger.info(f"✅ 高スコア記事: {title} (スコア: {score})")
+        with self.telemetry.run(), self.writer:
+            for article in articles:
+                filter_result = self.judge_article(article)
+                if filter_result is None:
+                    continue
+                
+                filtered_count += 1
+                score = filter_result.get('score', 0)
+                if score >= self.score_threshold:
+                    high_score_count += 1
+                    logger.info(f"✅ 高スコア記事: {article['metadata'].get('title', '')} (スコア: {score})")
         
         logger.info(f"=== フィルタリング完了: {filtered_count}件処理、{high_score_count}件が閾値以上 ===")
 
@@ -302,8 +415,10 @@ def main(event=None, context=None):
         logger.error("OPENAI_API_KEY が設定されていません")
         return {'statusCode': 500, 'body': 'API Key not configured'}
     
-    filter_service = RSSFilter(storage_path, api_key)
-    filter_service.run()
+    # --profile または PROFILE=sample|cprofile でプロファイルを storage/profiles/ に出力
+    with profiled('llm-judge', storage_path):
+        filter_service = RSSFilter(storage_path, api_key)
+        filter_service.run()
     
     return {'statusCode': 200, 'body': 'RSS filtering completed'}
 
@@ -3,10 +3,27 @@
 Article Processor - 記事本文を解説・要約してストレージに保存
 """
 import os
+import sys
+import argparse
 import json
+import time
+import heapq
+import hashlib
 import logging
 from pathlib import Path
-from openai import OpenAI
+from typing import Iterator, Optional
+from model_router import ModelRouter, Route
+
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from catalog import open_catalog  # noqa: E402
+from check_marks import CheckMarks  # noqa: E402
+from storage_writer import StorageWriter, read_json  # noqa: E402
+from telemetry import Telemetry, article_key  # noqa: E402
+from profiling import MODES, profiled  # noqa: E402
+from leases import LeaseLost, open_leases  # noqa: E402
+from rate_governor import base_priority, create_response, open_governor  # noqa: E402
+from run_budget import RunBudget, parse_deadline, priority_key  # noqa: E402
 
 # ロギング設定
 logging.basicConfig(
@@ -16,6 +33,50 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class PartialSummaryFile:
+    """
+    ストリーミング中の要約を一時ファイル（<id>.md.partial）に追記し、完了時にアトミックに確定
+    
+    Viewerの一覧・検索は *.md のみを読むため、生成途中のファイルは含まれない
+    （APIの GET /api/generating でだけ「生成中」として読める）。
+    """
+    
+    SUFFIX = '.partial'
+    
+    def __init__(self, final_path: Path, header: str):
+        self.final_path = final_path
+        self.partial_path = final_path.with_name(final_path.name + self.SUFFIX)
+        self.file = open(self.partial_path, 'w', encoding='utf-8')
+        self.file.write(header)
+        self.file.flush()
+        self.header_pos = self.file.tell()
+    
+    def reset(self):
+        """本文部分を破棄してヘッダー直後まで巻き戻す（エスカレーション時の再生成用）"""
+        self.file.seek(self.header_pos)
+        self.file.truncate()
+    
+    def write(self, delta: str):
+        """受信したトークンを追記"""
+        self.file.write(delta)
+        self.file.flush()
+    
+    def commit(self, summary: str):
+        """整形済みの要約で本文を確定し、最終パスへリネーム"""
+        self.reset()
+        self.file.write(summary)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.partial_path, self.final_path)
+    
+    def discard(self):
+        """一時ファイルを削除"""
+        if not self.file.closed:
+            self.file.close()
+        self.partial_path.unlink(missing_ok=True)
+
+
 class ArticleProcessor:
     def __init__(self, storage_path: str, api_key: str):
         self.storage_path = Path(storage_path)
@@ -24,9 +85,47 @@ class ArticleProcessor:
         self.summaries_dir = self.storage_path / 'processed-articles'
         self.summaries_dir.mkdir(parents=True, exist_ok=True)
         
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self._client = None
+        # 接続先とリトライ設定（OPENAI_BASE_URL でローカルのスタブなどOpenAI互換のエンドポイントを指定）
+        self.base_url = os.getenv('OPENAI_BASE_URL') or None
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+        self.request_timeout = float(os.getenv('OPENAI_TIMEOUT', '600'))
         self.model = os.getenv('ARTICLE_MODEL', 'gpt-4o')
         
+        # 処理対象の取得設定（0 = 無制限、score = filter_scoreの高い順）
+        self.max_items = int(os.getenv('PROCESSOR_MAX_ITEMS', '0'))
+        self.order = os.getenv('PROCESSOR_ORDER', 'score')
+        
+        # プロンプト変更時に既存の要約も再生成するか（コーパス全体が対象になるためデフォルト無効）
+        self.resummarize_on_prompt_change = os.getenv('RESUMMARIZE_ON_PROMPT_CHANGE', 'false').lower() == 'true'
+        self._prompt_hashes = {}
+        
+        # ストリーミングモード（トークン受信ごとに一時ファイルへ追記）
+        self.streaming = os.getenv('STREAM_SUMMARIES', 'false').lower() == 'true'
+        
+        # モデルルーティング（記事タイプ・長さ・フィード・スコアでモデルを選択）
+        self.router = ModelRouter(Path(__file__).parent / 'config' / 'model_routing.json')
+        
+        # 全文検索インデックス（要約保存時に追記）
+        self._search_index = None
+        
+        # ステージカタログ（CATALOG_BACKEND=sqlite のときのみ）
+        self.catalog = open_catalog(storage_path)
+        self.writer = StorageWriter()
+        self.telemetry = Telemetry('llm-processor', storage_path)
+        self.leases = open_leases(storage_path, 'summarize')  # LEASES_ENABLED=true のときのみ
+        # 再要約不要と確認したメタデータ・本文のmtime（要約のmtimeは変更の検知に使うため触らない）
+        self.checked = CheckMarks(storage_path, 'summarize')
+        # RATE_GOVERNOR_ENABLED=true のときのみ（LLM Judgeとレート制限を共有し、filter_scoreの高い記事を優先）
+        self.governor = open_governor(storage_path)
+        self.priority = base_priority(None)
+        # 直近の get_pending_articles() を始めた時点の要約待ちの件数（走査順では数えないのでNone）
+        self.pending_count: Optional[int] = None
+        # LLM呼び出しの回数と消費トークン数（実行予算の記録用）
+        self.llm_calls = 0
+        self.tokens_used = 0
+        
         # プロンプトディレクトリのパスを保持（動的読み込み用）
         self.prompts_dir = Path(__file__).parent / 'prompts'
         
@@ -34,12 +133,83 @@ class ArticleProcessor:
         with open(self.prompts_dir / 'system.txt', 'r', encoding='utf-8') as f:
             self.system_prompt = f.read().strip()
     
-    def get_pending_articles(self) -> list:
-        """要約待ちの記事を取得"""
-        pending = []
+    @property
+    def client(self):
+        """OpenAIクライアント（要約対象があるときだけ生成。openaiのimportも遅延させる）"""
+        if self._client is None:
+            from openai import OpenAI
+            # ガバナー経由では再試行もガバナーが行う（429を全プロセスで共有するため）
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                  max_retries=0 if self.governor else self.max_retries,
+                                  timeout=self.request_timeout)
+        return self._client
+    
+    def _is_pending(self, feed_name: str, article_id: str) -> bool:
+        """要約待ちか判定（本文あり・メタデータあり・要約なしまたは要約が古い）"""
+        metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        if not metadata_file.exists():
+            return False
+        summary_file = self.summaries_dir / feed_name / f"{article_id}.md"
+        if not summary_file.exists():
+            return True
+        return self._is_summary_stale(feed_name, article_id, summary_file, metadata_file)
+    
+    def _is_summary_stale(self, feed_name: str, article_id: str,
+                          summary_file: Path, metadata_file: Path) -> bool:
+        """
+        本文ハッシュ（とプロンプトのバージョン）が要約時点から変わったか判定
+        
+        要約・前回の確認より新しいメタデータ・本文がなければパースせずに最新と判定する。
+        """
+        text_file = self.scraped_dir / feed_name / f"{article_id}.md"
+        summary_mtime = summary_file.stat().st_mtime
+        if not self.resummarize_on_prompt_change:
+            if metadata_file.stat().st_mtime <= summary_mtime and text_file.stat().st_mtime <= summary_mtime:
+                return False
+            if self.checked.is_current(feed_name, article_id, metadata_file, text_file):
+                return False
+        
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        
+        scraped_hash = metadata.get('scraped_hash')
+        stale = bool(scraped_hash) and metadata.get('summary_source_hash') != scraped_hash
+        
+        if not stale and self.resummarize_on_prompt_change:
+            prompt_hash = metadata.get('summary_prompt_hash')
+            stale = bool(prompt_hash) and prompt_hash != self.compute_prompt_hash(metadata.get('article_type', 'tutorial'))
+        
+        if stale:
+            logger.debug(f"更新検知（再要約）: {feed_name}/{article_id}")
+        else:
+            # 変更なしを確認済み: 次回以降はパースを省略
+            self.checked.mark(feed_name, article_id, metadata_file, text_file)
+        return stale
+    
+    def _load_work_item(self, feed_name: str, article_id: str) -> Optional[dict]:
+        """メタデータを読み込んで作業アイテムを作成（本文は処理時に読み込む）"""
+        metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"メタデータ読み込み失敗: {feed_name}/{article_id} ({e})")
+            return None
         
+        return {
+            'feed_name': feed_name,
+            'article_id': article_id,
+            'metadata': metadata,
+            'text_path': self.scraped_dir / feed_name / f"{article_id}.md"
+        }
+    
+    def _scan_pending_ids(self) -> Iterator[tuple]:
+        """要約待ち記事の (feed_name, article_id) を順次返す"""
         if not self.scraped_dir.exists():
-            return pending
+            return
         
         for feed_dir in self.scraped_dir.iterdir():
             if not feed_dir.is_dir():
@@ -49,37 +219,78 @@ class ArticleProcessor:
             
             for text_file in feed_dir.glob('*.md'):  # .md形式に変更
                 article_id = text_file.stem
-                
-                # 既に要約済みかチェック
-                summary_file = self.summaries_dir / feed_name / f"{article_id}.md"
-                if summary_file.exists():
-                    continue
-                
-                # メタデータを取得
+                if self._is_pending(feed_name, article_id):
+                    yield feed_name, article_id
+    
+    def get_pending_articles(self, max_items: Optional[int] = None,
+                             order: Optional[str] = None) -> Iterator[dict]:
+        """
+        要約待ちの記事を遅延的に返す
+        
+        本文は保持せず、process_article() で処理する直前に読み込む。
+        
+        Args:
+            max_items: 最大件数（None/0で無制限）
+            order: 'score' ならfilter_scoreの高い順（同点は新しい順）、'none' ならディレクトリ走査順
+        """
+        max_items = self.max_items if max_items is None else max_items
+        order = order or self.order
+        self.pending_count = None
+        
+        if self.catalog is not None:
+            self.pending_count = self.catalog.count_pending_summary()
+            # 部分インデックスから要約待ちだけを取得（並び替え・件数制限もSQL側で行う）
+            for feed_name, article_id in self.catalog.pending_summary(max_items, order):
+                item = self._load_work_item(feed_name, article_id)
+                if item:
+                    yield item
+            return
+        
+        if order != 'score':
+            # 走査順: 最初のアイテムを即座に返す
+            yielded = 0
+            for feed_name, article_id in self._scan_pending_ids():
+                if max_items and yielded >= max_items:
+                    return
+                item = self._load_work_item(feed_name, article_id)
+                if item:
+                    yielded += 1
+                    yield item
+            return
+        
+        # スコア順（同点は新しい順）: (score, published_ts, feed, id) だけを保持し、
+        # max_items 指定時は上位N件のみヒープで保持
+        scanned = 0
+        
+        def scored_ids():
+            nonlocal scanned
+            for feed_name, article_id in self._scan_pending_ids():
+                scanned += 1
                 metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
-                if not metadata_file.exists():
-                    continue
-                
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                with open(text_file, 'r', encoding='utf-8') as f:
-                    article_text = f.read()
-                
-                pending.append({
-                    'feed_name': feed_name,
-                    'article_id': article_id,
-                    'metadata': metadata,
-                    'text': article_text
-                })
+                try:
+                    with open(metadata_file, 'r', encoding='utf-8') as f:
+                        score, published_ts = priority_key(json.load(f))
+                except (OSError, json.JSONDecodeError):
+                    score, published_ts = 0.0, 0.0
+                yield score, published_ts, feed_name, article_id
         
-        return pending
-    
-    def create_summary_prompt(self, article_text: str, metadata: dict) -> str:
-        """要約用のプロンプトを生成（article_typeに応じて動的に読み込み）"""
-        article_type = metadata.get('article_type', 'tutorial')
+        if max_items:
+            ranked = heapq.nlargest(max_items, scored_ids())
+        else:
+            ranked = sorted(scored_ids(), reverse=True)
+        # 並び替えのために全件を走査したので、上限で切る前の件数がわかる
+        self.pending_count = scanned
         
-        # article_typeに応じたプロンプトファイルを動的に読み込み
+        for _, _, feed_name, article_id in ranked:
+            # 並び替え中に他プロセスが処理した可能性があるため再確認
+            if not self._is_pending(feed_name, article_id):
+                continue
+            item = self._load_work_item(feed_name, article_id)
+            if item:
+                yield item
+    
+    def load_prompt_template(self, article_type: str) -> str:
+        """article_typeに応じたプロンプトテンプレートを読み込み"""
         prompt_filename = f'user_{article_type}.txt'
         prompt_path = self.prompts_dir / prompt_filename
         
@@ -88,7 +299,19 @@ class ArticleProcessor:
             prompt_path = self.prompts_dir / 'user_tutorial.txt'
         
         with open(prompt_path, 'r', encoding='utf-8') as f:
-            template = f.read().strip()
+            return f.read().strip()
+    
+    def compute_prompt_hash(self, article_type: str) -> str:
+        """システムプロンプトとタイプ別テンプレートのハッシュ（プロンプトのバージョン）"""
+        if article_type not in self._prompt_hashes:
+            content = self.system_prompt + '\n' + self.load_prompt_template(article_type)
+            self._prompt_hashes[article_type] = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        return self._prompt_hashes[article_type]
+    
+    def create_summary_prompt(self, article_text: str, metadata: dict) -> str:
+        """要約用のプロンプトを生成（article_typeに応じて動的に読み込み）"""
+        article_type = metadata.get('article_type', 'tutorial')
+        template = self.load_prompt_template(article_type)
         
         # テンプレートに値を埋め込み
         return template.format(
@@ -96,53 +319,138 @@ class ArticleProcessor:
             content=article_text[:8000]  # トークン制限対策
         )
     
-    def generate_summary(self, article_text: str, metadata: dict) -> str:
-        """GPT-4oで要約を生成（article_typeに応じてmax_tokensを調整）"""
+    def validate_summary(self, summary: str, article_type: str, status: str) -> bool:
+        """
+        要約がプロンプトの出力形式を満たしているか検証
+        
+        プロンプトテンプレート内の見出し（## ...）がすべて含まれ、
+        出力がmax_output_tokensで打ち切られていないことを確認する。
+        """
+        if not summary or status == 'incomplete':
+            return False
+        
+        template = self.load_prompt_template(article_type)
+        headings = [line.strip() for line in template.split('\n') if line.startswith('## ')]
+        return all(heading in summary for heading in headings)
+    
+    def _call_model(self, model: str, prompt: str, max_tokens: int,
+                    partial: Optional[PartialSummaryFile] = None, priority: float = 0.0) -> tuple:
+        """LLMを呼び出し、(要約, ステータス, 入力トークン, 出力トークン) を返す"""
+        # Response API: client.responses.create() with input parameter
+        request = dict(
+            model=model,
+            input=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_output_tokens=max_tokens
+        )
+        
+        started = time.monotonic()
+        self.llm_calls += 1
+        if partial is None:
+            response = create_response(self.client, dict(request, stream=False), self.governor, priority)
+            # output_textプロパティからテキストを取得
+            summary = response.output_text
+        else:
+            # ストリーミング: 差分を受信するたびに一時ファイルへ追記
+            partial.reset()
+            chunks = []
+            response = None
+            for event in create_response(self.client, dict(request, stream=True), self.governor, priority):
+                if event.type == 'response.output_text.delta':
+                    chunks.append(event.delta)
+                    partial.write(event.delta)
+                elif event.type in ('response.completed', 'response.incomplete'):
+                    response = event.response
+                elif event.type in ('response.failed', 'error'):
+                    raise RuntimeError(f"ストリーミング失敗: {getattr(event, 'message', event.type)}")
+            summary = ''.join(chunks)
+        
+        # マークダウンコードブロックを除去（必要に応じて）
+        if summary.startswith('```'):
+            summary = summary.split('\n', 1)[1] if '\n' in summary else summary
+            if summary.endswith('```'):
+                summary = summary.rsplit('```', 1)[0]
+            summary = summary.strip()
+        
+        usage = getattr(response, 'usage', None)
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        status = getattr(response, 'status', 'completed') or 'completed'
+        self.tokens_used += input_tokens + output_tokens
+        self.telemetry.record_usage(model, response, time.monotonic() - started)
+        return summary, status, input_tokens, output_tokens
+    
+    def _generate_with_route(self, route: Route, model_key: str, prompt: str, article_type: str,
+                             escalated: bool = False,
+                             partial: Optional[PartialSummaryFile] = None, priority: float = 0.0) -> tuple:
+        """指定モデルで要約を生成し、(要約, 検証結果) を返す（コストはルート統計に記録）"""
+        model = self.router.model_name(model_key)
+        started = time.monotonic()
+        try:
+            summary, status, input_tokens, output_tokens = self._call_model(
+                model, prompt, route.max_output_tokens, partial, priority
+            )
+        except Exception as e:
+            self.router.record(route, model_key, time.monotonic() - started, 0, 0, success=False, escalated=escalated)
+            self.telemetry.record_llm(model, 0, 0, duration=time.monotonic() - started, status='error')
+            raise e
+        
+        valid = self.validate_summary(summary, article_type, status)
+        self.router.record(route, model_key, time.monotonic() - started,
+                           input_tokens, output_tokens, success=valid, escalated=escalated)
+        
+        if not valid:
+            logger.warning(f"要約の検証に失敗 (route: {route.name}, model: {model}, status: {status})")
+        return summary, valid
+    
+    def generate_summary(self, article_text: str, metadata: dict,
+                         partial: Optional[PartialSummaryFile] = None) -> str:
+        """
+        ルーティングで選択したモデルで要約を生成（検証失敗時は上位モデルへエスカレーション）
+        
+        partialを指定するとストリーミングで生成し、受信したトークンを一時ファイルに追記する。
+        """
         try:
             article_type = metadata.get('article_type', 'tutorial')
             prompt = self.create_summary_prompt(article_text, metadata)
             
-            # article_typeに応じてmax_tokensを調整
-            max_tokens = 800 if article_type == 'news' else 2000
+            # article_type・長さ・フィード・スコアでモデルとmax_tokensを決定
+            route = self.router.select(prompt, metadata)
+            # レート制限の待ち行列ではスコアの高い記事を先に通す
+            priority = self.priority if self.priority is not None else float(metadata.get('filter_score', 0))
             
-            # Response API: client.responses.create() with input parameter
-            response = self.client.responses.create(
-                model=self.model,
-                input=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_output_tokens=max_tokens,
-                stream=False
-            )
-            
-            # output_textプロパティからテキストを取得
-            summary = response.output_text
+            summary, valid = '', False
+            try:
+                summary, valid = self._generate_with_route(
+                    route, route.model_key, prompt, article_type, partial=partial, priority=priority
+                )
+            except Exception as e:
+                if not route.escalate_to:
+                    raise e
+                logger.warning(f"要約生成エラー（エスカレーションします）: {str(e)}")
             
-            # マークダウンコードブロックを除去（必要に応じて）
-            if summary.startswith('```'):
-                summary = summary.split('\n', 1)[1] if '\n' in summary else summary
-                if summary.endswith('```'):
-                    summary = summary.rsplit('```', 1)[0]
-                summary = summary.strip()
+            # 安価モデルの出力が不正なら上位モデルで再生成
+            if not valid and route.escalate_to:
+                logger.info(f"エスカレーション: {route.name} → {self.router.model_name(route.escalate_to)}")
+                escalated_summary, valid = self._generate_with_route(
+                    route, route.escalate_to, prompt, article_type, escalated=True, partial=partial,
+                    priority=priority
+                )
+                summary = escalated_summary or summary
             
-            logger.info(f"要約生成完了 (type: {article_type}, tokens: {max_tokens})")
+            logger.info(f"要約生成完了 (type: {article_type}, route: {route.name}, tokens: {route.max_output_tokens})")
             return summary
             
         except Exception as e:
             logger.error(f"要約生成エラー: {str(e)}")
             return ''
     
-    def save_summary(self, feed_name: str, article_id: str, summary: str, metadata: dict):
-        """要約をMarkdownファイルとして保存"""
-        feed_dir = self.summaries_dir / feed_name
-        feed_dir.mkdir(parents=True, exist_ok=True)
-        
-        summary_path = feed_dir / f"{article_id}.md"
-        
-        # メタデータヘッダーを追加
-        header = f"""---
+    def build_summary_header(self, feed_name: str, metadata: dict) -> str:
+        """要約ファイル先頭のメタデータヘッダーを生成"""
+        return f"""---
 title: {metadata.get('title', 'N/A')}
 url: {metadata.get('url', 'N/A')}
 author: {metadata.get('author', 'N/A')}
@@ -151,42 +459,188 @@ feed: {feed_name}
 ---
 
 """
+    
+    def save_summary(self, feed_name: str, article_id: str, summary: str, metadata: dict):
+        """要約をMarkdownファイルとして保存（一時ファイル経由でアトミックに書き込み）"""
+        feed_dir = self.summaries_dir / feed_name
+        feed_dir.mkdir(parents=True, exist_ok=True)
         
-        full_content = header + summary
+        summary_path = feed_dir / f"{article_id}.md"
         
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+        # メタデータヘッダーを追加
+        partial = PartialSummaryFile(summary_path, self.build_summary_header(feed_name, metadata))
+        partial.commit(summary)
         
         logger.info(f"保存完了: {feed_name}/{article_id}.md")
     
+    def save_summary_hashes(self, feed_name: str, article_id: str):
+        """要約の元になった本文ハッシュとプロンプトのバージョンをメタデータに記録"""
+        metadata_path = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        metadata = read_json(metadata_path)
+        
+        metadata['summary_source_hash'] = metadata.get('scraped_hash')
+        metadata['summary_prompt_hash'] = self.compute_prompt_hash(metadata.get('article_type', 'tutorial'))
+        
+        self.writer.write_json(metadata_path, metadata)
+        
+        # ハッシュの記録でメタデータが要約より新しくなるため、この時点のメタデータ・本文を確認済みにする
+        self.checked.mark(feed_name, article_id, metadata_path, self.scraped_dir / feed_name / f"{article_id}.md")
+        
+        if self.catalog is not None:
+            self.catalog.mark_summarized(feed_name, article_id)
+    
+    def index_summary(self, feed_name: str, article_id: str, summary: str, metadata: dict):
+        """要約を全文検索インデックスに追加（失敗しても要約処理は継続）"""
+        try:
+            if self._search_index is None:
+                from search_index import SearchIndex
+                self._search_index = SearchIndex(str(self.storage_path))
+            mtime = (self.summaries_dir / feed_name / f"{article_id}.md").stat().st_mtime
+            self._search_index.upsert(feed_name, article_id, metadata.get('title', ''), summary, mtime)
+        except Exception as e:
+            logger.warning(f"検索インデックス更新失敗: {feed_name}/{article_id} ({e})")
+    
+    def discard_partial_summaries(self):
+        """前回の実行で中断された生成途中の一時ファイルを削除（次回は最初から再生成）"""
+        discarded = 0
+        for partial_path in self.summaries_dir.glob(f'*/*.md{PartialSummaryFile.SUFFIX}'):
+            article_id = partial_path.name[:-len(f'.md{PartialSummaryFile.SUFFIX}')]
+            if self.leases is not None and self.leases.is_held(partial_path.parent.name, article_id):
+                # 他のレプリカが生成中
+                continue
+            partial_path.unlink(missing_ok=True)
+            discarded += 1
+        
+        if discarded > 0:
+            logger.info(f"中断された要約の一時ファイルを破棄: {discarded}件")
+    
     def process_article(self, article_info: dict):
-        """記事を要約"""
+        """記事を要約（LEASES_ENABLED=true ならリースを取り、他のレプリカが処理中・処理済みの記事は飛ばす）"""
+        if self.leases is None:
+            self._summarize_article(article_info)
+            return
+        
+        feed_name = article_info['feed_name']
+        article_id = article_info['article_id']
+        lease = self.leases.claim(feed_name, article_id)
+        if lease is None:
+            logger.info(f"他のレプリカが処理中: {feed_name}/{article_id}")
+            return
+        try:
+            if not self._is_pending(feed_name, article_id):
+                return
+            item = self._load_work_item(feed_name, article_id)
+            if item is not None:
+                self._summarize_article(dict(article_info, metadata=item['metadata']), lease)
+        except LeaseLost as e:
+            logger.warning(f"要約を破棄: {feed_name}/{article_id} ({e})")
+        finally:
+            lease.release()
+    
+    def _summarize_article(self, article_info: dict, lease=None):
+        """記事を要約して保存（lease があれば確定の直前にリースを確認）"""
         feed_name = article_info['feed_name']
         article_id = article_info['article_id']
         metadata = article_info['metadata']
-        article_text = article_info['text']
+        
+        # 本文は処理直前に読み込む（待機中の記事の本文をメモリに保持しない）
+        article_text = article_info.get('text')
+        if article_text is None:
+            try:
+                with open(article_info['text_path'], 'r', encoding='utf-8') as f:
+                    article_text = f.read()
+            except OSError as e:
+                logger.warning(f"本文の読み込み失敗: {feed_name}/{article_id} ({e})")
+                return
         
         logger.info(f"要約開始: {metadata.get('title', article_id)}")
         
-        summary = self.generate_summary(article_text, metadata)
+        if not self.streaming:
+            with self.telemetry.span('summarize', chars=len(article_text)):
+                summary = self.generate_summary(article_text, metadata)
+            
+            if summary:
+                if lease is not None:
+                    lease.check()
+                with self.telemetry.span('write'):
+                    self.save_summary(feed_name, article_id, summary, metadata)
+                    self.save_summary_hashes(feed_name, article_id)
+                self.index_summary(feed_name, article_id, summary, metadata)
+            else:
+                logger.warning(f"要約生成失敗: {article_id}")
+            return
         
-        if summary:
-            self.save_summary(feed_name, article_id, summary, metadata)
-        else:
-            logger.warning(f"要約生成失敗: {article_id}")
+        # ストリーミング: ヘッダーを先に書き込み、本文はトークン受信ごとに追記
+        feed_dir = self.summaries_dir / feed_name
+        feed_dir.mkdir(parents=True, exist_ok=True)
+        partial = PartialSummaryFile(feed_dir / f"{article_id}.md", self.build_summary_header(feed_name, metadata))
+        
+        try:
+            with self.telemetry.span('summarize', chars=len(article_text), streaming=True):
+                summary = self.generate_summary(article_text, metadata, partial=partial)
+            if summary:
+                if lease is not None:
+                    lease.check()
+                with self.telemetry.span('write'):
+                    partial.commit(summary)
+                    logger.info(f"保存完了: {feed_name}/{article_id}.md")
+                    self.save_summary_hashes(feed_name, article_id)
+                self.index_summary(feed_name, article_id, summary, metadata)
+            else:
+                logger.warning(f"要約生成失敗: {article_id}")
+        finally:
+            partial.discard()
     
-    def run(self):
-        """全ての待機記事を処理"""
-        pending = self.get_pending_articles()
-        logger.info(f"処理開始: {len(pending)}件の記事")
+    def run(self, deadline: Optional[float] = None, token_budget: Optional[int] = None):
+        """
+        全ての待機記事を処理
+        
+        Args:
+            deadline: 締め切り（UNIX時刻）
+            token_budget: この実行で使うトークン数の上限
+            
+        どちらかを指定すると、記事タイプごとの履歴から見積もった1件のコストが
+        残り時間・残りトークンに収まらなくなった時点で新しい記事を始めずに終了する。
+        """
+        self.discard_partial_summaries()
         
-        for article_info in pending:
-            self.process_article(article_info)
+        logger.info(f"処理開始 (順序: {self.order}, 上限: {self.max_items or '無制限'})")
         
-        logger.info(f"処理完了: {len(pending)}件")
+        processed_count = 0
+        budget = RunBudget('llm-processor', str(self.storage_path), deadline, token_budget)
+        with self.telemetry.run(), self.writer:
+            for article_info in self.get_pending_articles():
+                article_type = article_info['metadata'].get('article_type', 'tutorial')
+                if not budget.can_start(article_type):
+                    break
+                calls, tokens, started = self.llm_calls, self.tokens_used, time.monotonic()
+                with self.telemetry.trace(article_key(article_info['feed_name'], article_info['article_id'])):
+                    self.process_article(article_info)
+                processed_count += 1
+                if self.llm_calls > calls:
+                    # 他のレプリカが処理した記事など、LLMを呼ばなかった記事は見積もりに含めない
+                    budget.record(article_type, time.monotonic() - started, self.tokens_used - tokens)
+            # 要約待ちは遅延的に探索するため、探索で数えられた開始時点の件数を記録（走査順では記録しない）
+            if self.pending_count is not None:
+                self.telemetry.set_queue_depth('summarize', self.pending_count)
+        
+        budget.save()
+        self.checked.save()
+        
+        logger.info(f"処理完了: {processed_count}件")
+        self.router.log_stats()
 
 
 def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - Article Processor')
+    parser.add_argument('--deadline', default=os.getenv('RUN_DEADLINE'),
+                        help='締め切り（30m / 1h30m / 1800 / 06:45）。終わらない見込みの記事は次回に回す')
+    parser.add_argument('--budget', type=int, default=int(os.getenv('PROCESSOR_TOKEN_BUDGET', '0')),
+                        help='この実行で使うトークン数の上限（0で無制限）')
+    parser.add_argument('--profile', nargs='?', const='sample', choices=MODES,
+                        help='プロファイルを storage/profiles/ に出力（PROFILE=sample|cprofile と同じ）')
+    args = parser.parse_args()
+    
     storage_path = os.getenv('STORAGE_PATH', './storage')
     api_key = os.getenv('OPENAI_API_KEY')
     
@@ -194,8 +648,9 @@ def main():
         logger.error("OPENAI_API_KEY が設定されていません")
         return
     
-    processor = ArticleProcessor(storage_path, api_key)
-    processor.run()
+    with profiled('llm-processor', storage_path, args.profile):
+        processor = ArticleProcessor(storage_path, api_key)
+        processor.run(parse_deadline(args.deadline), args.budget)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+モデルルーティング - 記事の性質に応じて要約モデルを選択し、ルート別のコストを集計
+"""
+import os
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Route:
+    """ルーティング結果（使用するモデルと出力上限）"""
+    name: str
+    model_key: str
+    max_output_tokens: int
+    escalate_to: Optional[str] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数を概算（tokenizer非依存）
+
+    ASCII文字は約4文字で1トークン、日本語などの非ASCII文字は約1文字で1トークンとして数える。
+    """
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+class ModelRouter:
+    """config/model_routing.json のルールに従ってモデルを選択"""
+
+    def __init__(self, config_path: Path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        # モデル名は .env（環境依存）、ルールは config（ユーザー設定）で管理
+        self.models: Dict[str, Dict] = {}
+        for key, model_conf in self.config.get('models', {}).items():
+            model_name = os.getenv(model_conf.get('model_env', ''), '') or model_conf.get('default', key)
+            self.models[key] = {
+                'name': model_name,
+                'input_cost_per_1m': float(model_conf.get('input_cost_per_1m', 0)),
+                'output_cost_per_1m': float(model_conf.get('output_cost_per_1m', 0)),
+            }
+
+        self.routes: List[Dict] = self.config.get('routes', [])
+        self.default_route: Dict = self.config.get('default_route', {
+            'name': 'default', 'model': 'premium', 'max_output_tokens': 2000
+        })
+
+        # ルート別の統計（件数・レイテンシ・トークン・コスト）
+        self.stats: Dict[str, Dict] = {}
+
+    def model_name(self, model_key: str) -> str:
+        """モデルキー（fast/premium）から実際のモデル名を取得"""
+        return self.models.get(model_key, {}).get('name', model_key)
+
+    def _matches(self, match: Dict, article_type: str, feed_name: str,
+                 score: float, input_tokens: int) -> bool:
+        """ルールの条件をすべて満たすか判定（未指定の条件は常に一致）"""
+        if 'article_type' in match and article_type not in match['article_type']:
+            return False
+        if 'feeds' in match and feed_name not in match['feeds']:
+            return False
+        if 'min_score' in match and score < float(match['min_score']):
+            return False
+        if 'max_score' in match and score > float(match['max_score']):
+            return False
+        if 'min_input_tokens' in match and input_tokens < int(match['min_input_tokens']):
+            return False
+        if 'max_input_tokens' in match and input_tokens > int(match['max_input_tokens']):
+            return False
+        return True
+
+    def select(self, prompt: str, metadata: dict) -> Route:
+        """記事に適用するルートを選択（上から順に最初に一致したルール）"""
+        article_type = metadata.get('article_type', 'tutorial')
+        feed_name = metadata.get('feed_name', '')
+        score = float(metadata.get('filter_score', 0) or 0)
+        input_tokens = estimate_tokens(prompt)
+
+        rule = self.default_route
+        for candidate in self.routes:
+            if self._matches(candidate.get('match', {}), article_type, feed_name, score, input_tokens):
+                rule = candidate
+                break
+
+        route = Route(
+            name=rule.get('name', 'default'),
+            model_key=rule.get('model', 'premium'),
+            max_output_tokens=int(rule.get('max_output_tokens', 2000)),
+            escalate_to=rule.get('escalate_to')
+        )
+        logger.debug(f"ルート選択: {route.name} (type: {article_type}, feed: {feed_name}, "
+                     f"score: {score}, 推定入力: {input_tokens} tokens)")
+        return route
+
+    def estimate_cost(self, model_key: str, input_tokens: int, output_tokens: int) -> float:
+        """トークン数からコスト（USD）を算出"""
+        model = self.models.get(model_key, {})
+        return (input_tokens * model.get('input_cost_per_1m', 0)
+                + output_tokens * model.get('output_cost_per_1m', 0)) / 1_000_000
+
+    def record(self, route: Route, model_key: str, latency: float,
+               input_tokens: int, output_tokens: int, success: bool, escalated: bool = False):
+        """1回のLLM呼び出し結果をルート別統計に加算"""
+        stats = self.stats.setdefault(route.name, {
+            'calls': 0, 'success': 0, 'escalations': 0,
+            'latency_seconds': 0.0, 'input_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0
+        })
+        stats['calls'] += 1
+        stats['success'] += 1 if success else 0
+        stats['escalations'] += 1 if escalated else 0
+        stats['latency_seconds'] += latency
+        stats['input_tokens'] += input_tokens
+        stats['output_tokens'] += output_tokens
+        stats['cost_usd'] += self.estimate_cost(model_key, input_tokens, output_tokens)
+
+    def log_stats(self):
+        """ルート別のレイテンシ・コストを出力"""
+        if not self.stats:
+            return
+
+        total_cost = 0.0
+        for name, stats in self.stats.items():
+            avg_latency = stats['latency_seconds'] / stats['calls'] if stats['calls'] else 0
+            total_cost += stats['cost_usd']
+            logger.info(
+                f"ルート統計 [{name}]: 呼び出し {stats['calls']}回 (成功 {stats['success']}, "
+                f"エスカレーション {stats['escalations']}), 平均 {avg_latency:.2f}秒, "
+                f"入力 {stats['input_tokens']} / 出力 {stats['output_tokens']} tokens, "
+                f"${stats['cost_usd']:.4f}"
+            )
+        logger.info(f"推定コスト合計: ${total_cost:.4f}")
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+既存のファイル構成（rss-feeds / scraped-articles / processed-articles）から
+ステージカタログ（storage/index/catalog.db）を構築
+
+CATALOG_BACKEND=sqlite に切り替える前に一度実行する。何度実行しても同じ結果になる。
+"""
+import sys
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'shared' / 'lib'))
+from catalog import StageCatalog  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+storage_path = sys.argv[1] if len(sys.argv) > 1 else 'shared/storage'
+
+catalog = StageCatalog(storage_path)
+count = catalog.rebuild_from_files()
+stats = catalog.stats()
+catalog.close()
+
+print(f"\n{count} 件の記事をカタログに登録しました ({Path(storage_path) / 'index' / 'catalog.db'})")
+print(f"  判定待ち:       {stats['pending_judge']}")
+print(f"  スクレイピング待ち: {stats['pending_scrape']}")
+print(f"  要約待ち:       {stats['pending_summary']}")
+print("\n.env に CATALOG_BACKEND=sqlite を設定すると、各サービスがカタログを使用します")
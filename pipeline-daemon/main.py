@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Pipeline Daemon - RSS取得・判定・スクレイピング・要約を1プロセスで常駐実行
+
+run-pipeline.sh は4つのコンテナを順番に起動し、各ステージが全記事を処理し終えるまで
+次のステージが始まらない。このデーモンは RSSFeeder / RSSFilter / WebScraper / ArticleProcessor を
+インポートしてステージごとのワーカースレッドで動かし、上限付きキューでつなぐ。
+
+    RSSFeeder ──▶ [judge] ──▶ RSSFilter ──(閾値以上)──▶ [scrape] ──▶ WebScraper ──▶ [summarize] ──▶ ArticleProcessor
+
+- 判定した記事は閾値以上ならすぐにスクレイピングへ、本文が変わればすぐに要約へ流れる
+- キューが満杯なら上流のステージが待つ（バックプレッシャー）
+- キューには (feed_name, article_id) だけを積み、メタデータは処理する直前に読み込む
+- 起動時は各サービスの探索処理で処理待ちの記事をキューに積む（前回の停止時に残った記事も再開される）
+- SIGTERM / SIGINT で処理中の記事を終えてから停止（キューに残った記事はストレージ上で処理待ちのまま）
+
+    python main.py            # 常駐（PIPELINE_FEED_INTERVAL 秒ごとにRSSを取得）
+    python main.py --once     # RSSを1回取得し、全ステージが空になったら終了（run-pipeline.sh の代わり）
+"""
+import os
+import sys
+import queue
+import signal
+import logging
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(REPO_ROOT / 'shared' / 'lib'))
+from storage_writer import read_json  # noqa: E402
+from telemetry import article_key  # noqa: E402
+from profiling import MODES, profiled  # noqa: E402
+
+# ロギング設定
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+STAGES = ('judge', 'scrape', 'summarize')
+
+
+def load_service(service: str, module_name: str):
+    """サービスの main.py をモジュールとして読み込む（サービスのディレクトリもインポートパスに追加）"""
+    service_dir = REPO_ROOT / service
+    if str(service_dir) not in sys.path:
+        sys.path.insert(0, str(service_dir))
+    spec = importlib.util.spec_from_file_location(module_name, service_dir / 'main.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PipelineDaemon:
+    def __init__(self, storage_path: str, api_key: str):
+        self.storage_path = Path(storage_path)
+        self.rss_feeds_dir = self.storage_path / 'rss-feeds'
+        self.api_key = api_key
+        self.feed_interval = int(os.getenv('PIPELINE_FEED_INTERVAL', '3600'))
+        self.status_interval = int(os.getenv('PIPELINE_STATUS_INTERVAL', '60'))
+        self.scrape_interval = float(os.getenv('PIPELINE_SCRAPE_INTERVAL', '1'))
+        self.worker_counts = {
+            'judge': int(os.getenv('PIPELINE_JUDGE_WORKERS', '2')),
+            'scrape': int(os.getenv('PIPELINE_SCRAPE_WORKERS', '1')),
+            'summarize': int(os.getenv('PIPELINE_SUMMARY_WORKERS', '1')),
+        }
+        queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))
+        self.queues: Dict[str, queue.Queue] = {stage: queue.Queue(maxsize=queue_size) for stage in STAGES}
+        # キューに積まれている記事（同じ記事を二重に積まない）
+        self.queued: Dict[str, set] = {stage: set() for stage in STAGES}
+        self.lock = threading.Lock()
+        # 処理中の記事ごとのロック（同じ記事をステージをまたいで同時に処理しない）: key -> [Lock, 参照数]
+        self.article_locks: Dict[Tuple[str, str], list] = {}
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.counts = {stage: 0 for stage in STAGES}
+
+        self.modules = {
+            'rss-feeder': load_service('rss-feeder', 'rss_feeder_main'),
+            'llm-judge': load_service('llm-judge', 'llm_judge_main'),
+            'web-scraper': load_service('web-scraper', 'web_scraper_main'),
+            'llm-processor': load_service('llm-processor', 'llm_processor_main'),
+        }
+
+        self.feeder = self.modules['rss-feeder'].RSSFeeder(storage_path)
+        self.feeder.on_article_saved = lambda feed_name, article_id: self.enqueue('judge', feed_name, article_id)
+        # RSS取得のメタデータ更新と保持期間の削除は、ワーカーが処理中の記事と排他にする
+        self.feeder.article_guard = lambda feed_name, article_id: self._article_lock((feed_name, article_id))
+
+        # ワーカーごとにサービスのインスタンスを作る（書き込みのバッチ・カタログ接続・検索インデックスを共有しない）。
+        # テレメトリはステージで1つにまとめ、メトリクスのファイルを上書きし合わないようにする
+        self.services: Dict[str, list] = {stage: [] for stage in STAGES}
+        factories = {
+            'judge': lambda: self.modules['llm-judge'].RSSFilter(storage_path, api_key),
+            'scrape': lambda: self.modules['web-scraper'].WebScraper(storage_path),
+            'summarize': lambda: self.modules['llm-processor'].ArticleProcessor(storage_path, api_key),
+        }
+        for stage in STAGES:
+            for i in range(max(1, self.worker_counts[stage])):
+                service = factories[stage]()
+                if i > 0:
+                    service.telemetry = self.services[stage][0].telemetry
+                self.services[stage].append(service)
+
+        # スクレイピング対象の閾値はLLM Judgeの設定に合わせる
+        self.score_threshold = self.services['judge'][0].score_threshold
+
+    # --- キュー ---
+
+    def enqueue(self, stage: str, feed_name: str, article_id: str) -> bool:
+        """
+        記事をステージのキューに積む（満杯なら空くまで待つ）
+
+        Returns:
+            False: 既にキューにある、または停止中で積まなかった
+        """
+        key = (feed_name, article_id)
+        with self.lock:
+            if key in self.queued[stage]:
+                return False
+            self.queued[stage].add(key)
+
+        while not self.stop_event.is_set():
+            try:
+                self.queues[stage].put(key, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+
+        # 停止中: 積まなかった記事はストレージ上で処理待ちのまま（次回起動時に再開）
+        with self.lock:
+            self.queued[stage].discard(key)
+        return False
+
+    def _dequeue(self, stage: str) -> Optional[Tuple[str, str]]:
+        while not self.stop_event.is_set():
+            try:
+                key = self.queues[stage].get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self.lock:
+                self.queued[stage].discard(key)
+            return key
+        return None
+
+    @contextmanager
+    def _article_lock(self, key: Tuple[str, str]):
+        with self.lock:
+            entry = self.article_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.article_locks[key]
+
+    # --- ステージの処理 ---
+
+    def _judge(self, judge, feed_name: str, article_id: str):
+        articles = judge._load_articles([(feed_name, article_id)])
+        if not articles:
+            return
+        result = judge.judge_article(articles[0])
+        if result is not None and result.get('score', 0) >= self.score_threshold:
+            self.enqueue('scrape', feed_name, article_id)
+
+    def _scrape(self, scraper, feed_name: str, article_id: str):
+        metadata_path = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        if not metadata_path.exists():
+            # キューで待つ間に保持期間で削除された
+            return
+        metadata = read_json(metadata_path)
+        scraped = scraper.scrape_article({'feed_name': feed_name, 'article_id': article_id, 'metadata': metadata})
+        if scraped is None:
+            # 他のレプリカ（LEASES_ENABLED=true）が処理した
+            return
+        if scraped and self.services['summarize'][0]._is_pending(feed_name, article_id):
+            self.enqueue('summarize', feed_name, article_id)
+        # レート制限対策（停止時は待たない）
+        self.stop_event.wait(self.scrape_interval)
+
+    def _summarize(self, processor, feed_name: str, article_id: str):
+        item = processor._load_work_item(feed_name, article_id)
+        if item is None:
+            return
+        with processor.telemetry.trace(article_key(feed_name, article_id)):
+            processor.process_article(item)
+
+    def _worker(self, stage: str, service, handler: Callable):
+        """キューから記事を取り出して処理（1件の失敗でワーカーを止めない）"""
+        while True:
+            key = self._dequeue(stage)
+            if key is None:
+                break
+            try:
+                with self._article_lock(key):
+                    handler(service, *key)
+                with self.lock:
+                    self.counts[stage] += 1
+            except Exception as e:
+                # 保持期間で削除された記事など。ストレージ上の状態は変わらないので次回の探索で再処理される
+                logger.error(f"[{stage}] 処理エラー: {article_key(*key)} ({e})")
+            finally:
+                self.queues[stage].task_done()
+        service.writer.flush()
+        if hasattr(service, 'checked'):
+            service.checked.save()
+
+    # --- 供給 ---
+
+    def seed(self):
+        """
+        起動時にストレージ上の処理待ちをキューに積む
+
+        各記事は最も上流の処理待ちのステージにだけ積む（判定後に閾値以上ならスクレイピングへ流れる）。
+        キューが満杯になると待つため、積むのはステージごとに並行して行う（下流が詰まっていても上流の処理を始められる）。
+        """
+        processor = self.services['summarize'][0]
+        processor.discard_partial_summaries()
+        discoveries = (
+            ('judge', self.services['judge'][0].get_unfiltered_articles),
+            ('scrape', self.services['scrape'][0].get_pending_articles),
+            ('summarize', lambda: processor.get_pending_articles(max_items=0)),
+        )
+        pending: Dict[str, list] = {}
+        seen = set()
+        for stage, discover in discoveries:
+            try:
+                keys = [(article['feed_name'], article['article_id']) for article in discover()]
+            except Exception as e:
+                logger.error(f"[{stage}] 処理待ちの探索エラー: {e}")
+                keys = []
+            pending[stage] = [key for key in keys if key not in seen]
+            seen.update(keys)
+        self.services['scrape'][0].checked.save()
+        processor.checked.save()
+        logger.info("処理待ち: " + ', '.join(f"{stage} {len(keys)}件" for stage, keys in pending.items()))
+
+        def seed_stage(stage: str):
+            for feed_name, article_id in pending[stage]:
+                self.enqueue(stage, feed_name, article_id)
+
+        threads = [threading.Thread(target=seed_stage, args=(stage,), name=f"seed-{stage}", daemon=True)
+                   for stage in STAGES]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _supply(self, once: bool):
+        """
+        処理待ちを積んでから、RSSを定期的に取得（保存した記事は on_article_saved で判定キューへ）
+
+        探索とRSS Feederの保持期間の削除が重ならないよう、同じスレッドで順に実行する。
+        RSS Feederのメタデータの保存と保持期間の削除は、記事ごとのロックでワーカーの処理と排他にする。
+        """
+        self.seed()
+
+        while not self.stop_event.is_set():
+            try:
+                self.feeder.run()
+            except Exception as e:
+                logger.error(f"RSS取得エラー: {e}")
+            if once:
+                return
+            self.stop_event.wait(self.feed_interval)
+
+    def report(self):
+        """キューの長さと処理件数をログ・メトリクスに出力"""
+        depths = {stage: self.queues[stage].qsize() for stage in STAGES}
+        logger.info("キュー: " + ', '.join(f"{stage} {depths[stage]}件" for stage in STAGES)
+                    + " / 処理済み: " + ', '.join(f"{stage} {self.counts[stage]}件" for stage in STAGES))
+        for stage in STAGES:
+            telemetry = self.services[stage][0].telemetry
+            telemetry.set_queue_depth(stage, depths[stage])
+            telemetry.flush()
+
+    # --- 実行 ---
+
+    def _start(self, name: str, target: Callable, *args) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return thread
+
+    def stop(self, *_):
+        if not self.stop_event.is_set():
+            logger.info("停止要求を受信: 処理中の記事を終えてから停止します")
+            self.stop_event.set()
+
+    def run(self, once: bool = False):
+        logger.info(f"=== パイプラインデーモン開始 (ワーカー: {self.worker_counts}, "
+                    f"キュー上限: {self.queues['judge'].maxsize}, {'1回実行' if once else f'RSS取得間隔: {self.feed_interval}秒'}) ===")
+
+        handlers = {'judge': self._judge, 'scrape': self._scrape, 'summarize': self._summarize}
+        for stage in STAGES:
+            for i, service in enumerate(self.services[stage]):
+                self._start(f"{stage}-{i}", self._worker, stage, service, handlers[stage])
+
+        # 供給はバックプレッシャーで待つことがあるため、別スレッドで実行
+        supplier = self._start('supply', self._supply, once)
+
+        if once:
+            # 停止要求で終わらないことがあるため、終了時の join の対象にしない
+            threading.Thread(target=self._drain, args=(supplier,), name='drain', daemon=True).start()
+
+        while not self.stop_event.wait(self.status_interval):
+            self.report()
+
+        for thread in self.threads:
+            thread.join()
+        self.report()
+        for processor in self.services['summarize']:
+            processor.router.log_stats()
+        logger.info("=== パイプラインデーモン停止 ===")
+
+    def _drain(self, supplier: threading.Thread):
+        """--once: 供給が終わり、上流から順に全ステージのキューが空になったら停止"""
+        supplier.join()
+        for stage in STAGES:
+            self.queues[stage].join()
+        logger.info("全ステージの処理が完了しました")
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - Pipeline Daemon')
+    parser.add_argument('--once', action='store_true', help='RSSを1回取得し、全ステージが空になったら終了')
+    parser.add_argument('--profile', nargs='?', const='sample', choices=MODES,
+                        help='プロファイルを storage/profiles/ に出力（PROFILE=sample|cprofile と同じ）')
+    args = parser.parse_args()
+
+    storage_path = os.getenv('STORAGE_PATH', './storage')
+    api_key = os.getenv('OPENAI_API_KEY')
+
+    if not api_key:
+        logger.error("OPENAI_API_KEY が設定されていません")
+        return
+
+    daemon = PipelineDaemon(storage_path, api_key)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    with profiled('pipeline-daemon', storage_path, args.profile):
+        daemon.run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,33 +2,39 @@
 """
 フィルタリングエラーで score=0 になった記事のフィルタ結果をリセット
 """
-import json
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'shared' / 'lib'))
+from catalog import open_catalog  # noqa: E402
+from storage_writer import StorageWriter, read_json  # noqa: E402
+
 storage_path = Path('shared/storage/rss-feeds')
+catalog = open_catalog('shared/storage')  # CATALOG_BACKEND=sqlite のときのみ
 reset_count = 0
 
-for feed_dir in storage_path.iterdir():
-    if not feed_dir.is_dir():
-        continue
-    
-    for json_file in feed_dir.glob('*.json'):
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+with StorageWriter() as writer:
+    for feed_dir in storage_path.iterdir():
+        if not feed_dir.is_dir():
+            continue
         
-        # filter_score が 0 の場合のみリセット
-        if data.get('filter_score') == 0:
-            # フィルタ関連フィールドを削除
-            data.pop('filter_score', None)
-            data.pop('filter_reason', None)
-            data.pop('interest_match', None)
-            data.pop('article_type', None)
-            
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        for json_file in feed_dir.glob('*.json'):
+            data = read_json(json_file)
             
-            print(f"リセット: {feed_dir.name}/{json_file.stem}")
-            reset_count += 1
+            # filter_score が 0 の場合のみリセット
+            if data.get('filter_score') == 0:
+                # フィルタ関連フィールドを削除
+                data.pop('filter_score', None)
+                data.pop('filter_reason', None)
+                data.pop('interest_match', None)
+                data.pop('article_type', None)
+                
+                writer.write_json(json_file, data)
+                if catalog is not None:
+                    catalog.mark_unjudged(feed_dir.name, json_file.stem)
+                
+                print(f"リセット: {feed_dir.name}/{json_file.stem}")
+                reset_count += 1
 
 print(f"\n合計 {reset_count} 件の記事をリセットしました")
 print("再度 LLM Judge を実行してください: docker-compose run --rm llm-judge")
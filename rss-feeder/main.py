@@ -3,14 +3,24 @@
 RSS Feeder - RSSフィードから新規記事を取得してストレージに保存
 """
 import os
+import sys
 import json
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-import feedparser
 import hashlib
 import time
 from email.utils import parsedate_to_datetime
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional
+
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from retention import RetentionEngine, parse_published  # noqa: E402
+from catalog import open_catalog  # noqa: E402
+from storage_writer import StorageWriter, read_json  # noqa: E402
+from telemetry import Telemetry, article_key  # noqa: E402
+from profiling import profiled  # noqa: E402
 
 # ロギング設定
 logging.basicConfig(
@@ -28,6 +38,13 @@ class RSSFeeder:
         self.max_articles = int(os.getenv('MAX_ARTICLES_PER_FEED', '10'))
         self.retention_days = int(os.getenv('RETENTION_DAYS', '7'))
         self.max_article_age_days = int(os.getenv('MAX_ARTICLE_AGE_DAYS', '3'))  # 新規: 取得対象の最大経過日数
+        self.catalog = open_catalog(storage_path)  # CATALOG_BACKEND=sqlite のときのみ
+        self.writer = StorageWriter()
+        self.telemetry = Telemetry('rss-feeder', storage_path)
+        # 記事を保存（新規・内容更新）するたびに (feed_name, article_id) で呼ばれる（パイプラインデーモン用）
+        self.on_article_saved: Optional[Callable[[str, str], None]] = None
+        # 記事のメタデータの読み書き・保持期間の削除を囲むロック（パイプラインデーモンが処理中の記事と排他にする）
+        self.article_guard: Callable[[str, str], ContextManager] = lambda feed_name, article_id: nullcontext()
         
     def load_feed_config(self) -> list:
         """フィード設定を読み込む"""
@@ -40,6 +57,25 @@ class RSSFeeder:
         """URLから一意なIDを生成"""
         return hashlib.md5(url.encode()).hexdigest()[:12]
     
+    def compute_feed_hash(self, title: str, summary: str) -> str:
+        """フィードの内容（タイトル・概要）のハッシュを計算（更新検知用）"""
+        return hashlib.sha256(f"{title}\n{summary}".encode('utf-8')).hexdigest()[:16]
+    
+    def is_feed_content_changed(self, feed_name: str, article_id: str, feed_hash: str) -> bool:
+        """既存記事のフィード内容が変わったかチェック"""
+        article_path = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        try:
+            with open(article_path, 'r', encoding='utf-8') as f:
+                existing_data = json.load(f)
+        except Exception:
+            return False
+        
+        # ハッシュ導入前の記事は保存済みのタイトル・概要から計算して比較
+        existing_hash = existing_data.get('feed_hash') or self.compute_feed_hash(
+            existing_data.get('title', ''), existing_data.get('summary', '')
+        )
+        return existing_hash != feed_hash
+    
     def article_exists(self, feed_name: str, article_id: str) -> bool:
         """既に処理済みの記事かチェック"""
         article_path = self.rss_feeds_dir / feed_name / f"{article_id}.json"
@@ -70,69 +106,37 @@ class RSSFeeder:
         # 既存ファイルの場合: LLM Judgeの追加フィールドを保持してマージ
         if article_path.exists():
             try:
-                with open(article_path, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-                
+                existing_data = read_json(article_path)
                 existing_data.update(article_data)
-                
-                with open(article_path, 'w', encoding='utf-8') as f:
-                    json.dump(existing_data, f, ensure_ascii=False, indent=2)
-                
+                self.writer.write_json(article_path, existing_data)
                 return False
             except Exception as e:
                 logger.warning(f"既存データの読み込み失敗（上書き保存します）: {e}")
         
         # 新規ファイル作成
-        with open(article_path, 'w', encoding='utf-8') as f:
-            json.dump(article_data, f, ensure_ascii=False, indent=2)
+        self.writer.write_json(article_path, article_data)
         
         logger.info(f"保存完了: {feed_name}/{article_id}.json")
         return True
     
     def cleanup_old_articles_by_date(self):
-        """指定日数より古い記事を全フィードから削除"""
-        cutoff_time = time.time() - (self.retention_days * 24 * 60 * 60)
-        total_deleted = 0
+        """
+        指定日数より古い記事を全フィードから削除
         
-        logger.info(f"古いファイルをクリーンアップ: {self.retention_days}日以前のファイルを削除")
+        Data Cleanupと同じ保持期間エンジンを使用し、公開日（published）で判定する。
+        """
+        logger.info(f"古い記事をクリーンアップ: 公開日が{self.retention_days}日以前の記事を削除")
         
-        # 全フィードをスキャン
-        if not self.rss_feeds_dir.exists():
+        engine = RetentionEngine(str(self.storage_path), self.retention_days, article_guard=self.article_guard)
+        old_articles = engine.find_expired()
+        if not old_articles:
             return
         
-        for feed_dir in self.rss_feeds_dir.iterdir():
-            if not feed_dir.is_dir():
-                continue
-            
-            feed_name = feed_dir.name
-            deleted_count = 0
-            
-            # メタデータファイルをスキャン
-            for metadata_file in feed_dir.glob('*.json'):
-                if metadata_file.stat().st_mtime < cutoff_time:
-                    article_id = metadata_file.stem
-                    
-                    # 関連する全ファイルを削除（メタデータ、本文、要約を一括削除）
-                    scraped_file = self.storage_path / 'scraped-articles' / feed_name / f"{article_id}.md"
-                    summary_file = self.storage_path / 'article-summaries' / feed_name / f"{article_id}.md"
-                    
-                    try:
-                        metadata_file.unlink()  # メタデータ削除
-                        if scraped_file.exists():
-                            scraped_file.unlink()  # 本文削除
-                        if summary_file.exists():
-                            summary_file.unlink()  # 要約削除
-                        deleted_count += 1
-                        logger.debug(f"削除 ({feed_name}): {article_id} (メタデータ + 本文 + 要約)")
-                    except Exception as e:
-                        logger.error(f"削除エラー ({feed_name}/{article_id}): {str(e)}")
-            
-            if deleted_count > 0:
-                logger.info(f"削除完了 ({feed_name}): {deleted_count}件")
-                total_deleted += deleted_count
+        # 関連する全ファイルを削除（メタデータ、本文、要約を一括削除）
+        deleted_count, total_files = engine.purge(old_articles)
         
-        if total_deleted > 0:
-            logger.info(f"クリーンアップ完了: 合計 {total_deleted}件削除")
+        if deleted_count > 0:
+            logger.info(f"クリーンアップ完了: 合計 {deleted_count}件削除 ({total_files}ファイル)")
     
     def cleanup_old_articles(self, feed_name: str):
         """
@@ -168,8 +172,8 @@ class RSSFeeder:
         
         for file_path in files_to_delete:
             article_id = file_path.stem
-            scraped_file = self.storage_path / 'scraped-articles' / feed_name / f"{article_id}.txt"
-            summary_file = self.storage_path / 'article-summaries' / feed_name / f"{article_id}.md"
+            scraped_file = self.storage_path / 'scraped-articles' / feed_name / f"{article_id}.md"
+            summary_file = self.storage_path / 'processed-articles' / feed_name / f"{article_id}.md"
             
             try:
                 file_path.unlink()
@@ -196,7 +200,10 @@ class RSSFeeder:
         # 代わりに、cleanup_old_articles_by_date()で7日以上古い記事を削除
         
         try:
-            feed = feedparser.parse(feed_url)
+            import feedparser  # 有効なフィードがあるときだけimport
+            # feedparser は取得とパースを1回で行うので、まとめて fetch として計測
+            with self.telemetry.span('fetch', feed=feed_name):
+                feed = feedparser.parse(feed_url)
             
             if feed.bozo:
                 logger.warning(f"フィードパースに問題: {feed_name}")
@@ -233,25 +240,39 @@ class RSSFeeder:
                     continue
                 
                 article_id = self.generate_article_id(article_url)
+                title = entry.get('title', 'No Title')
+                summary = entry.get('summary', '')
+                feed_hash = self.compute_feed_hash(title, summary)
                 
-                # 既存記事はスキップ
-                if self.article_exists(feed_name, article_id):
-                    continue
+                # 他のステージが同じメタデータを読み書きしている間は待つ（更新が失われないように）
+                with self.article_guard(feed_name, article_id):
+                    # 既存記事は内容が変わった場合のみ更新（下流ステージがハッシュ差分で再処理）
+                    if self.article_exists(feed_name, article_id):
+                        if not self.is_feed_content_changed(feed_name, article_id, feed_hash):
+                            continue
+                        logger.info(f"更新検知: {feed_name}/{article_id}")
                 
-                # 新規記事のメタデータを保存
-                article_data = {
-                    'id': article_id,
-                    'feed_name': feed_name,
-                    'title': entry.get('title', 'No Title'),
-                    'url': article_url,
-                    'published': entry.get('published', ''),
-                    'author': entry.get('author', ''),
-                    'summary': entry.get('summary', ''),
-                    'fetched_at': datetime.now().isoformat()
-                }
+                    # 新規記事のメタデータを保存
+                    article_data = {
+                        'id': article_id,
+                        'feed_name': feed_name,
+                        'title': title,
+                        'url': article_url,
+                        'published': entry.get('published', ''),
+                        'author': entry.get('author', ''),
+                        'summary': summary,
+                        'feed_hash': feed_hash,
+                        'fetched_at': datetime.now().isoformat()
+                    }
                 
-                if self.save_article_metadata(feed_name, article_data):
-                    new_articles += 1
+                    with self.telemetry.span('write', article_key(feed_name, article_id)):
+                        if self.save_article_metadata(feed_name, article_data):
+                            new_articles += 1
+                    if self.catalog is not None:
+                        self.catalog.upsert_article(feed_name, article_id, parse_published(article_data['published']), feed_hash)
+                # キューが満杯だと空くまで待つため、記事のロックを放してから通知する
+                if self.on_article_saved is not None:
+                    self.on_article_saved(feed_name, article_id)
             
             logger.info(f"完了: {feed_name} - 新規記事 {new_articles}件")
             return new_articles
@@ -269,17 +290,20 @@ class RSSFeeder:
         self.cleanup_old_articles_by_date()
         
         total_new = 0
-        for feed_config in feeds:
-            new_count = self.fetch_feed(feed_config)
-            total_new += new_count
+        with self.telemetry.run(), self.writer:
+            for feed_config in feeds:
+                new_count = self.fetch_feed(feed_config)
+                total_new += new_count
         
         logger.info(f"全体完了: 合計 {total_new}件の新規記事")
 
 
 def main():
     storage_path = os.getenv('STORAGE_PATH', './storage')
-    feeder = RSSFeeder(storage_path)
-    feeder.run()
+    # --profile または PROFILE=sample|cprofile でプロファイルを storage/profiles/ に出力
+    with profiled('rss-feeder', storage_path):
+        feeder = RSSFeeder(storage_path)
+        feeder.run()
 
 
 if __name__ == '__main__':
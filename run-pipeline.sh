@@ -2,6 +2,7 @@
 
 # LLM RSS Curator - 自動処理パイプライン
 # RSS取得 → LLM Judge → Web Scraper → Article Processor を順次実行
+# （記事ごとにステージを流す常駐版は pipeline-daemon: docker-compose up -d pipeline-daemon）
 
 set -e  # エラーが発生したら即座に停止
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+アーカイブ層 - 期限切れ記事を月別の圧縮セグメントに格納し、IDでランダムアクセス
+
+セグメント（archive/YYYY-MM.seg）は記事ごとに独立してzlib圧縮したレコードの連結で、
+オフセットインデックス（archive/index.json）から1記事分だけをmmapで読み出せる。
+
+レコードはフィード名・記事IDを含む自己記述的な形式なので、インデックスはセグメントの走査で作り直せる。
+インデックスにはセグメントごとに登録済みの末尾オフセットを記録し、それより後ろのレコード
+（インデックス保存前に中断した・別プロセスが追記した）は開くときと追記・保存の前に走査して取り込む。
+追記と保存は archive/.lock を flock して行い、保存時はディスク上のインデックスを読み直してマージする
+（RSS FeederとData Cleanupが同時にアーカイブしても互いのエントリを消さない）。
+"""
+import os
+import json
+import mmap
+import zlib
+import fcntl
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+from storage_writer import StorageWriter, loads
+
+logger = logging.getLogger(__name__)
+
+# 一覧表示用にインデックスへ保持するメタデータ（本文はセグメントから読む）
+LISTING_FIELDS = ('title', 'url', 'author', 'published', 'filter_score', 'article_type', 'processed_at')
+
+# 未登録のレコードを走査するときに一度に展開する圧縮データの大きさ
+READ_CHUNK = 64 * 1024
+
+
+def _read_record(data: memoryview, position: int) -> Tuple[Optional[dict], int]:
+    """position から始まるレコードを展開（壊れている・途中までしかなければ (None, 0)）"""
+    decompressor = zlib.decompressobj()
+    chunks = []
+    fed = position
+    try:
+        while not decompressor.eof and fed < len(data):
+            chunk = data[fed:fed + READ_CHUNK]
+            chunks.append(decompressor.decompress(chunk))
+            fed += len(chunk)
+        if not decompressor.eof:
+            return None, 0
+        record = json.loads(b''.join(chunks).decode('utf-8'))
+    except (zlib.error, ValueError):
+        return None, 0
+    return record, fed - position - len(decompressor.unused_data)
+
+
+class ArticleArchive:
+    """月別圧縮セグメントとオフセットインデックスによる記事アーカイブ"""
+
+    VERSION = 1
+
+    def __init__(self, storage_path: str):
+        self.storage_path = Path(storage_path)
+        self.archive_dir = self.storage_path / 'archive'
+        self.index_path = self.archive_dir / 'index.json'
+        self.lock_path = self.archive_dir / '.lock'
+        self.entries: Dict[str, Dict] = {}
+        # セグメントごとの登録済みの末尾オフセット
+        self.segments: Dict[str, int] = {}
+        # 最後に読み込んだインデックスファイルの (mtime_ns, size)
+        self._index_stat: Optional[Tuple[int, int]] = None
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._files = {}
+        self.dirty = False
+        if self.archive_dir.exists():
+            with self._lock():
+                self._refresh()
+
+    @staticmethod
+    def key(feed_name: str, article_id: str) -> str:
+        return f"{feed_name}/{article_id}"
+
+    @contextmanager
+    def _lock(self):
+        """アーカイブへの追記・インデックスの保存をプロセス間で排他"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """ディスク上のインデックスと未登録のレコードを取り込む（ロック中に呼ぶ）"""
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            stat = None
+        signature = (stat.st_mtime_ns, stat.st_size) if stat else None
+        if signature is not None and signature != self._index_stat:
+            with open(self.index_path, 'rb') as f:
+                data = loads(f.read())
+            # 自分が追加したエントリは残してマージ（エントリは追加のみで削除されない）
+            self.entries = {**data.get('entries', {}), **self.entries}
+            for segment, end in data.get('segments', {}).items():
+                self.segments[segment] = max(end, self.segments.get(segment, 0))
+        self._index_stat = signature
+
+        for segment_path in sorted(self.archive_dir.glob('*.seg')):
+            segment = segment_path.stem
+            if segment_path.stat().st_size > self.segments.get(segment, 0):
+                self._recover(segment, segment_path)
+
+    def _recover(self, segment: str, segment_path: Path):
+        """
+        セグメントの登録済みの末尾より後ろのレコードを走査してインデックスに登録
+
+        途中までしか書かれていない末尾のレコード（書き込み中のクラッシュ）は切り詰める。
+        """
+        offset = self.segments.get(segment, 0)
+        with open(segment_path, 'r+b') as f:
+            f.seek(offset)
+            data = memoryview(f.read())
+            position = 0
+            recovered = 0
+            while position < len(data):
+                record, length = _read_record(data, position)
+                if record is None:
+                    logger.warning(f"アーカイブの壊れた末尾を切り詰め: {segment_path.name} "
+                                   f"(オフセット {offset + position}, {len(data) - position}バイト)")
+                    f.truncate(offset + position)
+                    break
+                key = self.key(record['feed_name'], record['article_id'])
+                if key not in self.entries:
+                    recovered += 1
+                self.entries[key] = self._entry(segment, offset + position, length, record)
+                position += length
+        self.segments[segment] = offset + position
+        self.dirty = True
+        if recovered:
+            logger.info(f"インデックス未登録のアーカイブ記事を登録: {segment_path.name} {recovered}件")
+
+    @staticmethod
+    def _entry(segment: str, offset: int, length: int, record: dict) -> Dict:
+        metadata = record.get('metadata') or {}
+        return {
+            'segment': segment,
+            'offset': offset,
+            'length': length,
+            'feed_name': record['feed_name'],
+            'article_id': record['article_id'],
+            'has_summary': record.get('summary') is not None,
+            'metadata': {field: metadata[field] for field in LISTING_FIELDS if field in metadata}
+        }
+
+    def save(self):
+        """オフセットインデックスを、ディスク上のインデックスとマージしてアトミックに保存"""
+        if not self.dirty:
+            return
+        with self._lock():
+            self._refresh()
+            with StorageWriter() as writer:
+                writer.write_json(self.index_path, {'version': self.VERSION, 'entries': self.entries,
+                                                    'segments': self.segments})
+            stat = self.index_path.stat()
+            self._index_stat = (stat.st_mtime_ns, stat.st_size)
+        self.dirty = False
+
+    def contains(self, feed_name: str, article_id: str) -> bool:
+        return self.key(feed_name, article_id) in self.entries
+
+    def add(self, feed_name: str, article_id: str, published_ts: float,
+            metadata: dict, scraped: Optional[str], summary: Optional[str]):
+        """
+        記事をセグメントに追記してインデックスに登録
+
+        セグメントは公開月ごとに分け、レコード単位で圧縮する。
+        """
+        segment = datetime.fromtimestamp(published_ts, timezone.utc).strftime('%Y-%m')
+        record = {
+            'feed_name': feed_name,
+            'article_id': article_id,
+            'metadata': metadata,
+            'scraped': scraped,
+            'summary': summary
+        }
+        compressed = zlib.compress(json.dumps(record, ensure_ascii=False).encode('utf-8'), 9)
+
+        with self._lock():
+            # 別プロセスが追記したレコードを先に取り込む（壊れた末尾があれば切り詰めてから追記する）
+            self._refresh()
+            segment_path = self.archive_dir / f"{segment}.seg"
+            with open(segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[self.key(feed_name, article_id)] = self._entry(segment, offset, len(compressed), record)
+            self.segments[segment] = offset + len(compressed)
+        self.dirty = True
+
+    def _segment_map(self, segment: str) -> mmap.mmap:
+        """セグメントファイルをmmapで開く（開いたものは再利用）"""
+        if segment not in self._maps:
+            f = open(self.archive_dir / f"{segment}.seg", 'rb')
+            self._files[segment] = f
+            self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[segment]
+
+    def read(self, feed_name: str, article_id: str) -> Optional[Dict]:
+        """アーカイブ済み記事の全データ（メタデータ・本文・要約）を読み出し"""
+        entry = self.entries.get(self.key(feed_name, article_id))
+        if entry is None:
+            return None
+        segment_map = self._segment_map(entry['segment'])
+        compressed = segment_map[entry['offset']:entry['offset'] + entry['length']]
+        return json.loads(zlib.decompress(compressed).decode('utf-8'))
+
+    def read_summary(self, feed_name: str, article_id: str) -> Optional[str]:
+        """アーカイブ済み記事の要約Markdownを読み出し"""
+        record = self.read(feed_name, article_id)
+        return record.get('summary') if record else None
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """インデックスのエントリ（一覧表示用メタデータ付き）を列挙"""
+        return iter(self.entries.values())
+
+    def close(self):
+        for segment_map in self._maps.values():
+            segment_map.close()
+        for f in self._files.values():
+            f.close()
+        self._maps.clear()
+        self._files.clear()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+記事カタログ - 記事ごとのステージ状態をSQLite（WAL）で管理
+
+各サービスはファイルツリーを走査する代わりに、部分インデックス付きのクエリで
+処理待ちの記事だけを取得する（コーパスの大きさに関係なく一定のコスト）。
+CATALOG_BACKEND=sqlite のときだけ有効で、全サービスが状態変更を書き込む。
+既存のファイル構成からは migrate-catalog.py で構築する。
+
+ステージ状態（0 = 未処理・再処理待ち、1 = 完了）:
+    judged      LLM Judge の判定
+    scraped     Web Scraper の本文取得
+    summarized  Article Processor の要約
+"""
+import os
+import json
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    feed_name TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    published_ts REAL,
+    feed_hash TEXT,
+    filter_score REAL,
+    article_type TEXT,
+    judged INTEGER NOT NULL DEFAULT 0,
+    scraped INTEGER NOT NULL DEFAULT 0,
+    summarized INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (feed_name, article_id)
+);
+-- 処理待ちの記事だけを含む部分インデックス（完了した記事はインデックスに載らない）
+CREATE INDEX IF NOT EXISTS idx_pending_judge ON articles (feed_name, article_id) WHERE judged = 0;
+CREATE INDEX IF NOT EXISTS idx_pending_scrape ON articles (filter_score) WHERE judged = 1 AND scraped = 0;
+CREATE INDEX IF NOT EXISTS idx_pending_summary ON articles (filter_score) WHERE scraped = 1 AND summarized = 0;
+CREATE INDEX IF NOT EXISTS idx_published ON articles (published_ts);
+'''
+
+
+def catalog_enabled() -> bool:
+    return os.getenv('CATALOG_BACKEND', 'files').lower() == 'sqlite'
+
+
+def open_catalog(storage_path: str) -> Optional['StageCatalog']:
+    """CATALOG_BACKEND=sqlite ならカタログを開く（無効ならNone）"""
+    if not catalog_enabled():
+        return None
+    return StageCatalog(storage_path)
+
+
+class StageCatalog:
+    """記事のステージ状態を保持するSQLiteカタログ（storage/index/catalog.db）"""
+
+    def __init__(self, storage_path: str):
+        self.storage_path = Path(storage_path)
+        self.db_path = self.storage_path / 'index' / 'catalog.db'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    # --- 状態の更新（各サービスから呼ばれる） ---
+
+    def upsert_article(self, feed_name: str, article_id: str, published_ts: Optional[float],
+                       feed_hash: Optional[str]):
+        """
+        RSS Feeder が保存した記事を登録
+
+        新規記事は全ステージ未処理。フィード内容が変わった既存記事は再判定・再スクレイピング待ちに戻す
+        （要約は再スクレイピングで本文が変わったときに再生成される）。
+        """
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO articles (feed_name, article_id, published_ts, feed_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (feed_name, article_id) DO UPDATE SET
+                    published_ts = excluded.published_ts,
+                    judged = CASE WHEN feed_hash IS excluded.feed_hash THEN judged ELSE 0 END,
+                    scraped = CASE WHEN feed_hash IS excluded.feed_hash THEN scraped ELSE 0 END,
+                    feed_hash = excluded.feed_hash
+            ''', (feed_name, article_id, published_ts, feed_hash))
+
+    def mark_judged(self, feed_name: str, article_id: str, filter_score: float, article_type: Optional[str]):
+        with self.conn:
+            self.conn.execute(
+                'UPDATE articles SET judged = 1, filter_score = ?, article_type = ? '
+                'WHERE feed_name = ? AND article_id = ?',
+                (filter_score, article_type, feed_name, article_id)
+            )
+
+    def mark_unjudged(self, feed_name: str, article_id: str):
+        """判定結果をリセットして再判定待ちに戻す"""
+        with self.conn:
+            self.conn.execute('UPDATE articles SET judged = 0, filter_score = NULL, article_type = NULL '
+                              'WHERE feed_name = ? AND article_id = ?', (feed_name, article_id))
+
+    def mark_scraped(self, feed_name: str, article_id: str, content_changed: bool = True):
+        """本文取得済みにする（本文が変わったなら要約待ちに戻す）"""
+        with self.conn:
+            self.conn.execute(
+                'UPDATE articles SET scraped = 1, '
+                'summarized = CASE WHEN ? THEN 0 ELSE summarized END '
+                'WHERE feed_name = ? AND article_id = ?',
+                (int(content_changed), feed_name, article_id)
+            )
+
+    def mark_summarized(self, feed_name: str, article_id: str):
+        with self.conn:
+            self.conn.execute('UPDATE articles SET summarized = 1 WHERE feed_name = ? AND article_id = ?',
+                              (feed_name, article_id))
+
+    def remove(self, articles: List[Tuple[str, str]]):
+        """保持期間で削除された記事を登録解除"""
+        with self.conn:
+            self.conn.executemany('DELETE FROM articles WHERE feed_name = ? AND article_id = ?', articles)
+
+    # --- 処理待ちの検索 ---
+
+    def pending_judge(self) -> List[Tuple[str, str]]:
+        """判定待ち（未判定・フィード内容更新）の記事"""
+        return self.conn.execute(
+            'SELECT feed_name, article_id FROM articles WHERE judged = 0 ORDER BY feed_name, article_id'
+        ).fetchall()
+
+    def pending_scrape(self, score_threshold: float) -> List[Tuple[str, str]]:
+        """判定済み・スコアが閾値以上・未スクレイピングの記事"""
+        return self.conn.execute(
+            'SELECT feed_name, article_id FROM articles '
+            'WHERE judged = 1 AND scraped = 0 AND filter_score >= ? ORDER BY filter_score DESC, published_ts DESC',
+            (score_threshold,)
+        ).fetchall()
+
+    def pending_summary(self, max_items: int = 0, order: str = 'score') -> List[Tuple[str, str]]:
+        """本文取得済み・未要約の記事（order='score' ならスコアの高い順・同点は新しい順、max_items=0で無制限）"""
+        query = 'SELECT feed_name, article_id FROM articles WHERE scraped = 1 AND summarized = 0'
+        if order == 'score':
+            query += ' ORDER BY filter_score DESC, published_ts DESC'
+        if max_items:
+            query += f' LIMIT {int(max_items)}'
+        return self.conn.execute(query).fetchall()
+
+    def count_pending_summary(self) -> int:
+        """本文取得済み・未要約の記事数（部分インデックス idx_pending_summary だけで数える）"""
+        return self.conn.execute('SELECT COUNT(*) FROM articles WHERE scraped = 1 AND summarized = 0').fetchone()[0]
+
+    def expired(self, cutoff_ts: float) -> List[Tuple[float, str, str]]:
+        """公開日がcutoff_tsより前の記事（公開日インデックスの範囲検索）"""
+        return self.conn.execute(
+            'SELECT published_ts, feed_name, article_id FROM articles WHERE published_ts < ? ORDER BY published_ts',
+            (cutoff_ts,)
+        ).fetchall()
+
+    def stats(self) -> dict:
+        row = self.conn.execute('''
+            SELECT COUNT(*),
+                   SUM(judged = 0),
+                   SUM(judged = 1 AND scraped = 0),
+                   SUM(scraped = 1 AND summarized = 0)
+            FROM articles
+        ''').fetchone()
+        return {'articles': row[0], 'pending_judge': row[1] or 0,
+                'pending_scrape': row[2] or 0, 'pending_summary': row[3] or 0}
+
+    # --- 既存のファイル構成からの移行 ---
+
+    def _iter_file_rows(self) -> Iterator[tuple]:
+        """rss-feeds のメタデータと本文・要約ファイルの有無からステージ状態を復元"""
+        from retention import parse_published
+
+        rss_feeds_dir = self.storage_path / 'rss-feeds'
+        scraped_dir = self.storage_path / 'scraped-articles'
+        summaries_dir = self.storage_path / 'processed-articles'
+        if not rss_feeds_dir.exists():
+            return
+
+        for feed_dir in rss_feeds_dir.iterdir():
+            if not feed_dir.is_dir():
+                continue
+            feed_name = feed_dir.name
+            scraped_ids = {path.stem for path in (scraped_dir / feed_name).glob('*.md')}
+            summary_ids = {path.stem for path in (summaries_dir / feed_name).glob('*.md')}
+
+            for metadata_file in feed_dir.glob('*.json'):
+                article_id = metadata_file.stem
+                try:
+                    with open(metadata_file, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"メタデータ読み込みエラー ({metadata_file}): {e}")
+                    continue
+
+                feed_hash = metadata.get('feed_hash')
+                scraped_hash = metadata.get('scraped_hash')
+                judged = 'filter_score' in metadata and not (feed_hash and metadata.get('judged_feed_hash') != feed_hash)
+                scraped = article_id in scraped_ids and not (feed_hash and metadata.get('scraped_feed_hash') != feed_hash)
+                summarized = article_id in summary_ids and not (
+                    scraped_hash and metadata.get('summary_source_hash') != scraped_hash)
+                published_ts = parse_published(metadata.get('published', '')) or metadata_file.stat().st_mtime
+
+                yield (feed_name, article_id, published_ts, feed_hash, metadata.get('filter_score'),
+                       metadata.get('article_type'), int(judged), int(scraped), int(summarized))
+
+    def rebuild_from_files(self, batch_size: int = 1000) -> int:
+        """
+        ファイル構成からカタログを作り直す（既存の内容は置き換え）
+
+        Returns:
+            登録した記事数
+        """
+        count = 0
+        with self.conn:
+            self.conn.execute('DELETE FROM articles')
+            batch = []
+            for row in self._iter_file_rows():
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.conn.executemany('INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany('INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+                count += len(batch)
+        logger.info(f"カタログ構築完了: {count}件")
+        return count
+
+    def close(self):
+        self.conn.close()
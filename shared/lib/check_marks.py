@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+確認済みマーク - 「この記事は出力を作り直す必要がない」と確認したときの入力ファイルのmtimeを記録する副インデックス
+
+    storage/index/checked-<stage>.json   {"<feed_name>/<article_id>": [入力ファイルのmtime_ns, ...]}
+
+Web Scraper・Article Processor は、メタデータ（と本文）のmtimeが記録と同じならJSONをパースせずにスキップする。
+出力ファイル（本文・要約）のmtimeは、Viewerのインデックス・全文検索・サイト出力が変更の検知に使うため触らない。
+記録が失われても（複数プロセスの保存が重なった場合など）次回パースし直すだけで、処理結果は変わらない。
+メタデータが削除された記事（保持期間・GC）のマークは保存時に取り除く。
+"""
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from storage_writer import StorageWriter, read_json
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(paths) -> List[int]:
+    return [os.stat(path).st_mtime_ns for path in paths]
+
+
+class CheckMarks:
+    """ステージごとの確認済みマーク"""
+
+    def __init__(self, storage_path: str, stage: str):
+        self.rss_feeds_dir = Path(storage_path) / 'rss-feeds'
+        self.path = Path(storage_path) / 'index' / f"checked-{stage}.json"
+        self.lock = threading.Lock()
+        self.marks: Dict[str, List[int]] = self._read()
+        # 前回の保存から追加したマーク（保存時にディスク上の記録へマージする）
+        self.changes: Dict[str, List[int]] = {}
+
+    def _read(self) -> Dict[str, List[int]]:
+        try:
+            marks = read_json(self.path)
+            return marks if isinstance(marks, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"確認済みマークの読み込み失敗（作り直します）: {e}")
+            return {}
+
+    def is_current(self, feed_name: str, article_id: str, *paths) -> bool:
+        """入力ファイルが確認したときから変わっていないか"""
+        with self.lock:
+            mark = self.marks.get(f"{feed_name}/{article_id}")
+        if mark is None:
+            return False
+        try:
+            return mark == _signature(paths)
+        except FileNotFoundError:
+            return False
+
+    def mark(self, feed_name: str, article_id: str, *paths):
+        """入力ファイルの現在のmtimeで確認済みにする"""
+        try:
+            signature = _signature(paths)
+        except FileNotFoundError:
+            return
+        key = f"{feed_name}/{article_id}"
+        with self.lock:
+            self.marks[key] = signature
+            self.changes[key] = signature
+
+    def save(self):
+        """変更をディスク上の記録にマージして保存（失敗しても処理は止めない）"""
+        with self.lock:
+            if not self.changes:
+                return
+            changes, self.changes = self.changes, {}
+        marks = self._read()
+        marks.update(changes)
+        marks = {key: mark for key, mark in marks.items()
+                 if (self.rss_feeds_dir / f"{key}.json").exists()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with StorageWriter(fsync=False) as writer:
+                writer.write_json(self.path, marks)
+        except OSError as e:
+            logger.warning(f"確認済みマークの保存に失敗: {e}")
+            return
+        with self.lock:
+            marks.update(self.changes)
+            self.marks = marks
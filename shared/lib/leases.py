@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+作業リース - 同じステージのレプリカが同じ記事を二重に処理しないよう、記事ごとに期限付きのリースを取る
+
+    storage/leases/<stage>/<feed_name>/<article_id>.lease   {"owner", "token", "generation", "expires_at", ...}
+
+- 取得: リースファイルを O_CREAT | O_EXCL で作成（同一ホストでも、ストレージを共有する別ホストでも排他になる）
+- 更新: 保持中のリースはバックグラウンドのスレッドが LEASE_TTL_SECONDS / 3 ごとに期限を延長する
+- 回収: 期限切れのリース（クラッシュしたワーカーのもの）は別のレプリカが取り直す（generation を1つ進める）
+- 回収・延長・解放・GCの削除は、ステージごとのロックファイル（leases/<stage>/.lock）を flock した中で
+  リースファイルを読み直してから行う（読んでから置き換える・消すまでの間に取り直されたリースを壊さない）
+- フェンシング: 書き込みを確定する直前に check() でリースファイルのトークンが自分のものか確認し、
+  期限切れで他のレプリカに取られていたら LeaseLost を送出して書き込まない
+
+期限の判定はホストの時計を使うため、複数ホストで動かす場合は時刻を同期しておく（NTPなど）。
+LEASES_ENABLED=true のときだけ有効（1つのレプリカで動かす場合は不要）。
+"""
+import os
+import time
+import uuid
+import fcntl
+import socket
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from storage_writer import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+LEASE_SUFFIX = '.lease'
+LOCK_NAME = '.lock'
+
+
+class LeaseLost(Exception):
+    """リースが期限切れで他のレプリカに取られた（書き込みを確定してはいけない）"""
+
+
+def leases_enabled() -> bool:
+    return os.getenv('LEASES_ENABLED', 'false').lower() == 'true'
+
+
+@contextmanager
+def _stage_locked(lease_dir: Path):
+    """ステージ内のリースファイルの置き換え・削除を直列化するプロセス間ロック"""
+    lease_dir.mkdir(parents=True, exist_ok=True)
+    with open(lease_dir / LOCK_NAME, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def open_leases(storage_path: str, stage: str) -> Optional['LeaseManager']:
+    """LEASES_ENABLED=true ならステージのリース管理を返す（無効ならNone）"""
+    if not leases_enabled():
+        return None
+    return LeaseManager(storage_path, stage)
+
+
+class Lease:
+    """取得した1件のリース（with で囲むと終了時に解放）"""
+
+    def __init__(self, manager: 'LeaseManager', path: Path, token: str, generation: int):
+        self.manager = manager
+        self.path = path
+        self.token = token
+        self.generation = generation
+
+    def check(self):
+        """書き込みの直前に呼ぶ（リースを失っていれば LeaseLost）"""
+        record = self.manager._read(self.path)
+        if record is None or record.get('token') != self.token:
+            raise LeaseLost(f"リースを失いました: {self.path.name} (generation {self.generation})")
+        if record.get('expires_at', 0) < time.time():
+            raise LeaseLost(f"リースの期限切れ: {self.path.name} (generation {self.generation})")
+
+    def release(self):
+        self.manager._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class LeaseManager:
+    """1つのステージ（judge / scrape / summarize）のリース"""
+
+    def __init__(self, storage_path: str, stage: str, ttl: Optional[float] = None, owner: Optional[str] = None):
+        self.stage = stage
+        self.lease_dir = Path(storage_path) / 'leases' / stage
+        self.ttl = ttl or float(os.getenv('LEASE_TTL_SECONDS', '600'))
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.held: Dict[Path, Lease] = {}
+        self._heartbeat = None
+        self._stop_event = threading.Event()
+
+    def _path(self, feed_name: str, article_id: str) -> Path:
+        return self.lease_dir / feed_name / f"{article_id}{LEASE_SUFFIX}"
+
+    def _read(self, path: Path) -> Optional[dict]:
+        """リースファイルを読む（なければNone。作成直後で中身が空なら、まだ有効なリースとして扱う）"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            return loads(data)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                return None
+            return {'token': None, 'generation': 0, 'expires_at': mtime + self.ttl}
+
+    def is_held(self, feed_name: str, article_id: str) -> bool:
+        """いずれかのレプリカが有効なリースを持っているか"""
+        record = self._read(self._path(feed_name, article_id))
+        return record is not None and record.get('expires_at', 0) >= time.time()
+
+    def _record(self, token: str, generation: int) -> dict:
+        now = time.time()
+        return {'owner': self.owner, 'token': token, 'generation': generation,
+                'acquired_at': now, 'expires_at': now + self.ttl}
+
+    def claim(self, feed_name: str, article_id: str) -> Optional[Lease]:
+        """
+        記事のリースを取得
+
+        Returns:
+            Lease（他のレプリカが有効なリースを持っていれば None）
+        """
+        path = self._path(feed_name, article_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        generation = 1
+
+        current = self._read(path)
+        if current is not None:
+            if current.get('expires_at', 0) >= time.time():
+                return None
+            with _stage_locked(self.lease_dir):
+                # ロック中に読み直す（他のレプリカが先に回収した・所有者が延長した有効なリースは消さない）
+                current = self._read(path)
+                if current is None or current.get('expires_at', 0) >= time.time():
+                    return None
+                path.unlink()
+            generation = int(current.get('generation') or 0) + 1
+            logger.info(f"期限切れのリースを回収: {self.stage} {feed_name}/{article_id} "
+                        f"(前の所有者: {current.get('owner', '?')})")
+
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps(self._record(token, generation)))
+
+        lease = Lease(self, path, token, generation)
+        with self.lock:
+            self.held[path] = lease
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_loop, name=f"lease-{self.stage}", daemon=True)
+                self._heartbeat.start()
+        return lease
+
+    def _renew(self, lease: Lease):
+        """自分のリースのままなら期限を延長（一時ファイル経由で置き換え）"""
+        with _stage_locked(self.lease_dir):
+            # 確認から置き換えまでロックを持ち、他のレプリカが回収したリースを上書きしない
+            record = self._read(lease.path)
+            if record is None or record.get('token') != lease.token:
+                return
+            tmp_path = lease.path.with_name(f"{lease.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps(self._record(lease.token, lease.generation)))
+            os.replace(tmp_path, lease.path)
+
+    def _renew_loop(self):
+        while not self._stop_event.wait(self.ttl / 3):
+            with self.lock:
+                leases = list(self.held.values())
+            for lease in leases:
+                try:
+                    self._renew(lease)
+                except OSError as e:
+                    logger.warning(f"リースの延長に失敗: {lease.path} ({e})")
+
+    def _release(self, lease: Lease):
+        with self.lock:
+            self.held.pop(lease.path, None)
+        with _stage_locked(self.lease_dir):
+            record = self._read(lease.path)
+            if record is not None and record.get('token') == lease.token:
+                lease.path.unlink(missing_ok=True)
+
+    def close(self):
+        """保持中のリースをすべて解放"""
+        self._stop_event.set()
+        with self.lock:
+            leases = list(self.held.values())
+        for lease in leases:
+            lease.release()
+
+
+def sweep_expired_leases(storage_path: str, dry_run: bool = False, grace: Optional[float] = None) -> Tuple[int, int]:
+    """
+    期限切れから grace 秒以上経ったリースファイル（削除された記事・止まったレプリカの残骸）を削除
+
+    Returns:
+        (削除した件数, 残っている有効なリースの件数)
+    """
+    grace = float(os.getenv('LEASE_TTL_SECONDS', '600')) if grace is None else grace
+    lease_root = Path(storage_path) / 'leases'
+    if not lease_root.exists():
+        return 0, 0
+
+    now = time.time()
+    swept = active = 0
+    for path in lease_root.glob(f'*/*/*{LEASE_SUFFIX}'):
+        expires_at = _expires_at(path)
+        if expires_at is None:
+            continue
+        if expires_at + grace >= now:
+            active += 1
+            continue
+        if not dry_run:
+            # ロック中に読み直し、その間に回収されたリースは消さない
+            with _stage_locked(path.parent.parent):
+                expires_at = _expires_at(path)
+                if expires_at is None:
+                    continue
+                if expires_at + grace >= now:
+                    active += 1
+                    continue
+                path.unlink()
+        swept += 1
+    return swept, active
+
+
+def _expires_at(path: Path) -> Optional[float]:
+    """リースファイルの期限（なければNone。中身が空・壊れていればmtime）"""
+    try:
+        with open(path, 'rb') as f:
+            return loads(f.read()).get('expires_at', 0)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return None
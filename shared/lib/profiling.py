@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+プロファイリング - サービスの1回の実行をプロファイラで囲み、結果をストレージに書き出す
+
+    python main.py --profile              # サンプリング（collapsed stack + 上位関数）
+    python main.py --profile=cprofile     # cProfile（.prof + 上位関数）
+    PROFILE=sample python main.py         # 環境変数でも指定可能（Lambdaではこちらを使う）
+
+出力先は storage/profiles/（PROFILE_DIR で変更可能）。
+
+- sample:   PROFILE_INTERVAL_MS ごとに全スレッドのスタックを採取する（実時間ベース。I/O待ちも見える）。
+            <service>-<時刻>.collapsed.txt は speedscope（https://www.speedscope.app）や
+            flamegraph.pl にそのまま読み込める
+- cprofile: 全関数呼び出しを計測する（オーバーヘッドは大きいが呼び出し回数が正確）。
+            <service>-<時刻>.prof は snakeviz や pstats で開ける
+
+どちらのモードも上位 PROFILE_TOP 件の関数を <service>-<時刻>.top.txt に書き出し、ログにも出力する。
+"""
+import io
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sample', 'cprofile')
+
+
+def profile_mode(argv: Optional[List[str]] = None) -> Optional[str]:
+    """
+    コマンドライン引数（--profile / --profile=cprofile）と環境変数 PROFILE からモードを決定
+
+    Returns:
+        'sample' / 'cprofile'（無効なら None）
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    for arg in argv:
+        if arg == '--profile':
+            return normalize_mode(os.getenv('PROFILE')) or 'sample'
+        if arg.startswith('--profile='):
+            return normalize_mode(arg.split('=', 1)[1])
+    return normalize_mode(os.getenv('PROFILE'))
+
+
+def normalize_mode(value: Optional[str]) -> Optional[str]:
+    value = (value or '').strip().lower()
+    if value in ('', 'false', '0', 'off', 'none'):
+        return None
+    if value in ('true', '1', 'on'):
+        return 'sample'
+    if value not in MODES:
+        logger.warning(f"不明なプロファイルモード: {value}（sample で計測します）")
+        return 'sample'
+    return value
+
+
+class StackSampler(threading.Thread):
+    """一定間隔で全スレッドのスタックを採取し、collapsed stack ごとの回数を集計"""
+
+    def __init__(self, interval: float):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._labels = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = Path(code.co_filename)
+            short = '/'.join(path.parts[-2:]) if len(path.parts) >= 2 else code.co_filename
+            # collapsed形式の区切り文字（; と空白区切りの件数）と衝突しないようにする
+            label = f"{code.co_name} ({short}:{code.co_firstlineno})".replace(';', ',')
+            self._labels[code] = label
+        return label
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                name = names.get(ident, str(ident))
+                if name != 'MainThread':
+                    stack.insert(0, f"thread:{name}")
+                self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int) -> str:
+        """自身で消費したサンプル数（self）と、呼び出し先を含むサンプル数（total）の上位"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        total = sum(self.stacks.values()) or 1
+
+        lines = [f"サンプル数: {self.samples}（間隔 {self.interval * 1000:.1f}ms、全スレッドのスタック {total}件）", '',
+                 f"--- self（上位{limit}件）---"]
+        lines += [f"{count:>8} {count / total:>6.1%}  {frame}" for frame, count in self_counts.most_common(limit)]
+        lines += ['', f"--- total（上位{limit}件）---"]
+        lines += [f"{count:>8} {count / total:>6.1%}  {frame}" for frame, count in total_counts.most_common(limit)]
+        return '\n'.join(lines) + '\n'
+
+
+def _output_dir(storage_path: str) -> Path:
+    return Path(os.getenv('PROFILE_DIR') or Path(storage_path) / 'profiles')
+
+
+def _write_outputs(service: str, storage_path: str, files: dict, summary: str):
+    from storage_writer import StorageWriter
+
+    output_dir = _output_dir(storage_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    prefix = f"{service}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    with StorageWriter(fsync=False) as writer:
+        for suffix, content in files.items():
+            path = output_dir / f"{prefix}{suffix}"
+            if isinstance(content, bytes):
+                writer.write_bytes(path, content)
+            else:
+                writer.write_text(path, content)
+            logger.info(f"プロファイル出力: {path}")
+    # 上位の数行はログでも確認できるようにする
+    logger.info("プロファイル上位:\n" + '\n'.join(summary.splitlines()[:15]))
+
+
+@contextmanager
+def profiled(service: str, storage_path: str, mode: Optional[str] = None):
+    """
+    実行をプロファイラで囲む（mode省略時は --profile / PROFILE から決定、無効なら何もしない）
+
+    with profiled('web-scraper', storage_path):
+        WebScraper(storage_path).run()
+    """
+    mode = normalize_mode(mode) if mode is not None else profile_mode()
+    if mode is None:
+        yield
+        return
+
+    limit = int(os.getenv('PROFILE_TOP', '30'))
+    started = time.perf_counter()
+    logger.info(f"プロファイル開始 (mode: {mode})")
+
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+        import tempfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            try:
+                stream = io.StringIO()
+                stats = pstats.Stats(profiler, stream=stream)
+                stream.write(f"実行時間: {time.perf_counter() - started:.2f}秒\n")
+                stats.sort_stats('cumulative').print_stats(limit)
+                stats.sort_stats('tottime').print_stats(limit)
+                # pstats はファイルにしか書き出せないため、一時ファイル経由でストレージに置く
+                with tempfile.NamedTemporaryFile(suffix='.prof') as tmp:
+                    profiler.dump_stats(tmp.name)
+                    raw = Path(tmp.name).read_bytes()
+                _write_outputs(service, storage_path, {'.prof': raw, '.top.txt': stream.getvalue()},
+                               stream.getvalue())
+            except OSError as e:
+                logger.warning(f"プロファイルの書き出しに失敗: {e}")
+        return
+
+    sampler = StackSampler(float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000)
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        try:
+            summary = f"実行時間: {time.perf_counter() - started:.2f}秒\n" + sampler.top(limit)
+            _write_outputs(service, storage_path, {'.collapsed.txt': sampler.collapsed(), '.top.txt': summary},
+                           summary)
+        except OSError as e:
+            logger.warning(f"プロファイルの書き出しに失敗: {e}")
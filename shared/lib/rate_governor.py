@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+レート制限ガバナー - 同じAPIキーを使うプロセス（LLM Judge・Article Processor・パイプラインデーモン）で
+1分あたりのリクエスト数・トークン数と同時実行数を共有し、プロバイダーの上限を超えないよう呼び出しを調整する
+
+    storage/ratelimit/<RATE_LIMIT_KEY>.json   共有状態（.lock を flock して読み書き）
+
+- 直近60秒の予約（リクエスト数・トークン数）を記録し、RATE_LIMIT_RPM / RATE_LIMIT_TPM
+  （未設定ならレスポンスの x-ratelimit-limit-* ヘッダーから学習）の RATE_LIMIT_HEADROOM 倍までに抑える
+- x-ratelimit-remaining-* が尽きたら x-ratelimit-reset-* まで全プロセスが待つ
+- 同時実行数はAIMD: 成功するたびに 1/同時実行数 ずつ増やし、429を受けたら半分にして Retry-After まで待つ
+- 待っている呼び出しのうち優先度の高いものから通す（Article Processorは filter_score、
+  RATE_LIMIT_PRIORITY で手動実行などを優先できる）
+
+429・5xx・接続エラーの再試行（OPENAI_MAX_RETRIES回）もガバナーが行う（SDKの再試行は無効にする）。
+RATE_GOVERNOR_ENABLED=true のときだけ有効。
+"""
+import os
+import re
+import time
+import uuid
+import fcntl
+import random
+import socket
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from storage_writer import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+# 予約から提供側への到着までの遅れ（予約の時刻で数えると、提供側の窓より先に期限切れになる）
+WINDOW_MARGIN = 1.0
+
+# 優先度（大きいほど先に通す）。filter_score（0〜10）と同じ尺度
+DEFAULT_PRIORITY = 5.0
+PRIORITY_INTERACTIVE = 100.0
+
+# 待機中の呼び出しがこの秒数だけ状態を更新しなければ、いなくなったとみなす
+WAITER_TTL = 2.0
+
+# 再試行する例外（openaiをimportせずに名前で判定）
+RETRYABLE_ERRORS = ('APIConnectionError', 'APITimeoutError', 'InternalServerError')
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def governor_enabled() -> bool:
+    return os.getenv('RATE_GOVERNOR_ENABLED', 'false').lower() == 'true'
+
+
+def open_governor(storage_path: str) -> Optional['RateGovernor']:
+    """RATE_GOVERNOR_ENABLED=true ならガバナーを返す（無効ならNone）"""
+    if not governor_enabled():
+        return None
+    return RateGovernor(storage_path)
+
+
+def base_priority(default: Optional[float] = DEFAULT_PRIORITY) -> Optional[float]:
+    """RATE_LIMIT_PRIORITY が設定されていればその値（未設定なら default）"""
+    value = os.getenv('RATE_LIMIT_PRIORITY')
+    return float(value) if value else default
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """x-ratelimit-reset-* の形式（"1s" / "6m0s" / "20ms" / "0.5s"）を秒に変換"""
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    scale = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def estimate_request_tokens(request: dict, default_output_tokens: int = 1000) -> int:
+    """リクエストのトークン数を概算（入力＋max_output_tokens。TPMは出力の上限も含めて数えられる）"""
+    text = ''.join(str(message.get('content', '')) for message in request.get('input', [])
+                   if isinstance(message, dict))
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    input_tokens = ascii_chars // 4 + (len(text) - ascii_chars)
+    return input_tokens + int(request.get('max_output_tokens') or default_output_tokens)
+
+
+def create_response(client, request: dict, governor: Optional['RateGovernor'] = None,
+                    priority: float = DEFAULT_PRIORITY):
+    """
+    Responses API を呼び出す（ガバナーがあれば通す）
+
+    stream=True のときはイベントのイテレータを返す（ガバナー経由では最後まで読むと枠を返す）。
+    """
+    if governor is None:
+        return client.responses.create(**request)
+    return governor.call(client.responses.with_raw_response.create, request, priority)
+
+
+def _empty_state(concurrency: float) -> dict:
+    return {'window': [], 'inflight': {}, 'waiting': {}, 'concurrency': concurrency,
+            'blocked_until': 0.0, 'last_decrease': 0.0, 'limits': {}, 'remaining': {}}
+
+
+class RateLimitTimeout(Exception):
+    """RATE_LIMIT_MAX_WAIT 秒待っても呼び出せなかった"""
+
+
+class RateGovernor:
+    """プロセス間で共有するレート制限と同時実行数"""
+
+    def __init__(self, storage_path: str, name: Optional[str] = None):
+        self.state_dir = Path(os.getenv('RATE_LIMIT_DIR') or Path(storage_path) / 'ratelimit')
+        name = name or os.getenv('RATE_LIMIT_KEY', 'openai')
+        self.state_path = self.state_dir / f"{name}.json"
+        self.lock_path = self.state_dir / f"{name}.lock"
+        self.rpm = int(os.getenv('RATE_LIMIT_RPM', '0'))
+        self.tpm = int(os.getenv('RATE_LIMIT_TPM', '0'))
+        self.headroom = float(os.getenv('RATE_LIMIT_HEADROOM', '0.9'))
+        self.initial_concurrency = float(os.getenv('RATE_LIMIT_INITIAL_CONCURRENCY', '2'))
+        self.max_concurrency = float(os.getenv('RATE_LIMIT_MAX_CONCURRENCY', '8'))
+        self.max_wait = float(os.getenv('RATE_LIMIT_MAX_WAIT', '600'))
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+        # 呼び出し中のままになった枠（クラッシュしたプロセス）を回収するまでの秒数
+        self.stale_after = float(os.getenv('OPENAI_TIMEOUT', '600')) + 60
+        self.host = socket.gethostname()
+
+    # --- 共有状態 ---
+
+    @contextmanager
+    def _state(self):
+        """共有状態をロックして読み込み、抜けるときに書き戻す"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, 'rb') as f:
+                        state = loads(f.read())
+                except (FileNotFoundError, ValueError):
+                    state = _empty_state(self.initial_concurrency)
+                self._prune(state, time.time())
+                yield state
+                # ロック中なので一時ファイルはプロセスごとに1つでよい（状態は助言的なのでfsyncしない）
+                tmp_path = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(dumps(state))
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _alive(self, entry: dict, now: float) -> bool:
+        if now - entry['started'] > self.stale_after:
+            return False
+        if entry.get('host') == self.host:
+            try:
+                os.kill(entry['pid'], 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                pass
+        return True
+
+    def _prune(self, state: dict, now: float):
+        state['window'] = [entry for entry in state['window'] if entry[0] > now - WINDOW_SECONDS - WINDOW_MARGIN]
+        state['inflight'] = {ticket: entry for ticket, entry in state['inflight'].items() if self._alive(entry, now)}
+        state['waiting'] = {ticket: entry for ticket, entry in state['waiting'].items()
+                            if entry['seen'] > now - WAITER_TTL}
+
+    # --- 受け付け ---
+
+    def _wait_time(self, state: dict, now: float, ticket: str, tokens: int, priority: float) -> float:
+        """受け付けられるまでの待ち時間の目安（0なら今すぐ受け付けられる）"""
+        waits = [0.0]
+        if state['blocked_until'] > now:
+            waits.append(state['blocked_until'] - now)
+        if len(state['inflight']) >= max(int(state['concurrency']), 1):
+            waits.append(0.05)
+
+        window = state['window']
+        rpm = self.rpm or state['limits'].get('requests', 0)
+        if rpm and window and len(window) >= rpm * self.headroom:
+            waits.append(window[0][0] + WINDOW_SECONDS + WINDOW_MARGIN - now)
+        tpm = self.tpm or state['limits'].get('tokens', 0)
+        if tpm and window:
+            # 予約が古い順に期限切れになるとして、収まるまでの時間
+            excess = sum(entry[1] for entry in window) + tokens - tpm * self.headroom
+            for started, reserved, _ in window:
+                if excess <= 0:
+                    break
+                excess -= reserved
+                waits.append(started + WINDOW_SECONDS + WINDOW_MARGIN - now)
+
+        for kind, needed in (('requests', 1), ('tokens', tokens)):
+            remaining, reset_at = state['remaining'].get(kind, (None, 0.0))
+            if remaining is not None and reset_at > now and remaining < needed:
+                waits.append(reset_at - now)
+
+        if any(entry['priority'] > priority for other, entry in state['waiting'].items() if other != ticket):
+            waits.append(0.05)
+        return max(waits)
+
+    def acquire(self, tokens: int, priority: float = DEFAULT_PRIORITY) -> str:
+        """呼び出しの枠を予約（受け付けられるまで待つ）"""
+        ticket = uuid.uuid4().hex
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._state() as state:
+                now = time.time()
+                wait = self._wait_time(state, now, ticket, tokens, priority)
+                if wait <= 0:
+                    state['waiting'].pop(ticket, None)
+                    state['window'].append([now, tokens, ticket])
+                    state['inflight'][ticket] = {'host': self.host, 'pid': os.getpid(), 'started': now}
+                    for kind, used in (('requests', 1), ('tokens', tokens)):
+                        if kind in state['remaining']:
+                            state['remaining'][kind][0] -= used
+                    return ticket
+                state['waiting'][ticket] = {'priority': priority, 'seen': now}
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeout(f"レート制限の待ち時間が上限（{self.max_wait:.0f}秒）を超えます")
+            time.sleep(min(max(wait, 0.02), 1.0))
+
+    def release(self, ticket: str, headers=None, tokens: Optional[int] = None,
+                rate_limited: bool = False, retry_after: float = 1.0, succeeded: bool = True):
+        """枠を返し、レスポンスヘッダーと結果（成功・429）から制限と同時実行数を更新"""
+        with self._state() as state:
+            now = time.time()
+            state['inflight'].pop(ticket, None)
+            if tokens is not None:
+                for entry in state['window']:
+                    if entry[2] == ticket:
+                        entry[1] = tokens
+                        break
+            if headers is not None:
+                self._learn(state, headers, now)
+
+            if rate_limited:
+                state['blocked_until'] = max(state['blocked_until'], now + retry_after)
+                # 同時に返ってきた429で何度も半減させない
+                if now - state['last_decrease'] > retry_after:
+                    state['concurrency'] = max(state['concurrency'] / 2, 1.0)
+                    state['last_decrease'] = now
+                    logger.warning(f"429を受信: 同時実行数を {state['concurrency']:.1f} に下げ、"
+                                   f"{retry_after:.1f}秒待機します")
+            elif succeeded:
+                state['concurrency'] = min(state['concurrency'] + 1 / state['concurrency'], self.max_concurrency)
+
+    def _learn(self, state: dict, headers, now: float):
+        """x-ratelimit-* ヘッダーから上限と残量を記録"""
+        for kind in ('requests', 'tokens'):
+            limit = headers.get(f'x-ratelimit-limit-{kind}')
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+            try:
+                if limit is not None:
+                    state['limits'][kind] = int(limit)
+                if remaining is not None and reset is not None:
+                    state['remaining'][kind] = [int(remaining), now + reset]
+            except ValueError:
+                continue
+
+    # --- 呼び出し ---
+
+    @staticmethod
+    def _retry_after(headers, attempt: int) -> float:
+        if headers is not None:
+            for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+                value = headers.get(name)
+                if value:
+                    try:
+                        return float(value) * scale
+                    except ValueError:
+                        pass
+        return float(2 ** attempt)
+
+    def call(self, create: Callable, request: dict, priority: float = DEFAULT_PRIORITY):
+        """
+        create（client.responses.with_raw_response.create）を枠の中で呼び出し、パース済みのレスポンスを返す
+
+        429・5xx・接続エラーは OPENAI_MAX_RETRIES 回まで再試行する。
+        """
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            ticket = self.acquire(tokens, priority)
+            try:
+                raw = create(**request)
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
+                if status == 429:
+                    self.release(ticket, headers, rate_limited=True, retry_after=self._retry_after(headers, attempt))
+                else:
+                    self.release(ticket, headers, succeeded=False)
+                retryable = status == 429 or (status or 0) >= 500 or type(e).__name__ in RETRYABLE_ERRORS
+                if not retryable or attempt == self.max_retries:
+                    raise
+                logger.warning(f"LLM呼び出しを再試行 ({attempt + 1}/{self.max_retries}): {e}")
+                if status != 429:
+                    time.sleep(min(0.5 * 2 ** attempt, 8.0) * random.uniform(0.5, 1.0))
+                continue
+
+            if request.get('stream'):
+                return self._stream(ticket, raw)
+            response = raw.parse()
+            usage = getattr(response, 'usage', None)
+            used = (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+            self.release(ticket, raw.headers, tokens=used or None)
+            return response
+
+    def _stream(self, ticket: str, raw):
+        """ストリームを読み終えた（または中断した）ところで枠を返す"""
+        used = None
+        try:
+            for event in raw.parse():
+                if getattr(event, 'type', '') in ('response.completed', 'response.incomplete'):
+                    usage = getattr(event.response, 'usage', None)
+                    used = (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+                yield event
+        finally:
+            self.release(ticket, raw.headers, tokens=used or None)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+保持期間エンジン - 公開日の時系列インデックスで期限切れ記事を検索・削除
+
+RSS Feeder と Data Cleanup が共通で使用する。
+"""
+import os
+import json
+import bisect
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+from archive import ArticleArchive
+from catalog import open_catalog
+from storage_writer import StorageWriter
+from state_journal import StateJournal
+
+logger = logging.getLogger(__name__)
+
+# 記事データを保持するディレクトリ（メタデータ・本文・要約）
+ARTICLE_TREES = {
+    'metadata': ('rss-feeds', '.json'),
+    'scraped': ('scraped-articles', '.md'),
+    'summary': ('processed-articles', '.md'),
+}
+
+
+def parse_published(published_str: str) -> Optional[float]:
+    """
+    公開日文字列をUNIXタイムスタンプ（UTC）に変換
+
+    feedparserが保存するRFC 822形式（例: Thu, 16 Oct 2025 15:48:12 +0000）と
+    ISO 8601形式の両方に対応。タイムゾーンなしの値はUTCとみなす。
+    """
+    if not published_str:
+        return None
+
+    for parser in (parsedate_to_datetime, lambda s: datetime.fromisoformat(s.replace('Z', '+00:00'))):
+        try:
+            published = parser(published_str)
+        except (TypeError, ValueError, IndexError):
+            continue
+        if published.tzinfo is None:
+            published = published.replace(tzinfo=timezone.utc)
+        return published.timestamp()
+
+    return None
+
+
+def load_favorite_ids(storage_path: str) -> Set[str]:
+    """Article Viewerのお気に入り記事IDを取得（お気に入りは保持期間の対象外）"""
+    try:
+        return set(StateJournal(storage_path).load().get('favorite', {}).keys())
+    except Exception as e:
+        logger.warning(f"記事状態ファイルの読み込み失敗（お気に入り除外なしで続行）: {e}")
+        return set()
+
+
+class RetentionIndex:
+    """
+    (公開日タイムスタンプ, フィード名, 記事ID) を公開日順に保持する永続インデックス
+
+    期限切れ記事の検索は二分探索による範囲検索になり、メタデータJSONを
+    パースするのはインデックス未登録の記事だけになる。
+    """
+
+    VERSION = 1
+
+    def __init__(self, storage_path: str):
+        self.storage_path = Path(storage_path)
+        self.rss_feeds_dir = self.storage_path / 'rss-feeds'
+        self.index_path = self.storage_path / 'index' / 'retention.json'
+        self.entries: List[Tuple[float, str, str]] = []
+        self.keys: Dict[Tuple[str, str], float] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        """インデックスファイルを読み込み（破損・バージョン違いの場合は空から再構築）"""
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                raise ValueError(f"unsupported version: {data.get('version')}")
+            self.entries = [tuple(entry) for entry in data.get('entries', [])]
+            self.entries.sort()
+            self.keys = {(feed, article_id): ts for ts, feed, article_id in self.entries}
+        except Exception as e:
+            logger.warning(f"保持期間インデックスの読み込み失敗（再構築します）: {e}")
+            self.entries, self.keys = [], {}
+            self.dirty = True
+
+    def save(self):
+        """インデックスをアトミックに保存（変更がなければ何もしない）"""
+        if not self.dirty:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        # RSS FeederとData Cleanupが同時に保存しても一時ファイルが衝突しないよう、StorageWriter経由で書く
+        with StorageWriter(fsync=False) as writer:
+            writer.write_json(self.index_path, {'version': self.VERSION, 'entries': self.entries})
+        self.dirty = False
+
+    def remove(self, feed_name: str, article_id: str):
+        """記事を登録解除"""
+        published_ts = self.keys.pop((feed_name, article_id), None)
+        if published_ts is None:
+            return
+        entry = (published_ts, feed_name, article_id)
+        pos = bisect.bisect_left(self.entries, entry)
+        if pos < len(self.entries) and self.entries[pos] == entry:
+            del self.entries[pos]
+        self.dirty = True
+
+    def _read_published_ts(self, metadata_file: Path) -> float:
+        """メタデータから公開日を取得（パースできなければファイルのmtime）"""
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            published_ts = parse_published(metadata.get('published', ''))
+            if published_ts is not None:
+                return published_ts
+            logger.debug(f"公開日をパースできないためmtimeを使用: {metadata_file}")
+        except Exception as e:
+            logger.warning(f"メタデータ読み込みエラー ({metadata_file}): {e}")
+        return metadata_file.stat().st_mtime
+
+    def sync(self):
+        """
+        メタデータディレクトリとインデックスを同期
+
+        ファイル名の列挙のみで差分を求め、新規記事のメタデータだけをパースする。
+        """
+        on_disk = set()
+        if self.rss_feeds_dir.exists():
+            for feed_dir in self.rss_feeds_dir.iterdir():
+                if not feed_dir.is_dir():
+                    continue
+                for metadata_file in feed_dir.glob('*.json'):
+                    on_disk.add((feed_dir.name, metadata_file.stem))
+
+        removed = [key for key in self.keys if key not in on_disk]
+        for feed_name, article_id in removed:
+            self.remove(feed_name, article_id)
+
+        added = [key for key in on_disk if key not in self.keys]
+        for feed_name, article_id in added:
+            metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+            self.keys[(feed_name, article_id)] = self._read_published_ts(metadata_file)
+        if added:
+            self.entries = sorted((ts, feed, article_id) for (feed, article_id), ts in self.keys.items())
+            self.dirty = True
+
+        if added or removed:
+            logger.info(f"保持期間インデックス同期: 追加 {len(added)}件, 削除 {len(removed)}件 (合計 {len(self.entries)}件)")
+
+    def older_than(self, cutoff_ts: float) -> List[Tuple[float, str, str]]:
+        """公開日がcutoff_tsより前の記事を返す（範囲検索）"""
+        return self.entries[:bisect.bisect_left(self.entries, (cutoff_ts,))]
+
+
+class RetentionEngine:
+    """
+    保持期間を超過した記事の検索と並列削除
+
+    archive=True（または RETENTION_MODE=archive）の場合は削除前に
+    月別圧縮セグメントへ退避する。
+    article_guard を渡すと、記事ごとの退避・削除をそのロックの中で行う
+    （パイプラインデーモンで処理中の記事のファイルを処理の途中で消さない）。
+    """
+
+    def __init__(self, storage_path: str, retention_days: int,
+                 workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 archive: Optional[bool] = None,
+                 article_guard: Optional[Callable[[str, str], ContextManager]] = None):
+        self.storage_path = Path(storage_path)
+        self.retention_days = retention_days
+        self.cutoff_ts = datetime.now(timezone.utc).timestamp() - retention_days * 24 * 60 * 60
+        self.workers = workers or int(os.getenv('CLEANUP_WORKERS', '4'))
+        self.batch_size = batch_size or int(os.getenv('CLEANUP_BATCH_SIZE', '100'))
+        if archive is None:
+            archive = os.getenv('RETENTION_MODE', 'delete').lower() == 'archive'
+        self.archive = ArticleArchive(storage_path) if archive else None
+        self._archive_lock = threading.Lock()
+        self.article_guard = article_guard or (lambda feed_name, article_id: nullcontext())
+        self.index = RetentionIndex(storage_path)
+        # CATALOG_BACKEND=sqlite なら公開日インデックスはカタログのものを使う
+        self.catalog = open_catalog(storage_path)
+
+    def find_expired(self) -> List[Dict]:
+        """保持期間を超過した記事を取得（お気に入りは除外）"""
+        if self.catalog is not None:
+            expired = self.catalog.expired(self.cutoff_ts)
+        else:
+            self.index.sync()
+            self.index.save()
+            expired = self.index.older_than(self.cutoff_ts)
+        favorite_ids = load_favorite_ids(str(self.storage_path))
+        return [
+            {
+                'feed_name': feed_name,
+                'article_id': article_id,
+                'published': datetime.fromtimestamp(published_ts, timezone.utc).isoformat(),
+                'published_ts': published_ts
+            }
+            for published_ts, feed_name, article_id in expired
+            if article_id not in favorite_ids
+        ]
+
+    def _read_optional(self, path: Path) -> Optional[str]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def archive_article(self, feed_name: str, article_id: str, published_ts: float):
+        """記事の全データをアーカイブセグメントへ退避"""
+        paths = {
+            kind: self.storage_path / tree / feed_name / f"{article_id}{suffix}"
+            for kind, (tree, suffix) in ARTICLE_TREES.items()
+        }
+        metadata_text = self._read_optional(paths['metadata'])
+        metadata = json.loads(metadata_text) if metadata_text else {}
+        scraped = self._read_optional(paths['scraped'])
+        summary = self._read_optional(paths['summary'])
+
+        with self._archive_lock:
+            self.archive.add(feed_name, article_id, published_ts, metadata, scraped, summary)
+
+    def delete_article(self, feed_name: str, article_id: str) -> Dict[str, bool]:
+        """記事の全データを削除（メタデータ・本文・要約）"""
+        deleted = {}
+        for kind, (tree, suffix) in ARTICLE_TREES.items():
+            path = self.storage_path / tree / feed_name / f"{article_id}{suffix}"
+            try:
+                path.unlink()
+                deleted[kind] = True
+                logger.debug(f"削除: {path}")
+            except FileNotFoundError:
+                deleted[kind] = False
+        return deleted
+
+    def _delete_batch(self, batch: List[Dict]) -> List[Tuple[Dict, Dict[str, bool]]]:
+        """バッチ内の記事を順に削除（アーカイブモードでは退避してから削除）"""
+        results = []
+        for article in batch:
+            try:
+                with self.article_guard(article['feed_name'], article['article_id']):
+                    if self.archive is not None:
+                        self.archive_article(article['feed_name'], article['article_id'], article['published_ts'])
+                    results.append((article, self.delete_article(article['feed_name'], article['article_id'])))
+            except Exception as e:
+                logger.error(f"削除エラー ({article['feed_name']}/{article['article_id']}): {e}")
+        return results
+
+    def purge(self, articles: List[Dict]) -> Tuple[int, int]:
+        """
+        記事をバッチに分けて並列削除し、インデックスから登録解除
+
+        Returns:
+            (削除した記事数, 削除したファイル数)
+        """
+        batches = [articles[i:i + self.batch_size] for i in range(0, len(articles), self.batch_size)]
+        deleted_count = 0
+        total_files = 0
+        removed = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for results in executor.map(self._delete_batch, batches):
+                    for article, deleted in results:
+                        self.index.remove(article['feed_name'], article['article_id'])
+                        removed.append((article['feed_name'], article['article_id']))
+                        files_deleted = sum(deleted.values())
+                        if files_deleted > 0:
+                            deleted_count += 1
+                            total_files += files_deleted
+                            logger.debug(f"削除完了: {article['feed_name']}/{article['article_id']} ({files_deleted}ファイル)")
+        finally:
+            # 途中で中断してもアーカイブ済みの記事はインデックスに残す
+            if self.archive is not None:
+                self.archive.save()
+            self.index.save()
+            if self.catalog is not None:
+                self.catalog.remove(removed)
+        return deleted_count, total_files
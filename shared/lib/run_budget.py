@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+実行予算 - 締め切り（--deadline）とトークン予算（--budget）のある実行で、終わらない見込みの記事を始めない
+
+各サービスは1件ごとの所要時間とトークン数を record() で記録し、種類（Web Scraperはフィード、
+Article Processorは記事タイプ）ごとの指数移動平均と平均偏差を履歴として保存する。
+次の記事を始める前に can_start() で「平均＋偏差×2」の見込みが残り時間・残りトークンに
+収まるか確認し、収まらなければそこで実行を終える（記事は優先度順に処理するので、残るのは優先度の低い記事）。
+履歴がまだない間は見積もれないので、締め切り・予算が残っていれば始める。
+
+    storage/telemetry/costs/<service>.json   {"<種類>": {"seconds": [平均, 偏差], "tokens": [平均, 偏差], "count": 件数}}
+
+締め切りは "30m" / "1h30m" / "1800"（実行開始からの長さ）または "06:45"（時刻。過ぎていれば翌日）で指定する。
+"""
+import os
+import time
+import logging
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from rate_governor import parse_duration
+from retention import parse_published
+from storage_writer import StorageWriter, loads
+
+logger = logging.getLogger(__name__)
+
+# 指数移動平均の重み（新しい記録の割合）
+ALPHA = 0.2
+# 見込み = 平均 + 偏差 × DEVIATIONS
+DEVIATIONS = 2.0
+# この件数に満たない種類は全体の履歴で見積もる
+MIN_SAMPLES = 3
+# 全体の履歴の種類名
+OVERALL = '*'
+
+
+def parse_deadline(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    締め切りの指定をUNIX時刻に変換（未指定ならNone）
+
+    "06:45" は次に来るその時刻、それ以外は現在からの長さとして解釈する。
+    """
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    if ':' in value:
+        hour, minute = (int(part) for part in value.split(':', 1))
+        current = datetime.fromtimestamp(now)
+        target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= current:
+            target += timedelta(days=1)
+        return target.timestamp()
+    seconds = parse_duration(value)
+    if seconds is None:
+        raise ValueError(f"締め切りの形式が不正です: {value}（例: 30m / 1h30m / 1800 / 06:45）")
+    return now + seconds
+
+
+def priority_key(metadata: dict) -> Tuple[float, float]:
+    """処理順のキー（filter_scoreの高い順、同点なら公開日の新しい順。降順で並べる）"""
+    try:
+        score = float(metadata.get('filter_score', 0) or 0)
+    except (TypeError, ValueError):
+        score = 0.0
+    return score, parse_published(metadata.get('published', '')) or 0.0
+
+
+def _update(stats: Optional[list], value: float) -> list:
+    """[平均, 平均偏差] を指数移動平均で更新"""
+    if not stats:
+        return [value, value / 4]
+    mean, deviation = stats
+    deviation = (1 - ALPHA) * deviation + ALPHA * abs(value - mean)
+    mean = (1 - ALPHA) * mean + ALPHA * value
+    return [mean, deviation]
+
+
+class RunBudget:
+    """1回の実行の締め切り・トークン予算と、1件あたりのコストの履歴"""
+
+    def __init__(self, service: str, storage_path: str, deadline: Optional[float] = None,
+                 token_budget: Optional[int] = None):
+        self.deadline = deadline
+        self.token_budget = token_budget or None
+        self.tokens_used = 0
+        telemetry_dir = Path(os.getenv('TELEMETRY_DIR') or Path(storage_path) / 'telemetry')
+        self.history_path = telemetry_dir / 'costs' / f"{service}.json"
+        try:
+            with open(self.history_path, 'rb') as f:
+                self.history = loads(f.read())
+        except (FileNotFoundError, ValueError):
+            self.history = {}
+
+        if self.deadline is not None:
+            logger.info(f"締め切り: {datetime.fromtimestamp(self.deadline):%Y-%m-%d %H:%M:%S}"
+                        f"（残り {self.deadline - time.time():.0f}秒）")
+        if self.token_budget:
+            logger.info(f"トークン予算: {self.token_budget}")
+
+    def estimate(self, kind: str) -> Tuple[float, float]:
+        """1件の見込み（秒, トークン）。履歴がなければ (0, 0)"""
+        stats = self.history.get(kind)
+        if not stats or stats.get('count', 0) < MIN_SAMPLES:
+            stats = self.history.get(OVERALL)
+        if not stats:
+            return 0.0, 0.0
+        seconds = stats['seconds'][0] + DEVIATIONS * stats['seconds'][1]
+        tokens = stats['tokens'][0] + DEVIATIONS * stats['tokens'][1]
+        return seconds, tokens
+
+    def can_start(self, kind: str, remaining_items: Optional[int] = None) -> bool:
+        """次の記事が締め切り・予算内に終わる見込みか（終わらなければ理由をログに出す）"""
+        if self.deadline is None and not self.token_budget:
+            return True
+        seconds, tokens = self.estimate(kind)
+        left = f"（残り{remaining_items}件は次回）" if remaining_items else "（残りは次回）"
+        if self.deadline is not None:
+            remaining = self.deadline - time.time()
+            if remaining <= 0 or seconds > remaining:
+                logger.info(f"締め切りまでに終わらない見込みのため終了: 残り {max(remaining, 0):.0f}秒 < "
+                            f"見込み {seconds:.0f}秒 ({kind}){left}")
+                return False
+        if self.token_budget and (self.tokens_used >= self.token_budget
+                                  or self.tokens_used + tokens > self.token_budget):
+            logger.info(f"トークン予算を超える見込みのため終了: 使用 {self.tokens_used} + 見込み {tokens:.0f} > "
+                        f"予算 {self.token_budget} ({kind}){left}")
+            return False
+        return True
+
+    def record(self, kind: str, seconds: float, tokens: int = 0):
+        """1件のコストを記録（種類ごとと全体の履歴を更新）"""
+        self.tokens_used += tokens
+        for key in (kind, OVERALL):
+            stats = self.history.setdefault(key, {'count': 0})
+            stats['seconds'] = _update(stats.get('seconds'), seconds)
+            stats['tokens'] = _update(stats.get('tokens'), float(tokens))
+            stats['count'] += 1
+
+    def save(self):
+        """履歴を書き出す（失敗しても処理は止めない）"""
+        if not self.history:
+            return
+        try:
+            self.history_path.parent.mkdir(parents=True, exist_ok=True)
+            with StorageWriter(fsync=False) as writer:
+                writer.write_json(self.history_path, self.history)
+        except OSError as e:
+            logger.warning(f"コスト履歴の書き出しに失敗: {e}")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+全文検索インデックス - 要約記事をSQLite FTS5で検索
+
+日本語は分かち書きせずに文字bigramへ分割し、英数字は単語単位で索引する。
+Article Processor が要約保存時に追記し、Article Viewer が起動時に差分同期する。
+"""
+import re
+import sqlite3
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 英数字の単語、またはCJK（ひらがな・カタカナ・漢字）の連続
+TOKEN_PATTERN = re.compile(r'[0-9a-z_]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+')
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]')
+
+
+def tokenize(text: str) -> List[str]:
+    """テキストをトークン列に変換（NFKC正規化・小文字化、CJKは文字bigram）"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize('NFKC', text).lower()):
+        word = match.group()
+        if CJK_PATTERN.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class SearchIndex:
+    """FTS5による要約記事の全文検索インデックス（storage/index/search.db）"""
+
+    def __init__(self, storage_path: str):
+        self.db_path = Path(storage_path) / 'index' / 'search.db'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS docs (
+                rowid INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                feed_name TEXT NOT NULL,
+                article_id TEXT NOT NULL,
+                title TEXT,
+                mtime REAL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, tokenize='unicode61');
+        ''')
+
+    @staticmethod
+    def key(feed_name: str, article_id: str) -> str:
+        return f"{feed_name}/{article_id}"
+
+    def _upsert(self, feed_name: str, article_id: str, title: str, body: str, mtime: float):
+        key = self.key(feed_name, article_id)
+        row = self.conn.execute('SELECT rowid FROM docs WHERE key = ?', (key,)).fetchone()
+        if row:
+            rowid = row[0]
+            self.conn.execute('UPDATE docs SET title = ?, mtime = ? WHERE rowid = ?', (title, mtime, rowid))
+            self.conn.execute('DELETE FROM docs_fts WHERE rowid = ?', (rowid,))
+        else:
+            rowid = self.conn.execute(
+                'INSERT INTO docs (key, feed_name, article_id, title, mtime) VALUES (?, ?, ?, ?, ?)',
+                (key, feed_name, article_id, title, mtime)
+            ).lastrowid
+        self.conn.execute(
+            'INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)',
+            (rowid, ' '.join(tokenize(title)), ' '.join(tokenize(body)))
+        )
+
+    def upsert(self, feed_name: str, article_id: str, title: str, body: str, mtime: float = 0.0):
+        """記事を索引（既存なら置き換え）"""
+        with self.conn:
+            self._upsert(feed_name, article_id, title, body, mtime)
+
+    def mtimes(self) -> Dict[str, float]:
+        """索引済み記事の {key: 要約ファイルのmtime}"""
+        return dict(self.conn.execute('SELECT key, mtime FROM docs'))
+
+    def sync(self, documents: Iterable[Tuple[str, str, str, float]], load_body) -> int:
+        """
+        記事一覧と索引を同期（mtimeが変わった記事だけ本文を読んで再索引）
+
+        Args:
+            documents: (feed_name, article_id, title, mtime) の列
+            load_body: (feed_name, article_id) -> 本文 を返す関数
+                       （一覧の取得後に保持期間・GCで要約が削除された記事は FileNotFoundError。削除として扱う）
+
+        Returns:
+            再索引した記事数
+        """
+        indexed = self.mtimes()
+        seen = set()
+        updated = 0
+        with self.conn:
+            for feed_name, article_id, title, mtime in documents:
+                key = self.key(feed_name, article_id)
+                if indexed.get(key) == mtime:
+                    seen.add(key)
+                    continue
+                try:
+                    body = load_body(feed_name, article_id)
+                except FileNotFoundError:
+                    logger.debug(f"索引中に削除された記事: {key}")
+                    continue
+                seen.add(key)
+                self._upsert(feed_name, article_id, title, body, mtime)
+                updated += 1
+
+            for key in indexed.keys() - seen:
+                rowid = self.conn.execute('SELECT rowid FROM docs WHERE key = ?', (key,)).fetchone()[0]
+                self.conn.execute('DELETE FROM docs_fts WHERE rowid = ?', (rowid,))
+                self.conn.execute('DELETE FROM docs WHERE rowid = ?', (rowid,))
+
+        if updated:
+            logger.info(f"検索インデックス更新: {updated}件")
+        return updated
+
+    def search(self, query: str, limit: int = 100,
+               keys: Optional[Container[Tuple[str, str]]] = None) -> List[Dict]:
+        """
+        クエリに一致する記事をBM25スコア順に返す（タイトルの一致を重視）
+
+        keys を指定すると (feed_name, article_id) がその中にある記事だけを返す。
+        フィルタ後の一覧から探すときに使う（上位N件を取ってから絞り込むと、
+        一覧の外の記事に押し出されて一致する記事が返らない）。件数の上限は絞り込んだ後に適用する。
+        """
+        terms = []
+        for token in tokenize(query):
+            # 1文字のCJKは前方一致でbigramにマッチさせる
+            if len(token) == 1 and CJK_PATTERN.match(token):
+                terms.append(f'"{token}"*')
+            else:
+                terms.append(f'"{token}"')
+        if not terms:
+            return []
+
+        rows = self.conn.execute('''
+            SELECT docs.feed_name, docs.article_id, docs.title, bm25(docs_fts, 5.0, 1.0) AS rank
+            FROM docs_fts JOIN docs ON docs.rowid = docs_fts.rowid
+            WHERE docs_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ''', (' '.join(terms), -1 if keys is not None else limit))
+        results = []
+        for feed_name, article_id, title, rank in rows:
+            if keys is not None and (feed_name, article_id) not in keys:
+                continue
+            results.append({'feed_name': feed_name, 'article_id': article_id, 'title': title, 'rank': rank})
+            if len(results) >= limit:
+                break
+        rows.close()
+        return results
+
+    def close(self):
+        self.conn.close()
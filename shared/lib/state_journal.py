@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+記事状態ジャーナル - article_states.json（スナップショット）と追記専用ジャーナルで状態を永続化
+
+状態変更は1件ごとにジャーナル（article_states.journal）へ1行追記するだけなので、
+履歴が増えても書き込みコストは一定。読み込み時はスナップショットにジャーナルを
+再生し、一定件数を超えたらスナップショットへ畳み込んでジャーナルを空にする。
+書き込み途中でクラッシュして末尾に残った不完全な行は、次回読み込み時に切り捨てる。
+"""
+import os
+import json
+import fcntl
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from storage_writer import StorageWriter
+
+logger = logging.getLogger(__name__)
+
+# 状態のカテゴリ（article_id: timestamp）
+STATE_CATEGORIES = ('read', 'deleted', 'favorite', 'archived')
+
+
+def empty_states() -> Dict[str, Dict[str, str]]:
+    return {category: {} for category in STATE_CATEGORIES}
+
+
+class StateJournal:
+    """記事状態のスナップショット＋追記専用ジャーナル"""
+
+    def __init__(self, storage_path: str, compact_threshold: Optional[int] = None):
+        self.storage_path = Path(storage_path)
+        self.snapshot_path = self.storage_path / 'article_states.json'
+        self.journal_path = self.storage_path / 'article_states.journal'
+        self.lock_path = self.storage_path / 'article_states.lock'
+        self.compact_threshold = compact_threshold or int(os.getenv('STATE_COMPACT_THRESHOLD', '1000'))
+        # 前回の読み込み・追記以降のジャーナル件数
+        self.journal_entries = 0
+
+    @contextmanager
+    def _locked(self):
+        """プロセス間の排他ロック（追記・畳み込みをViewerとGCで直列化）"""
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, str]]:
+        states = empty_states()
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                states.update(json.load(f))
+        return states
+
+    def _replay(self, states: Dict[str, Dict[str, str]], repair: bool) -> int:
+        """
+        ジャーナルをスナップショットに再生
+
+        改行で終わらない末尾の行は書き込み途中のレコードとみなして無視する
+        （repair=Trueならファイルから切り捨てる）。
+
+        Returns:
+            再生したレコード数
+        """
+        if not self.journal_path.exists():
+            return 0
+
+        with open(self.journal_path, 'rb') as f:
+            data = f.read()
+
+        applied = 0
+        valid_end = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+                self.apply(states, record)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"記事状態ジャーナルの不正なレコードをスキップ: {e}")
+            else:
+                applied += 1
+            valid_end += len(line)
+
+        if valid_end < len(data):
+            logger.warning(f"記事状態ジャーナル末尾の不完全なレコードを破棄 ({len(data) - valid_end} bytes)")
+            if repair:
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_end)
+        return applied
+
+    @staticmethod
+    def apply(states: Dict[str, Dict[str, str]], record: Dict):
+        """レコード {'op': 'set'|'unset', 'category', 'article_id', 'ts'} を状態に適用"""
+        entries = states.setdefault(record['category'], {})
+        if record['op'] == 'set':
+            entries[record['article_id']] = record['ts']
+        elif record['op'] == 'unset':
+            entries.pop(record['article_id'], None)
+        else:
+            raise ValueError(f"unknown op: {record['op']}")
+
+    def load(self, repair: bool = False) -> Dict[str, Dict[str, str]]:
+        """スナップショットにジャーナルを再生した現在の状態を返す"""
+        if repair:
+            with self._locked():
+                states = self._read_snapshot()
+                self.journal_entries = self._replay(states, repair=True)
+        else:
+            states = self._read_snapshot()
+            self.journal_entries = self._replay(states, repair=False)
+        return states
+
+    def append(self, op: str, category: str, article_id: str, ts: Optional[str] = None):
+        """状態変更を1レコードとしてジャーナルに追記（O(1)）"""
+        record = {'op': op, 'category': category, 'article_id': article_id}
+        if ts is not None:
+            record['ts'] = ts
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+        with self._locked():
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self.journal_entries += 1
+
+    def signature(self) -> Tuple:
+        """スナップショットとジャーナルの (mtime, size)（変更検知用）"""
+        signature = []
+        for path in (self.snapshot_path, self.journal_path):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def needs_compaction(self) -> bool:
+        return self.journal_entries >= self.compact_threshold
+
+    def compact(self, transform: Optional[Callable[[Dict], None]] = None) -> Dict[str, Dict[str, str]]:
+        """
+        ジャーナルをスナップショットへ畳み込み、ジャーナルを空にする
+
+        ロック中にディスク上の最新状態を読み直すので、他プロセスの追記も失わない。
+        transformを渡すと、書き出す前に状態を書き換えられる（GCの状態回収など）。
+
+        Returns:
+            畳み込み後の状態
+        """
+        with self._locked():
+            states = self._read_snapshot()
+            self._replay(states, repair=False)
+            if transform is not None:
+                transform(states)
+
+            # ジャーナルを空にする前にスナップショットを確実に書き出す（一時ファイルはプロセス・スレッドごと）
+            with StorageWriter(fsync=True) as writer:
+                writer.write_json(self.snapshot_path, states)
+            # スナップショットの置き換え後にジャーナルを空にする（間でクラッシュしても再生は冪等）
+            if self.journal_path.exists():
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(0)
+
+        self.journal_entries = 0
+        return states
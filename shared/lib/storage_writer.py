@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+ストレージ書き込み - メタデータ・本文をアトミックかつコンパクトに保存
+
+一時ファイル（<name>.<pid>.<thread>.tmp）に書き込んでから os.replace で置き換えるため、
+書き込み中に他プロセス（実行中のViewerなど）が読んでも途中までのファイルは見えない。
+JSONは区切りの空白を省いたコンパクト形式で、orjson がインストールされていれば使う。
+
+置き換え後のディレクトリのfsyncは書き込みごとには行わず、ディレクトリ単位で
+まとめて flush() で行う（一定件数ごと・with ブロックの終了時にも自動で行う）。
+"""
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Optional, Set, Union
+
+try:
+    import orjson
+except ImportError:  # 任意依存: なければ標準のjsonを使う
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+TMP_SUFFIX = '.tmp'
+
+
+def dumps(obj: Any) -> bytes:
+    """コンパクトなJSON（UTF-8）にエンコード"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def is_temp_file(path: Path) -> bool:
+    """書き込み途中の一時ファイルか（GCやスキャナーの対象外）"""
+    return path.name.endswith(TMP_SUFFIX)
+
+
+class StorageWriter:
+    """
+    アトミックなファイル書き込みと、ディレクトリfsyncのバッチ化
+
+    with StorageWriter() as writer:
+        writer.write_json(path, metadata)
+    """
+
+    def __init__(self, fsync: Optional[bool] = None, dir_sync_batch: Optional[int] = None):
+        if fsync is None:
+            fsync = os.getenv('STORAGE_FSYNC', 'true').lower() == 'true'
+        self.fsync = fsync
+        self.dir_sync_batch = dir_sync_batch or int(os.getenv('STORAGE_DIR_SYNC_BATCH', '100'))
+        # 置き換え済みでfsync待ちのディレクトリ
+        self._dirty_dirs: Set[Path] = set()
+        self._pending_writes = 0
+
+    def write_bytes(self, path: Union[str, Path], data: bytes):
+        """一時ファイルに書き込んでからアトミックに置き換え"""
+        path = Path(path)
+        # 同じプロセスの別スレッド（パイプラインデーモン）が同じファイルを書いても一時ファイルが衝突しないようにする
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+        if self.fsync:
+            self._dirty_dirs.add(path.parent)
+            self._pending_writes += 1
+            if self._pending_writes >= self.dir_sync_batch:
+                self.flush()
+
+    def write_text(self, path: Union[str, Path], text: str):
+        self.write_bytes(path, text.encode('utf-8'))
+
+    def write_json(self, path: Union[str, Path], obj: Any):
+        self.write_bytes(path, dumps(obj))
+
+    def flush(self):
+        """置き換えたファイルのディレクトリエントリをディレクトリごとに1回だけfsync"""
+        for directory in self._dirty_dirs:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError as e:
+                logger.warning(f"ディレクトリのfsyncに失敗 ({directory}): {e}")
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._dirty_dirs.clear()
+        self._pending_writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+テレメトリ - ステージごとの処理時間・LLMトークン数・キュー長を記録
+
+各サービスは処理の単位（fetch / parse / judge / scrape / extract / summarize / write）を
+span() で囲み、LLM呼び出しのトークン数を record_llm() で記録する。記事のキー（feed/article_id）を
+トレースIDとして、1件ずつの構造化イベントをJSONLのトレースファイルに追記し、実行の終わりに
+集計をPrometheusのtextfile形式（node_exporter の textfile collector で収集）で書き出す。
+
+    storage/telemetry/traces/<service>-YYYYMMDD.jsonl   1行1イベント
+    storage/telemetry/metrics/<service>.prom           直近の実行の集計
+
+TELEMETRY_ENABLED=false で無効（計測も書き込みもしない）。
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'rss_curator'
+
+# ステージ処理時間のヒストグラムのバケット（秒）
+DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 処理中の記事（span() の中で呼ばれた record_llm() などがトレースIDとして使う）
+_current_article: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('current_article', default=None)
+
+
+def article_key(feed_name: str, article_id: str) -> str:
+    return f"{feed_name}/{article_id}"
+
+
+def _labels(**labels) -> str:
+    inner = ','.join(f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for name, value in labels.items())
+    return '{' + inner + '}'
+
+
+class Telemetry:
+    """1サービス（1プロセス）分のトレースとメトリクス"""
+
+    def __init__(self, service: str, storage_path: str, enabled: Optional[bool] = None):
+        self.service = service
+        if enabled is None:
+            enabled = os.getenv('TELEMETRY_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.base_dir = Path(os.getenv('TELEMETRY_DIR') or Path(storage_path) / 'telemetry')
+        self.keep_days = int(os.getenv('TELEMETRY_KEEP_DAYS', '7'))
+        self.lock = threading.Lock()
+        self._trace_file = None
+        self._trace_date = None
+        self.run_started = time.time()
+
+        # (stage, status) -> [件数, 合計秒, バケットごとの件数]
+        self.stages: Dict[Tuple[str, str], list] = {}
+        # (model, kind) -> トークン数 / (model, status) -> リクエスト数
+        self.tokens: Dict[Tuple[str, str], int] = {}
+        self.llm_requests: Dict[Tuple[str, str], int] = {}
+        self.queue_depth: Dict[str, int] = {}
+
+    # --- トレース ---
+
+    def _trace_handle(self):
+        """日付ごとのトレースファイル（日付が変わったら切り替え、古いファイルを削除）"""
+        today = datetime.now().strftime('%Y%m%d')
+        if self._trace_date != today:
+            if self._trace_file is not None:
+                self._trace_file.close()
+            trace_dir = self.base_dir / 'traces'
+            trace_dir.mkdir(parents=True, exist_ok=True)
+            self._trace_file = open(trace_dir / f"{self.service}-{today}.jsonl", 'a', encoding='utf-8')
+            self._trace_date = today
+            self._prune_traces(trace_dir)
+        return self._trace_file
+
+    def _prune_traces(self, trace_dir: Path):
+        cutoff = time.time() - self.keep_days * 86400
+        for path in trace_dir.glob(f"{self.service}-*.jsonl"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def event(self, stage: str, article: Optional[str] = None, **attrs):
+        """構造化イベントを1行追記"""
+        if not self.enabled:
+            return
+        record = {'ts': round(time.time(), 3), 'service': self.service, 'stage': stage,
+                  'trace_id': article or _current_article.get()}
+        record.update(attrs)
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+        with self.lock:
+            try:
+                self._trace_handle().write(line)
+            except OSError as e:
+                # 計測の失敗で処理を止めない
+                logger.warning(f"トレースの書き込みに失敗: {e}")
+                self.enabled = False
+
+    @contextmanager
+    def trace(self, article: str):
+        """記事の処理を囲み、中で記録したイベントのトレースIDにする（計測はしない）"""
+        token = _current_article.set(article)
+        try:
+            yield
+        finally:
+            _current_article.reset(token)
+
+    @contextmanager
+    def span(self, stage: str, article: Optional[str] = None, **attrs):
+        """
+        処理を計測し、所要時間と結果（ok / error）をイベントとメトリクスに記録
+
+        with telemetry.span('judge', article_key(feed_name, article_id)):
+            ...
+        """
+        if not self.enabled:
+            yield
+            return
+        token = _current_article.set(article) if article is not None else None
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            if token is not None:
+                _current_article.reset(token)
+            self.observe(stage, duration, status)
+            self.event(stage, article, status=status, duration_ms=round(duration * 1000, 2), **attrs)
+
+    def observe(self, stage: str, duration: float, status: str = 'ok'):
+        """span() を使わずに計測した処理時間を記録"""
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.stages.setdefault((stage, status), [0, 0.0, [0] * len(DURATION_BUCKETS)])
+            entry[0] += 1
+            entry[1] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    entry[2][i] += 1
+
+    # --- LLM・キュー ---
+
+    def record_llm(self, model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0,
+                   duration: float = 0.0, status: str = 'ok', article: Optional[str] = None):
+        """LLM呼び出し1回分のトークン数（cachedは入力のうちプロンプトキャッシュに当たった分）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            for kind, count in (('input', input_tokens), ('output', output_tokens), ('cached', cached_tokens)):
+                self.tokens[(model, kind)] = self.tokens.get((model, kind), 0) + (count or 0)
+            self.llm_requests[(model, status)] = self.llm_requests.get((model, status), 0) + 1
+        self.event('llm', article, model=model, status=status, duration_ms=round(duration * 1000, 2),
+                   input_tokens=input_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens)
+
+    def record_usage(self, model: str, response, duration: float = 0.0, article: Optional[str] = None):
+        """Responses API のレスポンス（usage）からトークン数を記録"""
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'input_tokens_details', None)
+        self.record_llm(model,
+                        getattr(usage, 'input_tokens', 0) or 0,
+                        getattr(usage, 'output_tokens', 0) or 0,
+                        getattr(details, 'cached_tokens', 0) or 0,
+                        duration, getattr(response, 'status', 'completed') or 'completed', article)
+
+    def set_queue_depth(self, stage: str, depth: int):
+        """処理待ちの件数（探索の結果）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.queue_depth[stage] = depth
+        self.event('queue', stage_name=stage, depth=depth)
+
+    # --- 書き出し ---
+
+    def render_metrics(self) -> str:
+        """Prometheusのtextfile形式"""
+        service = self.service
+        lines = []
+        with self.lock:
+            name = f"{METRIC_PREFIX}_stage_duration_seconds"
+            lines += [f"# HELP {name} 直近の実行でのステージ処理時間", f"# TYPE {name} histogram"]
+            for (stage, status), (count, total, buckets) in sorted(self.stages.items()):
+                for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                    labels = _labels(service=service, stage=stage, status=status, le=bound)
+                    lines.append(f"{name}_bucket{labels} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(service=service, stage=stage, status=status, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(service=service, stage=stage, status=status)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(service=service, stage=stage, status=status)} {count}")
+
+            name = f"{METRIC_PREFIX}_llm_tokens"
+            lines += [f"# HELP {name} 直近の実行でのLLMトークン数（kind=input/output/cached）", f"# TYPE {name} gauge"]
+            for (model, kind), count in sorted(self.tokens.items()):
+                lines.append(f"{name}{_labels(service=service, model=model, kind=kind)} {count}")
+
+            name = f"{METRIC_PREFIX}_llm_requests"
+            lines += [f"# HELP {name} 直近の実行でのLLM呼び出し数", f"# TYPE {name} gauge"]
+            for (model, status), count in sorted(self.llm_requests.items()):
+                lines.append(f"{name}{_labels(service=service, model=model, status=status)} {count}")
+
+            name = f"{METRIC_PREFIX}_queue_depth"
+            lines += [f"# HELP {name} 実行開始時の処理待ち件数", f"# TYPE {name} gauge"]
+            for stage, depth in sorted(self.queue_depth.items()):
+                lines.append(f"{name}{_labels(service=service, stage=stage)} {depth}")
+
+        now = time.time()
+        for metric, value, help_text in (
+            ('run_duration_seconds', now - self.run_started, '直近の実行の所要時間'),
+            ('last_run_timestamp_seconds', now, '直近の実行の終了時刻'),
+        ):
+            name = f"{METRIC_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                      f"{name}{_labels(service=service)} {value:.3f}"]
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """トレースをフラッシュし、メトリクスのtextfileをアトミックに置き換え"""
+        if not self.enabled:
+            return
+        from storage_writer import StorageWriter
+
+        try:
+            with self.lock:
+                if self._trace_file is not None:
+                    self._trace_file.flush()
+            metrics_dir = self.base_dir / 'metrics'
+            metrics_dir.mkdir(parents=True, exist_ok=True)
+            with StorageWriter() as writer:
+                writer.write_text(metrics_dir / f"{self.service}.prom", self.render_metrics())
+        except OSError as e:
+            logger.warning(f"メトリクスの書き出しに失敗: {e}")
+
+    @contextmanager
+    def run(self):
+        """サービスの1回の実行を囲む（終了時にメトリクスを書き出す）"""
+        self.run_started = time.time()
+        try:
+            yield self
+        finally:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+                self._trace_date = None
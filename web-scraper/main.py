@@ -3,14 +3,25 @@
 Web Scraper - URLから記事本文を抽出してMarkdown形式でストレージに保存
 """
 import os
+import sys
+import argparse
 import json
 import logging
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
-import html2text
+from typing import Optional
+import hashlib
 import time
 
+# 共有ライブラリ（shared/lib）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'shared' / 'lib'))
+from catalog import open_catalog  # noqa: E402
+from check_marks import CheckMarks  # noqa: E402
+from storage_writer import StorageWriter, read_json  # noqa: E402
+from telemetry import Telemetry, article_key  # noqa: E402
+from profiling import MODES, profiled  # noqa: E402
+from leases import LeaseLost, open_leases  # noqa: E402
+from run_budget import RunBudget, parse_deadline, priority_key  # noqa: E402
+
 # ロギング設定
 logging.basicConfig(
     level=os.getenv('LOG_LEVEL', 'INFO'),
@@ -28,17 +39,43 @@ class WebScraper:
         self.timeout = int(os.getenv('TIMEOUT_SECONDS', '30'))
         self.user_agent = os.getenv('USER_AGENT', 'Mozilla/5.0 (compatible; RSSBot/1.0)')
         
-        # html2text設定
-        self.h2t = html2text.HTML2Text()
-        self.h2t.ignore_links = False
-        self.h2t.ignore_images = False
-        self.h2t.ignore_emphasis = False
-        self.h2t.body_width = 0  # 改行を自動挿入しない
+        self._h2t = None
+        self.catalog = open_catalog(storage_path)  # CATALOG_BACKEND=sqlite のときのみ
+        self.writer = StorageWriter()
+        self.telemetry = Telemetry('web-scraper', storage_path)
+        self.leases = open_leases(storage_path, 'scrape')  # LEASES_ENABLED=true のときのみ
+        # 再スクレイピング不要と確認したメタデータのmtime（本文のmtimeは変更の検知に使うため触らない）
+        self.checked = CheckMarks(storage_path, 'scrape')
+    
+    @property
+    def h2t(self):
+        """html2textの変換器（スクレイピング対象があるときだけimport・生成）"""
+        if self._h2t is None:
+            import html2text
+            self._h2t = html2text.HTML2Text()
+            self._h2t.ignore_links = False
+            self._h2t.ignore_images = False
+            self._h2t.ignore_emphasis = False
+            self._h2t.body_width = 0  # 改行を自動挿入しない
+        return self._h2t
+    
+    @staticmethod
+    def load_score_threshold() -> float:
+        """user_preferences.jsonからスクレイピング対象のスコア閾値を取得"""
+        filter_config_path = Path(__file__).parent.parent / 'llm-judge' / 'config' / 'user_preferences.json'
+        if filter_config_path.exists():
+            with open(filter_config_path, 'r', encoding='utf-8') as f:
+                user_prefs = json.load(f)
+                return float(user_prefs.get('score_threshold', 6.0))
+        return 6.0
     
     def get_pending_articles(self) -> list:
         """スクレイピング待ちの記事を取得"""
         pending = []
         
+        if self.catalog is not None:
+            return self._get_pending_from_catalog()
+        
         if not self.rss_feeds_dir.exists():
             return pending
         
@@ -52,24 +89,30 @@ class WebScraper:
                 article_id = metadata_file.stem
                 
                 # 既にスクレイピング済みかチェック（.mdファイル）
+                # メタデータがスクレイピング後・前回の確認後に更新されていなければ、パースせずにスキップ
                 scraped_file = self.scraped_dir / feed_name / f"{article_id}.md"
-                if scraped_file.exists():
+                scraped_exists = scraped_file.exists()
+                if scraped_exists and (metadata_file.stat().st_mtime <= scraped_file.stat().st_mtime
+                                       or self.checked.is_current(feed_name, article_id, metadata_file)):
                     continue
                 
                 with open(metadata_file, 'r', encoding='utf-8') as f:
                     metadata = json.load(f)
                 
+                # フィード内容が更新された記事は、LLM Judgeの再判定後に再スクレイピング
+                feed_hash = metadata.get('feed_hash')
+                if feed_hash and 'filter_score' in metadata and metadata.get('judged_feed_hash') != feed_hash:
+                    logger.debug(f"スキップ（再判定待ち）: {article_id}")
+                    continue
+                
+                if scraped_exists and not (feed_hash and metadata.get('scraped_feed_hash') != feed_hash):
+                    # 変更なしを確認済み: 次回以降はパースを省略
+                    self.checked.mark(feed_name, article_id, metadata_file)
+                    continue
+                
                 # フィルタリングスコアをチェック（設定されている場合のみ）
                 if 'filter_score' in metadata:
-                    # user_preferences.jsonから閾値を取得
-                    filter_config_path = Path(__file__).parent.parent / 'llm-judge' / 'config' / 'user_preferences.json'
-                    if filter_config_path.exists():
-                        with open(filter_config_path, 'r', encoding='utf-8') as f:
-                            user_prefs = json.load(f)
-                            threshold = float(user_prefs.get('score_threshold', 6.0))
-                    else:
-                        threshold = 6.0
-                    
+                    threshold = self.load_score_threshold()
                     if metadata['filter_score'] < threshold:
                         logger.debug(f"スキップ（スコア不足: {metadata['filter_score']}）: {article_id}")
                         continue
@@ -82,64 +125,92 @@ class WebScraper:
         
         return pending
     
+    def _get_pending_from_catalog(self) -> list:
+        """カタログの部分インデックスから判定済み・閾値以上・未スクレイピングの記事を取得"""
+        pending = []
+        for feed_name, article_id in self.catalog.pending_scrape(self.load_score_threshold()):
+            metadata_file = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+            try:
+                with open(metadata_file, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"メタデータ読み込み失敗: {feed_name}/{article_id} ({e})")
+                continue
+            pending.append({
+                'feed_name': feed_name,
+                'article_id': article_id,
+                'metadata': metadata
+            })
+        return pending
+    
     def extract_article_text(self, url: str) -> str:
         """URLから記事本文をMarkdown形式で抽出"""
+        # 起動を軽くするため、HTTP・HTMLパーサーは実際に取得するときにimport
+        import requests
+        from bs4 import BeautifulSoup
+        
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         }
         
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
+            with self.telemetry.span('scrape', url=url):
+                response = requests.get(url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'lxml')
+            with self.telemetry.span('extract', bytes=len(response.content)):
+                soup = BeautifulSoup(response.content, 'lxml')
             
-            # 不要な要素を除去
-            for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']):
-                element.decompose()
+                # 不要な要素を除去
+                for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']):
+                    element.decompose()
             
-            # 記事本文を抽出（一般的なタグを優先）
-            article_html = ''
+                # 記事本文を抽出（一般的なタグを優先）
+                article_html = ''
             
-            # よくある記事コンテナを試す
-            article = soup.find('article')
-            if article:
-                article_html = str(article)
-            else:
-                # mainタグを試す
-                main = soup.find('main')
-                if main:
-                    article_html = str(main)
+                # よくある記事コンテナを試す
+                article = soup.find('article')
+                if article:
+                    article_html = str(article)
                 else:
-                    # フォールバック: body全体
-                    body = soup.find('body')
-                    if body:
-                        article_html = str(body)
+                    # mainタグを試す
+                    main = soup.find('main')
+                    if main:
+                        article_html = str(main)
+                    else:
+                        # フォールバック: body全体
+                        body = soup.find('body')
+                        if body:
+                            article_html = str(body)
             
-            # HTMLをMarkdownに変換
-            if article_html:
-                markdown_text = self.h2t.handle(article_html)
-                # 余分な空行を削除
-                lines = [line for line in markdown_text.split('\n')]
-                # 連続する空行を1つにまとめる
-                cleaned_lines = []
-                prev_empty = False
-                for line in lines:
-                    is_empty = line.strip() == ''
-                    if is_empty and prev_empty:
-                        continue
-                    cleaned_lines.append(line)
-                    prev_empty = is_empty
+                # HTMLをMarkdownに変換
+                if article_html:
+                    markdown_text = self.h2t.handle(article_html)
+                    # 余分な空行を削除
+                    lines = [line for line in markdown_text.split('\n')]
+                    # 連続する空行を1つにまとめる
+                    cleaned_lines = []
+                    prev_empty = False
+                    for line in lines:
+                        is_empty = line.strip() == ''
+                        if is_empty and prev_empty:
+                            continue
+                        cleaned_lines.append(line)
+                        prev_empty = is_empty
                 
-                return '\n'.join(cleaned_lines)
+                    return '\n'.join(cleaned_lines)
             
-            return ""
+                return ""
             
         except Exception as e:
             logger.error(f"スクレイピングエラー ({url}): {e}")
             return ""
     
+    def compute_content_hash(self, text: str) -> str:
+        """本文のハッシュを計算（下流の要約の更新検知用）"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    
     def save_article_text(self, feed_name: str, article_id: str, text: str):
         """記事本文をMarkdown形式で保存"""
         feed_dir = self.scraped_dir / feed_name
@@ -147,55 +218,168 @@ class WebScraper:
         
         article_path = feed_dir / f"{article_id}.md"
         
-        with open(article_path, 'w', encoding='utf-8') as f:
-            f.write(text)
+        self.writer.write_text(article_path, text)
         
         logger.info(f"保存完了: {feed_name}/{article_id}.md ({len(text)} chars)")
     
-    def run(self):
-        """メイン処理"""
+    def save_scrape_hashes(self, feed_name: str, article_id: str, text: str):
+        """
+        スクレイピング時点のフィードハッシュと本文ハッシュをメタデータに記録
+        
+        Article Processorは scraped_hash の変化を検知した記事のみ再要約する。
+        """
+        metadata_path = self.rss_feeds_dir / feed_name / f"{article_id}.json"
+        metadata = read_json(metadata_path)
+        
+        if metadata.get('feed_hash'):
+            metadata['scraped_feed_hash'] = metadata['feed_hash']
+        previous_hash = metadata.get('scraped_hash')
+        metadata['scraped_hash'] = self.compute_content_hash(text)
+        
+        self.writer.write_json(metadata_path, metadata)
+        
+        # ハッシュの記録でメタデータが本文より新しくなるため、この時点のメタデータを確認済みにする
+        self.checked.mark(feed_name, article_id, metadata_path)
+        
+        if self.catalog is not None:
+            self.catalog.mark_scraped(feed_name, article_id, content_changed=previous_hash != metadata['scraped_hash'])
+    
+    def _claim(self, feed_name: str, article_id: str):
+        """
+        他のレプリカと重複しないよう記事のリースを取り、まだスクレイピング待ちか読み直す
+
+        Returns:
+            (リース, 最新のメタデータ)（他のレプリカが処理中・処理済みなら (None, None)）
+        """
+        lease = self.leases.claim(feed_name, article_id)
+        if lease is None:
+            logger.info(f"他のレプリカが処理中: {feed_name}/{article_id}")
+            return None, None
+        try:
+            metadata = read_json(self.rss_feeds_dir / feed_name / f"{article_id}.json")
+        except (OSError, ValueError):
+            metadata = None
+        if metadata is not None:
+            feed_hash = metadata.get('feed_hash')
+            scraped = (self.scraped_dir / feed_name / f"{article_id}.md").exists()
+            if scraped and not (feed_hash and metadata.get('scraped_feed_hash') != feed_hash):
+                metadata = None
+        if metadata is None:
+            lease.release()
+            return None, None
+        return lease, metadata
+    
+    def scrape_article(self, article: dict) -> Optional[bool]:
+        """
+        1件の記事の本文を取得して保存（run() とパイプラインデーモンから呼ばれる）
+        
+        Returns:
+            保存できたか（他のレプリカが処理した・リースを失った場合は None）
+        """
+        feed_name = article['feed_name']
+        article_id = article['article_id']
+        metadata = article['metadata']
+        
+        lease = None
+        if self.leases is not None:
+            lease, metadata = self._claim(feed_name, article_id)
+            if lease is None:
+                return None
+        
+        url = metadata.get('url', metadata.get('link', ''))
+        if not url:
+            logger.warning(f"URLなし: {feed_name}/{article_id}")
+            if lease is not None:
+                lease.release()
+            return False
+        
+        logger.info(f"スクレイピング中: {url}")
+        
+        try:
+            with self.telemetry.trace(article_key(feed_name, article_id)):
+                text = self.extract_article_text(url)
+                if not text:
+                    logger.warning(f"テキスト抽出失敗: {url}")
+                    return False
+                if lease is not None:
+                    lease.check()
+                with self.telemetry.span('write', chars=len(text)):
+                    self.save_article_text(feed_name, article_id, text)
+                    self.save_scrape_hashes(feed_name, article_id, text)
+        except LeaseLost as e:
+            logger.warning(f"本文を破棄: {feed_name}/{article_id} ({e})")
+            return None
+        finally:
+            if lease is not None:
+                lease.release()
+        return True
+    
+    def run(self, deadline: Optional[float] = None):
+        """
+        メイン処理
+        
+        Args:
+            deadline: 締め切り（UNIX時刻）。終わらない見込みの記事は始めずに終了する
+        """
         logger.info("=== Webスクレイパー開始 ===")
         
         articles = self.get_pending_articles()
+        self.checked.save()
+        # 途中で打ち切られても良い記事が先に取得されるよう、スコアの高い順（同点は新しい順）
+        articles.sort(key=lambda article: priority_key(article['metadata']), reverse=True)
         logger.info(f"スクレイピング対象: {len(articles)}件")
+        self.telemetry.set_queue_depth('scrape', len(articles))
         
         if not articles:
             logger.info("スクレイピング対象なし")
+            self.telemetry.flush()
             return
         
         scraped_count = 0
+        # 1件あたりの所要時間はサイト（フィード）ごとに見積もる
+        budget = RunBudget('web-scraper', str(self.storage_path), deadline)
         
-        for article in articles:
-            feed_name = article['feed_name']
-            article_id = article['article_id']
-            metadata = article['metadata']
-            
-            url = metadata.get('url', metadata.get('link', ''))
-            if not url:
-                logger.warning(f"URLなし: {feed_name}/{article_id}")
-                continue
-            
-            logger.info(f"スクレイピング中: {url}")
-            
-            text = self.extract_article_text(url)
-            if text:
-                self.save_article_text(feed_name, article_id, text)
-                scraped_count += 1
-            else:
-                logger.warning(f"テキスト抽出失敗: {url}")
-            
-            # レート制限対策
-            time.sleep(1)
+        with self.telemetry.run(), self.writer:
+            for index, article in enumerate(articles):
+                if not budget.can_start(article['feed_name'], len(articles) - index):
+                    break
+                started = time.monotonic()
+                scraped = self.scrape_article(article)
+                if scraped is None:
+                    # 他のレプリカが処理した記事はアクセスしていないので待たない
+                    continue
+                if scraped:
+                    scraped_count += 1
+                
+                # レート制限対策
+                time.sleep(1)
+                budget.record(article['feed_name'], time.monotonic() - started)
+        budget.save()
+        self.checked.save()
         
         logger.info(f"=== スクレイピング完了: {scraped_count}件 ===")
 
 
 def main(event=None, context=None):
     """メインエントリポイント（ローカル実行・Lambda両対応）"""
+    parser = argparse.ArgumentParser(description='LLM RSS Curator - Web Scraper')
+    parser.add_argument('--deadline', default=os.getenv('RUN_DEADLINE'),
+                        help='締め切り（30m / 1h30m / 1800 / 06:45）。終わらない見込みの記事は次回に回す')
+    parser.add_argument('--profile', nargs='?', const='sample', choices=MODES,
+                        help='プロファイルを storage/profiles/ に出力（PROFILE=sample|cprofile と同じ）')
+    # Lambda実行時はコマンドライン引数を解釈しない
+    args = parser.parse_args([] if event is not None else None)
+    
     storage_path = os.getenv('STORAGE_PATH', '/tmp/rss-data')
+    deadline = parse_deadline(args.deadline)
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        # Lambdaのタイムアウトより前に終える（書き込みの余裕を残す）
+        lambda_deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - 10
+        deadline = min(deadline, lambda_deadline) if deadline is not None else lambda_deadline
     
-    scraper = WebScraper(storage_path)
-    scraper.run()
+    with profiled('web-scraper', storage_path, args.profile):
+        scraper = WebScraper(storage_path)
+        scraper.run(deadline)
     
     return {'statusCode': 200, 'body': 'Web scraping completed'}
 